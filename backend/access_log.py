@@ -0,0 +1,81 @@
+"""
+Compact request log for replaying production traffic.
+
+With ACCESS_LOG_PATH set, every request is appended as one tab-separated
+line: milliseconds since the log started, an anonymized client id, method,
+path with query string, status, server time in ms and response bytes (-1
+when streamed). The header line stores the start time, so a log replays
+with its original spacing (see scripts/replay_carga.py).
+"""
+
+import hashlib
+import threading
+import time
+
+HEADER_PREFIX = '#airguard-access-log v1 start='
+FIELDS = ('offset_ms', 'client', 'method', 'path', 'status', 'duration_ms', 'bytes')
+
+
+def client_id(ip):
+    """Short stable hash of a client address, so logs hold no IPs"""
+    return hashlib.sha1(str(ip).encode('utf-8')).hexdigest()[:8]
+
+
+def format_entry(entry):
+    return '\t'.join(str(value) for value in entry) + '\n'
+
+
+def parse_entry(line):
+    offset_ms, client, method, path, status, duration_ms, size = line.rstrip('\n').split('\t')
+    return int(offset_ms), client, method, path, int(status), float(duration_ms), int(size)
+
+
+def read_log(path):
+    """(start_epoch, [entries]) of a log file, entries sorted by offset"""
+    start = 0.0
+    entries = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.startswith(HEADER_PREFIX):
+                start = float(line[len(HEADER_PREFIX):])
+            elif line.strip() and not line.startswith('#'):
+                entries.append(parse_entry(line))
+    entries.sort(key=lambda entry: entry[0])
+    return start, entries
+
+
+def write_log(path, start, entries):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f"{HEADER_PREFIX}{start:.3f}\n")
+        for entry in entries:
+            file.write(format_entry(entry))
+
+
+class AccessLog:
+    """Appends request lines; line-buffered so a killed server loses nothing"""
+
+    def __init__(self, path):
+        self.path = path
+        self.start = time.time()
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+        if self._file.tell() == 0:
+            self._file.write(f"{HEADER_PREFIX}{self.start:.3f}\n")
+        else:
+            # Appending to an earlier log keeps offsets relative to its start
+            with open(path, 'r', encoding='utf-8') as existing:
+                first = existing.readline()
+            if first.startswith(HEADER_PREFIX):
+                self.start = float(first[len(HEADER_PREFIX):])
+
+    def record(self, ip, method, path, status, duration_ms, size):
+        line = format_entry((int((time.time() - self.start) * 1000), client_id(ip), method, path, status,
+                             round(duration_ms, 2), -1 if size is None else size))
+        with self._lock:
+            self._file.write(line)
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,182 @@
+"""
+Tracking of issued forecasts against the values that were later observed.
+
+Every prediction served is logged in a fixed-size ring buffer per city,
+keyed by (target hour, horizon). When actual readings are ingested they are
+joined against the pending predictions in one vectorized pass, and the
+resulting errors feed rolling MAE / RMSE / bias windows per city and horizon
+that are updated incrementally instead of being recomputed from scratch.
+"""
+
+import threading
+
+import numpy as np
+
+from timeseries import INVALID_EPOCH
+
+HOUR = 3600
+
+
+class PredictionLog:
+    """Ring buffer of issued predictions for one city"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.target = np.full(capacity, INVALID_EPOCH, dtype=np.int64)
+        self.horizon = np.zeros(capacity, dtype=np.int32)
+        self.predicted = np.full(capacity, np.nan)
+        self.actual = np.full(capacity, np.nan)
+        self._slots = {}
+        self._next = 0
+
+    def record(self, target_epoch, horizon, predicted):
+        """Log a prediction; re-issuing the same (target, horizon) overwrites it.
+
+        Returns False when the target was already resolved and nothing changed.
+        """
+        key = (int(target_epoch), int(horizon))
+        slot = self._slots.get(key)
+        if slot is not None:
+            if not np.isnan(self.actual[slot]):
+                return False
+        else:
+            slot = self._next
+            self._next = (self._next + 1) % self.capacity
+            evicted = (int(self.target[slot]), int(self.horizon[slot]))
+            if self._slots.get(evicted) == slot:
+                del self._slots[evicted]
+            self._slots[key] = slot
+            self.target[slot] = key[0]
+            self.horizon[slot] = key[1]
+            self.actual[slot] = np.nan
+        self.predicted[slot] = predicted
+        return True
+
+    def join(self, epochs, values):
+        """Fill in actuals for pending predictions; returns the resolved slot indices"""
+        epochs = np.asarray(epochs, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        epochs, values = epochs[valid], values[valid]
+        pending = np.flatnonzero((self.target != INVALID_EPOCH) & np.isnan(self.actual))
+        if pending.size == 0 or epochs.size == 0:
+            return pending[:0]
+
+        order = np.argsort(epochs, kind='stable')
+        sorted_epochs = epochs[order]
+        positions = np.minimum(np.searchsorted(sorted_epochs, self.target[pending]), sorted_epochs.size - 1)
+        hit = sorted_epochs[positions] == self.target[pending]
+        resolved = pending[hit]
+        self.actual[resolved] = values[order[positions[hit]]]
+        return resolved
+
+    def pending_count(self):
+        return int(np.count_nonzero((self.target != INVALID_EPOCH) & np.isnan(self.actual)))
+
+
+class RollingError:
+    """Sum, absolute and squared error over the last `window` resolved predictions"""
+
+    def __init__(self, window):
+        self.window = window
+        self._errors = np.full(window, np.nan)
+        self._pos = 0
+        self.count = 0
+        self.total = 0
+        self._sum = 0.0
+        self._abs = 0.0
+        self._sq = 0.0
+
+    def push(self, errors):
+        errors = np.asarray(errors, dtype=float)
+        n = errors.size
+        if n == 0:
+            return
+        self.total += n
+        if n >= self.window:
+            # The batch alone fills the window: restart the running sums from it
+            self._errors[:] = errors[-self.window:]
+            self._pos = 0
+            self.count = self.window
+            self._sum = float(self._errors.sum())
+            self._abs = float(np.abs(self._errors).sum())
+            self._sq = float(np.square(self._errors).sum())
+            return
+
+        positions = (self._pos + np.arange(n)) % self.window
+        old = self._errors[positions]
+        old = old[~np.isnan(old)]
+        self._sum += float(errors.sum() - old.sum())
+        self._abs += float(np.abs(errors).sum() - np.abs(old).sum())
+        self._sq += float(np.square(errors).sum() - np.square(old).sum())
+        self._errors[positions] = errors
+        self._pos = (self._pos + n) % self.window
+        self.count = min(self.window, self.count + n)
+
+    def metrics(self):
+        if self.count == 0:
+            return {'samples': 0, 'mae': None, 'rmse': None, 'bias': None, 'total_resolved': self.total}
+        return {
+            'samples': self.count,
+            'mae': round(self._abs / self.count, 3),
+            'rmse': round(float(np.sqrt(max(self._sq, 0.0) / self.count)), 3),
+            'bias': round(self._sum / self.count, 3),
+            'total_resolved': self.total
+        }
+
+
+class AccuracyTracker:
+    """Joins logged predictions with ingested actuals and keeps rolling error metrics"""
+
+    def __init__(self, capacity=4096, window=168):
+        self.capacity = capacity
+        self.window = window
+        self._logs = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, city_key, base_epoch, horizon_hours, predicted):
+        """Log a forecast issued from base_epoch for base_epoch + horizon_hours"""
+        if base_epoch is None or base_epoch == INVALID_EPOCH or predicted is None:
+            return
+        target = int(base_epoch) + int(horizon_hours) * HOUR
+        with self._lock:
+            log = self._logs.get(city_key)
+            if log is None:
+                log = self._logs[city_key] = PredictionLog(self.capacity)
+            log.record(target, horizon_hours, float(predicted))
+
+    def observe(self, city_key, epochs, values):
+        """Resolve pending forecasts with actual readings; returns how many matched"""
+        with self._lock:
+            log = self._logs.get(city_key)
+            if log is None:
+                return 0
+            resolved = log.join(epochs, values)
+            if resolved.size == 0:
+                return 0
+            errors = log.predicted[resolved] - log.actual[resolved]
+            horizons = log.horizon[resolved]
+            # Oldest targets first so the rolling window ends on the newest errors
+            order = np.argsort(log.target[resolved], kind='stable')
+            errors, horizons = errors[order], horizons[order]
+            for horizon in np.unique(horizons):
+                rolling = self._errors.get((city_key, int(horizon)))
+                if rolling is None:
+                    rolling = self._errors[(city_key, int(horizon))] = RollingError(self.window)
+                rolling.push(errors[horizons == horizon])
+            return int(resolved.size)
+
+    def summary(self, city_key=None):
+        """{city: {'pending': n, 'horizons': {'24h': metrics}}}"""
+        with self._lock:
+            cities = [city_key] if city_key else sorted(self._logs)
+            result = {}
+            for city in cities:
+                log = self._logs.get(city)
+                result[city] = {
+                    'pending': log.pending_count() if log else 0,
+                    'horizons': {f'{horizon}h': rolling.metrics()
+                                 for (name, horizon), rolling in sorted(self._errors.items()) if name == city}
+                }
+            return result
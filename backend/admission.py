@@ -0,0 +1,120 @@
+"""
+Admission control for the single-instance deployment.
+
+Every client IP gets a token bucket, and expensive routes additionally pass
+through a bounded concurrency gate with a short wait queue. Requests that
+do not fit are rejected quickly with 429/503 instead of piling up, and
+probe routes skip both checks so they are never queued behind heavy work.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets refilled continuously at rate_per_second"""
+
+    def __init__(self, rate_per_second, burst, max_keys=10000):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        """Take one token for key; returns (allowed, seconds_until_next_token)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            # Least recently seen clients are dropped first; a returning client starts full
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else (1 - tokens) / self.rate
+        return allowed, retry_after
+
+    def tracked_keys(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class ConcurrencyGate:
+    """At most max_concurrent holders, at most max_queue waiters for up to queue_timeout"""
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Returns None when admitted, otherwise the rejection reason"""
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                return None
+            if self.waiting >= self.max_queue:
+                return 'queue_full'
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            admitted = self._cond.wait_for(lambda: self.active < self.max_concurrent, self.queue_timeout)
+            self.waiting -= 1
+            if not admitted:
+                return 'queue_timeout'
+            self.active += 1
+            return None
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class AdmissionController:
+    """Rate limit plus concurrency gate, with counters for the metrics endpoint"""
+
+    def __init__(self, rate_per_minute=120, burst=30, max_concurrent=4, max_queue=8, queue_timeout=2.0):
+        self.limiter = TokenBucketLimiter(rate_per_minute / 60.0, burst)
+        self.gate = ConcurrencyGate(max_concurrent, max_queue, queue_timeout)
+        self.counters = {'admitted': 0, 'rate_limited': 0, 'queue_full': 0, 'queue_timeout': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def check_rate(self, client):
+        allowed, retry_after = self.limiter.allow(client)
+        if not allowed:
+            self._count('rate_limited')
+        return allowed, retry_after
+
+    def enter(self):
+        reason = self.gate.acquire()
+        self._count(reason or 'admitted')
+        return reason
+
+    def leave(self):
+        self.gate.release()
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'in_flight': self.gate.active,
+            'queue_depth': self.gate.waiting,
+            'peak_queue_depth': self.gate.peak_waiting,
+            'max_concurrent': self.gate.max_concurrent,
+            'max_queue': self.gate.max_queue,
+            'tracked_clients': self.limiter.tracked_keys(),
+            'rejections': {name: counters[name] for name in ('rate_limited', 'queue_full', 'queue_timeout')},
+            'admitted': counters['admitted']
+        }
@@ -0,0 +1,389 @@
+"""
+Threshold alert subscriptions evaluated incrementally per reading.
+
+A subscription asks to be notified when a pollutant (or the worst-pollutant AQI) of a
+city crosses a threshold, rising ('above') or falling ('below'). Thresholds
+are kept per (city, pollutant, direction) in sorted lists, so a new reading
+only looks at the thresholds between the previous and the new value: two
+binary searches plus the subscriptions actually crossed, however many
+subscriptions exist. Subscriptions are persisted in SQLite and reloaded at
+startup; notifications are delivered by a pluggable sink on a background
+thread so ingestion never waits on a webhook.
+
+Webhooks are requests the server makes on a subscriber's behalf, so their
+hosts must be on an allowlist (or set by an admin) and must resolve only to
+public addresses, checked again at delivery time; redirects are not followed.
+"""
+
+import bisect
+import ipaddress
+import json
+import os
+import queue
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DIRECTIONS = ('above', 'below')
+# Named thresholds matching the AQI bands shown in the frontend
+AQI_BANDS = {
+    'moderate': 51,
+    'unhealthy_sensitive': 101,
+    'unhealthy': 151,
+    'very_unhealthy': 201,
+    'hazardous': 301
+}
+
+
+def public_host(host):
+    """True when every address the host resolves to is publicly routable"""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except (socket.gaierror, UnicodeError, OSError):
+        return False
+    addresses = {ipaddress.ip_address(info[4][0].split('%')[0]) for info in infos}
+    return bool(addresses) and all(address.is_global and not address.is_multicast for address in addresses)
+
+
+def check_webhook(url, allowed_hosts=(), trusted=False):
+    """None when url may receive notifications, else why not.
+
+    Untrusted callers may only use hosts in allowed_hosts; nobody may point a
+    webhook at a private, loopback, link-local or otherwise internal address.
+    """
+    parts = urllib.parse.urlsplit(url) if isinstance(url, str) else None
+    if parts is None or parts.scheme not in ('http', 'https') or not parts.hostname:
+        return "'webhook' must be an http(s) URL."
+    host = parts.hostname.lower()
+    if not trusted and host not in allowed_hosts:
+        return "'webhook' host is not in ALERT_WEBHOOK_HOSTS; ask an admin to set it."
+    if not public_host(host):
+        return "'webhook' must resolve to a public address."
+    return None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Subscription:
+    __slots__ = ('id', 'token', 'city', 'pollutant', 'threshold', 'direction', 'webhook', 'created_at')
+
+    def __init__(self, id, token, city, pollutant, threshold, direction, webhook=None, created_at=None):
+        self.id = id
+        self.token = token
+        self.city = city
+        self.pollutant = pollutant
+        self.threshold = float(threshold)
+        self.direction = direction
+        self.webhook = webhook
+        self.created_at = created_at or time.time()
+
+    @property
+    def key(self):
+        return (self.city, self.pollutant, self.direction)
+
+    def describe(self, with_token=False):
+        described = {
+            'id': self.id,
+            'city': self.city,
+            'pollutant': self.pollutant,
+            'threshold': self.threshold,
+            'direction': self.direction,
+            'webhook': self.webhook,
+            'created_at': self.created_at
+        }
+        if with_token:
+            described['token'] = self.token
+        return described
+
+
+class ThresholdIndex:
+    """Sorted (threshold, id) pairs of one (city, pollutant, direction)"""
+
+    __slots__ = ('thresholds', 'ids')
+
+    def __init__(self):
+        self.thresholds = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, threshold, subscription_id):
+        position = bisect.bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(position, threshold)
+        self.ids.insert(position, subscription_id)
+
+    def remove(self, threshold, subscription_id):
+        position = bisect.bisect_left(self.thresholds, threshold)
+        while position < len(self.ids) and self.thresholds[position] == threshold:
+            if self.ids[position] == subscription_id:
+                del self.thresholds[position]
+                del self.ids[position]
+                return True
+            position += 1
+        return False
+
+    def crossed(self, low, high, inclusive_high):
+        """Ids with low < threshold <= high (or < high when not inclusive_high)"""
+        start = bisect.bisect_right(self.thresholds, low)
+        end = (bisect.bisect_right if inclusive_high else bisect.bisect_left)(self.thresholds, high)
+        return self.ids[start:end]
+
+
+class SubscriptionStore:
+    """Subscriptions table; the in-memory index is rebuilt from it at startup"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS subscriptions ('
+            'id TEXT PRIMARY KEY, token TEXT NOT NULL, city TEXT NOT NULL, pollutant TEXT NOT NULL, '
+            'threshold REAL NOT NULL, direction TEXT NOT NULL, webhook TEXT, created_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT id, token, city, pollutant, threshold, direction, webhook, created_at '
+                                      'FROM subscriptions').fetchall()
+        return [Subscription(*row) for row in rows]
+
+    def save(self, subscription):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO subscriptions VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               (subscription.id, subscription.token, subscription.city, subscription.pollutant,
+                                subscription.threshold, subscription.direction, subscription.webhook,
+                                subscription.created_at))
+            self._conn.commit()
+
+    def delete(self, subscription_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM subscriptions WHERE id = ?', (subscription_id,))
+            self._conn.commit()
+
+
+class LogSink:
+    """Prints notifications; the default when no sink is configured"""
+
+    def send(self, notification):
+        print(f"Alert {notification['subscription_id']}: {notification['city'].upper()} "
+              f"{notification['pollutant']} {notification['value']} crossed {notification['direction']} "
+              f"{notification['threshold']}")
+
+
+class FileSink:
+    """Appends notifications as JSON lines; a local stand-in for real delivery"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, notification):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(notification) + '\n')
+
+
+class WebhookSink:
+    """POSTs each notification to its subscription's webhook (or a default URL)"""
+
+    def __init__(self, default_url=None, timeout=5):
+        self.default_url = default_url
+        self.timeout = timeout
+        # A 3xx from a subscriber's endpoint must not redirect the POST to an internal address
+        self._opener = urllib.request.build_opener(_NoRedirect)
+
+    def send(self, notification):
+        url = notification.get('webhook')
+        if url:
+            # Re-resolve at delivery: the host may have been repointed since it was accepted
+            host = urllib.parse.urlsplit(url).hostname or ''
+            if not public_host(host):
+                raise ValueError(f"webhook host {host!r} does not resolve to a public address")
+        else:
+            # The operator-configured default may be internal
+            url = self.default_url
+        if not url:
+            return
+        request = urllib.request.Request(url, data=json.dumps(notification).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with self._opener.open(request, timeout=self.timeout):
+            pass
+
+
+def sink_from_env(kind, path=None, url=None):
+    if kind == 'file':
+        return FileSink(path or 'alerts.jsonl')
+    if kind == 'webhook':
+        return WebhookSink(url)
+    return LogSink()
+
+
+class AlertEngine:
+    """Subscription registry, threshold indexes and notification delivery"""
+
+    def __init__(self, store=None, sink=None, max_subscriptions=100000):
+        self.store = store
+        self.sink = sink or LogSink()
+        self.max_subscriptions = max_subscriptions
+        self._subscriptions = {}
+        self._indexes = {}
+        self._last_values = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self.stats = {'evaluated_readings': 0, 'notifications': 0, 'delivery_errors': 0}
+        if store is not None:
+            for subscription in store.load():
+                self._index(subscription)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def _index(self, subscription):
+        self._subscriptions[subscription.id] = subscription
+        index = self._indexes.get(subscription.key)
+        if index is None:
+            index = self._indexes[subscription.key] = ThresholdIndex()
+        index.add(subscription.threshold, subscription.id)
+
+    def _unindex(self, subscription):
+        del self._subscriptions[subscription.id]
+        index = self._indexes.get(subscription.key)
+        if index is not None:
+            index.remove(subscription.threshold, subscription.id)
+
+    def subscribe(self, city, pollutant, threshold, direction='above', webhook=None, persist=True):
+        """Register a subscription; returns it (its token authorizes later changes)"""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+        subscription = Subscription(secrets.token_hex(8), secrets.token_urlsafe(16), city, pollutant,
+                                    threshold, direction, webhook)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscriptions:
+                raise OverflowError('subscription limit reached')
+            self._index(subscription)
+        if persist and self.store is not None:
+            self.store.save(subscription)
+        return subscription
+
+    def get(self, subscription_id):
+        with self._lock:
+            return self._subscriptions.get(subscription_id)
+
+    def update(self, subscription_id, threshold=None, direction=None, webhook=None):
+        with self._lock:
+            subscription = self._subscriptions.get(subscription_id)
+            if subscription is None:
+                return None
+            if direction is not None and direction not in DIRECTIONS:
+                raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+            self._unindex(subscription)
+            if threshold is not None:
+                subscription.threshold = float(threshold)
+            if direction is not None:
+                subscription.direction = direction
+            if webhook is not None:
+                subscription.webhook = webhook or None
+            self._index(subscription)
+        if self.store is not None:
+            self.store.save(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription_id):
+        with self._lock:
+            subscription = self._subscriptions.get(subscription_id)
+            if subscription is None:
+                return False
+            self._unindex(subscription)
+        if self.store is not None:
+            self.store.delete(subscription_id)
+        return True
+
+    def list(self, city=None, limit=100):
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions.values() if city is None or s.city == city]
+        return subscriptions[:limit]
+
+    def seed(self, city, values):
+        """Set the last known value per pollutant without notifying (startup)"""
+        with self._lock:
+            for pollutant, value in values.items():
+                if value is not None:
+                    self._last_values[(city, pollutant)] = float(value)
+
+    def evaluate(self, city, values, timestamp=None):
+        """Check one reading ({pollutant: value}) and queue a notification per crossed threshold"""
+        notifications = []
+        with self._lock:
+            self.stats['evaluated_readings'] += 1
+            for pollutant, value in values.items():
+                if value is None:
+                    continue
+                value = float(value)
+                previous = self._last_values.get((city, pollutant))
+                self._last_values[(city, pollutant)] = value
+                if previous is None or previous == value:
+                    continue
+                if value > previous:
+                    # Rising through a threshold: previous < threshold <= value
+                    index = self._indexes.get((city, pollutant, 'above'))
+                    crossed = index.crossed(previous, value, inclusive_high=True) if index else []
+                    direction = 'above'
+                else:
+                    # Falling below a threshold: value < threshold <= previous
+                    index = self._indexes.get((city, pollutant, 'below'))
+                    crossed = index.crossed(value, previous, inclusive_high=True) if index else []
+                    direction = 'below'
+                for subscription_id in crossed:
+                    subscription = self._subscriptions[subscription_id]
+                    notifications.append({
+                        'subscription_id': subscription_id,
+                        'city': city,
+                        'pollutant': pollutant,
+                        'direction': direction,
+                        'threshold': subscription.threshold,
+                        'previous': previous,
+                        'value': value,
+                        'timestamp': timestamp,
+                        'webhook': subscription.webhook
+                    })
+            self.stats['notifications'] += len(notifications)
+        for notification in notifications:
+            self._queue.put(notification)
+        if notifications:
+            self._ensure_worker()
+        return notifications
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._deliver, name='alert-delivery', daemon=True)
+            self._worker.start()
+
+    def _deliver(self):
+        while True:
+            notification = self._queue.get()
+            try:
+                self.sink.send(notification)
+            except Exception as e:
+                self.stats['delivery_errors'] += 1
+                print(f"Alert delivery failed for {notification['subscription_id']}: {e}")
+
+    def status(self):
+        with self._lock:
+            return dict(self.stats, subscriptions=len(self._subscriptions), pending=self._queue.qsize(),
+                        indexes={'/'.join(key): len(index) for key, index in self._indexes.items()})
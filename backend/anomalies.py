@@ -0,0 +1,231 @@
+"""
+Online anomaly detection over incoming hourly readings.
+
+Every (city, pollutant) pair keeps a small fixed-size state: a ring buffer
+of the last WINDOW readings with a sorted copy for a rolling median/MAD, an
+exponentially weighted mean and variance, and the length of the current run
+of identical values. Each reading costs O(WINDOW): a bisect insert/remove in
+the sorted copy, and for the MAD one merge outward from the median.
+The readings are checked against that state:
+
+- out_of_range: outside the physically plausible range of the pollutant
+- spike: far from the rolling median in MAD units (or from the EWMA when
+  the window is too flat for a MAD) and by more than a minimum jump
+- stuck: the same value repeated for at least the pollutant's stuck run,
+  reported as one event that grows while the run continues. Readings at or
+  below the pollutant's detection floor never count: instruments report
+  clean air as a repeated zero or floor value.
+
+Flagged readings are reported, not dropped; out-of-range values are kept
+out of the statistics so one glitch does not shift the baseline.
+"""
+
+from bisect import bisect_left, insort
+import math
+import threading
+from collections import deque
+
+# pollutant -> (lowest plausible, highest plausible, minimum spike jump, stuck run in hours,
+#               detection floor); ppm for gases, µg/m³ for particles
+POLLUTANT_LIMITS = {
+    'pm25': (0.0, 1000.0, 15.0, 6, 2.0),
+    'pm10': (0.0, 2000.0, 30.0, 6, 5.0),
+    'co': (-0.05, 50.0, 1.0, 24, 0.1),
+    'no': (-0.005, 2.0, 0.05, 12, 0.001),
+    'no2': (-0.005, 2.0, 0.05, 6, 0.001),
+    'nox': (-0.005, 4.0, 0.1, 6, 0.002),
+    'o3': (-0.005, 0.6, 0.05, 6, 0.002),
+    'so2': (-0.005, 1.0, 0.02, 24, 0.001)
+}
+KINDS = ('out_of_range', 'spike', 'stuck')
+# Scales the MAD to a standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+
+def _middle(ordered):
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def _median_deviation(ordered, median):
+    """Median of |x - median| over sorted values, merging both sides outward from the median"""
+    n = len(ordered)
+    right = bisect_left(ordered, median)
+    left = right - 1
+    deviations = []
+    while len(deviations) <= n // 2:
+        if right < n and (left < 0 or ordered[right] - median <= median - ordered[left]):
+            deviations.append(ordered[right] - median)
+            right += 1
+        else:
+            deviations.append(median - ordered[left])
+            left -= 1
+    return deviations[-1] if n % 2 else (deviations[-2] + deviations[-1]) / 2
+
+
+class PollutantState:
+    """Rolling statistics of one pollutant in one city"""
+
+    __slots__ = ('ring', 'ordered', 'position', 'count', 'ewma', 'ewma_var',
+                 'run_value', 'run_start', 'run_length', 'run_event')
+
+    def __init__(self, window):
+        self.ring = [0.0] * window
+        self.ordered = []
+        self.position = 0
+        self.count = 0
+        self.ewma = None
+        self.ewma_var = 0.0
+        self.run_value = None
+        self.run_start = None
+        self.run_length = 0
+        self.run_event = None
+
+    def median_mad(self):
+        median = _middle(self.ordered)
+        return median, _median_deviation(self.ordered, median)
+
+    def push(self, value, alpha):
+        if self.count == len(self.ring):
+            # The slot about to be overwritten holds the oldest reading
+            del self.ordered[bisect_left(self.ordered, self.ring[self.position])]
+        insort(self.ordered, value)
+        self.ring[self.position] = value
+        self.position = (self.position + 1) % len(self.ring)
+        self.count = min(self.count + 1, len(self.ring))
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            diff = value - self.ewma
+            increment = alpha * diff
+            self.ewma += increment
+            self.ewma_var = (1 - alpha) * (self.ewma_var + diff * increment)
+
+
+class AnomalyDetector:
+    """Per-city, per-pollutant detectors plus a bounded log of flagged events"""
+
+    def __init__(self, window=24, min_history=12, spike_z=6.0, alpha=0.1, max_events=500,
+                 limits=POLLUTANT_LIMITS):
+        self.window = window
+        self.min_history = min_history
+        self.spike_z = spike_z
+        self.alpha = alpha
+        self.max_events = max_events
+        self.limits = limits
+        self._states = {}
+        self._events = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, city_key, pollutant):
+        key = (city_key, pollutant)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = PollutantState(self.window)
+        return state
+
+    def _log(self, city_key, event):
+        events = self._events.get(city_key)
+        if events is None:
+            events = self._events[city_key] = deque(maxlen=self.max_events)
+        events.append(event)
+        counts = self._counts.setdefault(city_key, dict.fromkeys(KINDS, 0))
+        counts[event['kind']] += 1
+
+    def check(self, city_key, pollutant, epoch, value):
+        """Update one pollutant's state with a reading; returns the kinds it was flagged as"""
+        low, high, min_jump, stuck_run, floor = self.limits[pollutant]
+        state = self._state(city_key, pollutant)
+        flags = []
+
+        if value < low or value > high:
+            self._log(city_key, {'kind': 'out_of_range', 'pollutant': pollutant, 'epoch': epoch,
+                                 'value': value, 'range': [low, high]})
+            return ['out_of_range']
+
+        if state.count >= self.min_history:
+            median, mad = state.median_mad()
+            deviation = abs(value - median)
+            robust_z = deviation / (MAD_SCALE * mad) if mad > 0 else None
+            ewma_std = state.ewma_var ** 0.5
+            ewma_z = abs(value - state.ewma) / ewma_std if ewma_std > 0 else None
+            # A flat window has no MAD; fall back to the EWMA spread
+            z = robust_z if robust_z is not None else ewma_z
+            if z is not None and z > self.spike_z and deviation >= min_jump:
+                flags.append('spike')
+                self._log(city_key, {
+                    'kind': 'spike', 'pollutant': pollutant, 'epoch': epoch, 'value': value,
+                    'median': round(median, 4), 'mad': round(mad, 4), 'ewma': round(state.ewma, 4),
+                    'robust_z': None if robust_z is None else round(robust_z, 2),
+                    'ewma_z': None if ewma_z is None else round(ewma_z, 2)
+                })
+
+        if value <= floor:
+            state.run_value, state.run_start, state.run_length, state.run_event = None, None, 0, None
+        elif value == state.run_value:
+            state.run_length += 1
+        else:
+            state.run_value, state.run_start, state.run_length, state.run_event = value, epoch, 1, None
+        if state.run_length >= stuck_run:
+            flags.append('stuck')
+            if state.run_event is None:
+                state.run_event = {'kind': 'stuck', 'pollutant': pollutant, 'epoch': state.run_start,
+                                   'value': value, 'hours': state.run_length, 'end_epoch': epoch}
+                self._log(city_key, state.run_event)
+            else:
+                state.run_event['hours'] = state.run_length
+                state.run_event['end_epoch'] = epoch
+
+        state.push(value, self.alpha)
+        return flags
+
+    def observe(self, city_key, records, epochs):
+        """Check a batch of readings (oldest first); returns how many readings were flagged"""
+        flagged = 0
+        with self._lock:
+            for record, epoch in zip(records, epochs):
+                hit = False
+                for pollutant in self.limits:
+                    raw = record.get(pollutant)
+                    if raw in (None, ''):
+                        continue
+                    try:
+                        value = float(raw)
+                    except (TypeError, ValueError):
+                        continue
+                    if math.isnan(value):
+                        continue
+                    hit = bool(self.check(city_key, pollutant, int(epoch), value)) or hit
+                flagged += hit
+        return flagged
+
+    def events(self, city_key, kind=None, pollutant=None, limit=100):
+        """Flagged events of a city, newest first"""
+        with self._lock:
+            events = [dict(event) for event in reversed(self._events.get(city_key, ()))
+                      if (kind is None or event['kind'] == kind)
+                      and (pollutant is None or event['pollutant'] == pollutant)]
+        return events[:limit]
+
+    def state(self, city_key):
+        """Current median/MAD/EWMA and run length of each pollutant of a city"""
+        summary = {}
+        with self._lock:
+            for (state_city, pollutant), state in self._states.items():
+                if state_city != city_key or state.count == 0:
+                    continue
+                median, mad = state.median_mad()
+                summary[pollutant] = {
+                    'median': round(median, 4),
+                    'mad': round(mad, 4),
+                    'ewma': round(state.ewma, 4),
+                    'ewma_std': round(state.ewma_var ** 0.5, 4),
+                    'run_length': state.run_length,
+                    'window_readings': state.count
+                }
+        return summary
+
+    def status(self):
+        with self._lock:
+            return {city_key: dict(counts) for city_key, counts in self._counts.items()}
@@ -4,75 +4,285 @@ AirGuard Full Stack Application - Simplified Version
 Serves both React frontend and Flask backend API
 """
 
-from flask import Flask, jsonify, send_from_directory
+import os
+import socket
+
+# Run as a script, the listening socket is bound before the heavy imports below
+# (flask, numpy, ...), so the port opens within milliseconds; connections wait in
+# the backlog until the server starts accepting them
+LISTEN_SOCKET = None
+if __name__ == '__main__' and os.environ.get('EARLY_BIND', '1') == '1':
+    try:
+        LISTEN_SOCKET = socket.create_server(('0.0.0.0', int(os.environ.get('PORT', 5000))), backlog=128)
+    except OSError as e:
+        print(f"Could not bind the port before startup ({e}); binding when the server starts")
+
+from flask import Flask, Response, g, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
+from contextlib import ExitStack
 import csv
-import os
-from datetime import datetime
+import hashlib
+import itertools
+import math
+import threading
+import time
+from datetime import datetime, timezone
 import random
 
+import numpy as np
+
+from batch_predict import run_grouped
+from prediction_cache import PredictionCache
+from downsampling import WindowCache, downsample_records
+from timeseries import INVALID_EPOCH, normalize_records, parse_timestamps_utc, to_float_column
+from model_manager import ModelManager
+from storage import CSV_DATASETS, STORE_COLUMNS, SqliteStore
+from parallel_load import load_tables
+from admission import AdmissionController
+from ingest import RealtimeIngestor
+from online_training import OnlineTrainer, feature_column, labelled_rows
+from accuracy import AccuracyTracker
+from access_log import AccessLog
+from aqi import pollutant_aqi
+from alerts import AQI_BANDS, DIRECTIONS, AlertEngine, SubscriptionStore, check_webhook, sink_from_env
+from intervals import QUANTILES, ResidualQuantiles
+from anomalies import KINDS as ANOMALY_KINDS, POLLUTANT_LIMITS, AnomalyDetector
+from memory import MemoryAccounting, MemoryProfiler
+from readiness import Readiness, StatusTicker
+from retention import TieredHistory, policy_from_env
+from stations import CATALOG_FILE, StationCatalog
+from surface import (MAX_ZOOM, METRO_BOUNDS, aqi_from_pm25, colorize, compute_surface, encode_grid, encode_png,
+                     surface_inputs)
+from export import (EXPORT_CHUNK_ROWS, FORMATS, gzip_stream, iter_list_chunks, iter_table_chunks,
+                    parse_range_header, parse_time_param, serialize, slice_stream, stream_length)
+
 app = Flask(__name__, static_folder='../build', static_url_path='')
 CORS(app)  # Enable CORS for React frontend
 
+# Request log for traffic replay (scripts/replay_carga.py), off unless ACCESS_LOG_PATH is set
+ACCESS_LOG = AccessLog(os.environ['ACCESS_LOG_PATH']) if os.environ.get('ACCESS_LOG_PATH') else None
+
+@app.before_request
+def start_request_timer():
+    if ACCESS_LOG is not None:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_access(response):
+    # Streamed bodies are timed up to their first chunk and logged with -1 bytes
+    if ACCESS_LOG is not None:
+        started = g.get('request_started')
+        duration_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        ACCESS_LOG.record(client_ip(), request.method, request.full_path.rstrip('?'), response.status_code,
+                          duration_ms, None if response.is_streamed else response.content_length)
+    return response
+
+# Per-IP token bucket for the API plus a bounded gate for expensive routes
+ADMISSION = AdmissionController(
+    rate_per_minute=int(os.environ.get('RATE_LIMIT_PER_MINUTE', 120)),
+    burst=int(os.environ.get('RATE_LIMIT_BURST', 30)),
+    max_concurrent=int(os.environ.get('MAX_CONCURRENT_HEAVY', 4)),
+    max_queue=int(os.environ.get('MAX_QUEUED_HEAVY', 8)),
+    queue_timeout=float(os.environ.get('HEAVY_QUEUE_TIMEOUT', 2.0))
+)
+# Probes use a reserved lane: never rate limited, never queued
+PROBE_PATHS = {'/api/health', '/api/metrics'}
+HEAVY_ENDPOINTS = {'predict_air_quality', 'predict_batch', 'get_historical_data', 'export_history'}
+# Render terminates TLS in front of the app, so the client IP is the first X-Forwarded-For hop
+TRUST_PROXY_HEADERS = os.environ.get('TRUST_PROXY_HEADERS', '1') == '1'
+
+def client_ip():
+    forwarded = request.headers.get('X-Forwarded-For') if TRUST_PROXY_HEADERS else None
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+@app.before_request
+def admit_request():
+    """Reject over-limit clients with 429 and overflow on heavy routes with 503"""
+    if not request.path.startswith('/api/') or request.path in PROBE_PATHS or request.method == 'OPTIONS':
+        return None
+    
+    allowed, retry_after = ADMISSION.check_rate(client_ip())
+    if not allowed:
+        response = jsonify({"error": "Too many requests."})
+        response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+        return response, 429
+    
+    if request.endpoint in HEAVY_ENDPOINTS:
+        reason = ADMISSION.enter()
+        if reason:
+            response = jsonify({"error": "Server busy, try again shortly.", "reason": reason})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        g.admission_slot = True
+    return None
+
+@app.teardown_request
+def release_admission_slot(exc=None):
+    # Streamed responses keep the request context until the body is fully sent
+    if g.pop('admission_slot', False):
+        ADMISSION.leave()
+
 # Global data storage
 DATA_FILES = {}
+# Same data normalized to a regular hourly UTC grid (see timeseries.py)
+HOURLY_SERIES = {}
 
-def load_csv_data():
-    """Load CSV data files with historical data"""
-    global DATA_FILES
+# Numeric columns carried over to the hourly grid
+SERIES_FIELDS = [
+    'temperature_2m', 'relativehumidity_2m', 'precipitation', 'pressure_msl',
+    'windspeed_10m', 'winddirection_10m', 'boundary_layer_height', 'shortwave_radiation_sum',
+    'hour_of_day', 'day_of_week', 'month_of_year', 'is_weekend',
+    'co', 'no', 'no2', 'nox', 'o3', 'pm10', 'pm25', 'so2'
+]
+
+# Historical dataset of each city, looked up in DATA_DIRS
+CSV_SOURCES = {
+    'cdmx': ('CDMX', CSV_DATASETS['cdmx']),
+    'la': ('LA', CSV_DATASETS['la'])
+}
+DATA_DIRS = ['data', '../data', './backend/data']
+
+# 'csv' keeps everything in memory; 'sqlite' serves history from an on-disk store
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'csv').lower()
+STORAGE_PATH = os.environ.get('STORAGE_PATH', os.path.join('data', 'airguard.db'))
+# Hours of recent history kept in memory with the sqlite backend (0 = all)
+STORAGE_HOT_HOURS = int(os.environ.get('STORAGE_HOT_HOURS', 0))
+STORE = None
+# Parse city datasets in parallel worker processes into columnar tables
+PARALLEL_LOAD = os.environ.get('PARALLEL_LOAD', '1') == '1'
+# Raw history older than RETENTION_HOT_DAYS moves to daily rollups and cold partitions (0 = keep all hot)
+TIERS = TieredHistory(os.environ.get('RETENTION_DIR', os.path.join('data', 'tiers')), policy_from_env(CSV_SOURCES))
+RETENTION_COMPACT_SECONDS = int(os.environ.get('RETENTION_COMPACT_SECONDS', 3600))
+# Serializes ingest appends with the compaction swap of DATA_FILES entries
+DATA_LOCK = threading.Lock()
+
+def find_csv_path(filename):
+    """First existing location of a dataset file, or None"""
+    for directory in DATA_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+def bundled_dataset_end(city_key):
+    """UTC epoch of the last row of a city's bundled dataset, or None.
     
-    try:
-        # Try multiple possible paths for the data files
-        possible_paths = [
-            'data/dataset_final_cdmx_limpio.csv',
-            '../data/dataset_final_cdmx_limpio.csv',
-            './backend/data/dataset_final_cdmx_limpio.csv'
-        ]
-        
-        cdmx_loaded = False
-        for path in possible_paths:
-            if os.path.exists(path):
-                DATA_FILES['cdmx'] = []
-                with open(path, 'r', encoding='utf-8') as file:
-                    reader = csv.DictReader(file)
-                    for row in reader:
-                        DATA_FILES['cdmx'].append(row)
-                print(f"CDMX historical data loaded from {path}: {len(DATA_FILES['cdmx'])} records")
-                cdmx_loaded = True
-                break
-        
-        if not cdmx_loaded:
-            print("Warning: CDMX data file not found, creating sample data")
-            DATA_FILES['cdmx'] = create_sample_data('CDMX')
-        
-        # Load LA data
-        la_paths = [
-            'data/dataset_final_LA_limpio.csv',
-            '../data/dataset_final_LA_limpio.csv',
-            './backend/data/dataset_final_LA_limpio.csv'
-        ]
+    Artifacts that do not record trained_until are assumed to have been fit on
+    the whole bundled dataset, so only later hours are held out for them.
+    """
+    path = find_csv_path(CSV_SOURCES[city_key][1]) if city_key in CSV_SOURCES else None
+    if path is None:
+        return None
+    with open(path, 'rb') as file:
+        file.seek(max(0, os.path.getsize(path) - 4096))
+        lines = file.read().decode('utf-8', errors='replace').splitlines()
+    epoch = parse_timestamps_utc([lines[-1].split(',')[0]])[0] if lines else INVALID_EPOCH
+    return None if epoch == INVALID_EPOCH else int(epoch)
+
+def read_csv_records(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+def load_from_store():
+    """Load each city's hot window from the store, migrating its CSV on first use"""
+    global STORE
+    STORE = SqliteStore(STORAGE_PATH)
+    
+    for city_key, (label, filename) in CSV_SOURCES.items():
+        if STORE.count(city_key) == 0:
+            path = find_csv_path(filename)
+            if path:
+                written = STORE.migrate_csv(city_key, path)
+                print(f"{label} historical data migrated from {path} into {STORAGE_PATH}: {written} records")
         
-        la_loaded = False
-        for path in la_paths:
-            if os.path.exists(path):
-                DATA_FILES['la'] = []
-                with open(path, 'r', encoding='utf-8') as file:
-                    reader = csv.DictReader(file)
-                    for row in reader:
-                        DATA_FILES['la'].append(row)
-                print(f"LA historical data loaded from {path}: {len(DATA_FILES['la'])} records")
-                la_loaded = True
-                break
+        if STORAGE_HOT_HOURS > 0:
+            _, last_ts = STORE.bounds(city_key)
+            start = last_ts - (STORAGE_HOT_HOURS - 1) * 3600 if last_ts is not None else None
+            records = STORE.query(city_key, start=start)
+        else:
+            records = STORE.query(city_key)
         
-        if not la_loaded:
-            print("Warning: LA data file not found, creating sample data")
-            DATA_FILES['la'] = create_sample_data('LA')
+        if records:
+            DATA_FILES[city_key] = records
+            print(f"{label} historical data loaded from {STORAGE_PATH}: {len(records)} records")
+        else:
+            print(f"Warning: {label} has no stored data, creating sample data")
+            DATA_FILES[city_key] = create_sample_data(label)
+
+def load_csv_data():
+    """Load CSV data files with historical data"""
+    try:
+        if STORAGE_BACKEND == 'sqlite':
+            load_from_store()
+        elif PARALLEL_LOAD:
+            paths = {}
+            for city_key, (label, filename) in CSV_SOURCES.items():
+                path = TIERS.boot_path(city_key, find_csv_path(filename))
+                if path:
+                    paths[city_key] = path
+                else:
+                    print(f"Warning: {label} data file not found, creating sample data")
+                    DATA_FILES[city_key] = create_sample_data(label)
+            
+            for city_key, table in load_tables(paths).items():
+                DATA_FILES[city_key] = table
+                print(f"{CSV_SOURCES[city_key][0]} historical data loaded from {paths[city_key]}: {len(table)} records")
+        else:
+            for city_key, (label, filename) in CSV_SOURCES.items():
+                path = TIERS.boot_path(city_key, find_csv_path(filename))
+                if path:
+                    DATA_FILES[city_key] = read_csv_records(path)
+                    print(f"{label} historical data loaded from {path}: {len(DATA_FILES[city_key])} records")
+                else:
+                    print(f"Warning: {label} data file not found, creating sample data")
+                    DATA_FILES[city_key] = create_sample_data(label)
             
     except Exception as e:
         print(f"Error loading data: {e}")
         # Create fallback data
-        DATA_FILES['cdmx'] = create_sample_data('CDMX')
-        DATA_FILES['la'] = create_sample_data('LA')
+        for city_key, (label, _) in CSV_SOURCES.items():
+            DATA_FILES[city_key] = create_sample_data(label)
+    
+    build_hourly_series()
+
+SERIES_FILL = os.environ.get('SERIES_FILL', 'ffill')
+SERIES_FILL_LIMIT = int(os.environ.get('SERIES_FILL_LIMIT', 3))
+
+def build_city_series(city_key):
+    """Normalize one city's records onto the hourly UTC grid"""
+    series = normalize_records(DATA_FILES[city_key], SERIES_FIELDS, fill=SERIES_FILL, fill_limit=SERIES_FILL_LIMIT)
+    HOURLY_SERIES[city_key] = series
+    return series
+
+def build_hourly_series():
+    """Normalize every loaded city to UTC and report gaps and duplicates"""
+    for city_key in DATA_FILES:
+        series = build_city_series(city_key)
+        report = series.report
+        if report['gaps'] or report['duplicates'] or report['invalid_timestamps']:
+            print(f"{city_key.upper()} data quality: {len(report['gaps'])} gaps "
+                  f"({report['missing_steps']} missing hours), {report['duplicates']} duplicates, "
+                  f"{report['invalid_timestamps']} invalid timestamps")
+
+def data_quality_summary(city_key):
+    """Compact gap/duplicate report for status endpoints"""
+    series = HOURLY_SERIES.get(city_key)
+    if series is None:
+        return None
+    report = series.report
+    return {
+        'records': report['records'],
+        'hours_on_grid': len(series),
+        'gaps': len(report['gaps']),
+        'missing_hours': report['missing_steps'],
+        'duplicates': report['duplicates'],
+        'out_of_order': report['out_of_order'],
+        'invalid_timestamps': report['invalid_timestamps'],
+        'start_utc': datetime.fromtimestamp(series.start, timezone.utc).isoformat(),
+        'end_utc': datetime.fromtimestamp(series.end, timezone.utc).isoformat()
+    }
 
 def create_sample_data(city):
     """Create sample data if CSV files are not available"""
@@ -116,6 +326,215 @@ def calculate_aqi(pm25):
     except:
         return 0
 
+# Model serving each city; cities that share a model are predicted together
+CITY_MODELS = {'cdmx': 'cdmx', 'la': 'la'}
+
+# Versioned LightGBM artifacts, warmed up at startup and hot-swappable
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r') or None
+# Feature rows carry the stored columns (lags are filled in by build_feature_row);
+# an artifact asking for anything else is refused at load and publish
+MODEL_MANAGER = ModelManager(MODEL_DIR, mmap_mode=MODEL_MMAP_MODE, available_features=STORE_COLUMNS,
+                             training_cutoff=bundled_dataset_end,
+                             keep_versions=int(os.environ.get('MODEL_KEEP_VERSIONS', 2)))
+
+# Pollutants forecast next to PM2.5 (models from scripts/entrenar_contaminantes.py);
+# a pollutant without a model for a city is forecast as its current value
+FORECAST_POLLUTANTS = ['co', 'no', 'no2', 'nox', 'o3', 'so2', 'pm10']
+FORECAST_TARGETS = ['pm25'] + FORECAST_POLLUTANTS
+POLLUTANT_MODELS = {target: ModelManager(MODEL_DIR, mmap_mode=MODEL_MMAP_MODE, target=target,
+                                          available_features=STORE_COLUMNS, training_cutoff=bundled_dataset_end)
+                    for target in FORECAST_POLLUTANTS}
+
+LAG_HOURS = [3, 6, 12, 24]
+
+def get_model_key(city_key):
+    """Model key used to group a city's rows into one predict call"""
+    return CITY_MODELS.get(city_key, city_key)
+
+def build_feature_row(city_key, record):
+    """Complete a record with PM2.5 lag features looked up on the hourly grid"""
+    row = dict(record)
+    series = HOURLY_SERIES.get(city_key)
+    missing = [hours for hours in LAG_HOURS if not row.get(f'pm25_lag_{hours}h')]
+    if series is None or not missing:
+        return row
+    
+    epoch = parse_timestamps_utc([row.get('timestamp', '')])[0]
+    for hours in missing:
+        value = series.value_at('pm25', epoch - hours * 3600)
+        row[f'pm25_lag_{hours}h'] = value if value is not None and not np.isnan(value) else None
+    return row
+
+def predict_pm25_rows(model_key, rows):
+    """Predict PM2.5 24h ahead for a batch of feature rows in one vectorized call"""
+    with MODEL_MANAGER.acquire(model_key) as model:
+        if model is not None:
+            return model.predict(rows)
+    
+    current = np.array([float(row.get('pm25') or 0) for row in rows])
+    # Fallback without a model: latest PM2.5 value with small random variation
+    variation = np.random.uniform(-0.1, 0.1, size=current.shape[0])  # -10% to +10%
+    return current * (1 + variation)
+
+def current_values(rows, target):
+    """One pollutant of each row as floats, NaN where missing"""
+    return np.array([float(row.get(target)) if row.get(target) not in (None, '') else np.nan
+                     for row in rows], dtype=float)
+
+def predict_forecast_rows(model_key, rows):
+    """Predict every FORECAST_TARGETS column 24h ahead; returns a (rows, targets) matrix.
+    
+    The feature matrix is built once and shared by all models trained on the
+    same columns, so each extra pollutant only costs its own predict call.
+    Columns stay NaN for pollutants the rows do not carry.
+    """
+    predicted = np.full((len(rows), len(FORECAST_TARGETS)), np.nan)
+    managers = [MODEL_MANAGER] + [POLLUTANT_MODELS[target] for target in FORECAST_POLLUTANTS]
+    matrices = {}
+    missing = []
+    with ExitStack() as stack:
+        for column, manager in enumerate(managers):
+            model = stack.enter_context(manager.acquire(model_key))
+            if model is None:
+                missing.append(column)
+                continue
+            names = tuple(model.feature_names)
+            if names not in matrices:
+                matrices[names] = model.feature_matrix(rows)
+            predicted[:, column] = model.predict_matrix(matrices[names])
+    
+    for column in missing:
+        target = FORECAST_TARGETS[column]
+        predicted[:, column] = predict_pm25_rows(model_key, rows) if target == 'pm25' else current_values(rows, target)
+    return predicted
+
+def combined_aqi(values):
+    """Worst AQI sub-index over {pollutant: value}; returns (aqi, dominant pollutant)"""
+    worst = (None, None)
+    for pollutant, value in values.items():
+        aqi = calculate_aqi(value) if pollutant == 'pm25' else pollutant_aqi(pollutant, value)
+        if aqi is not None and (worst[0] is None or aqi > worst[0]):
+            worst = (aqi, pollutant)
+    return worst
+
+# Residual quantiles per (city, target), refit on the most recent held-out labelled hours
+INTERVAL_CALIBRATION_HOURS = int(os.environ.get('INTERVAL_CALIBRATION_HOURS', 720))
+INTERVAL_MIN_SAMPLES = int(os.environ.get('INTERVAL_MIN_SAMPLES', 48))
+# Ingested rows after which a city's intervals are refit (one new hour barely moves 720 residuals)
+INTERVAL_REFRESH_ROWS = int(os.environ.get('INTERVAL_REFRESH_ROWS', 24))
+INTERVALS = {}
+# city_key -> rows ingested since its last calibration
+UNCALIBRATED_ROWS = {}
+
+def calibrate_intervals(city_key):
+    """Refit the residual quantiles of every target of a city with its active models.
+    
+    Only labels after the model's trained_until count: residuals on training
+    rows are too small and give intervals that are too narrow. A target
+    without a model is forecast as its current value, so all of its rows are
+    held out. Until INTERVAL_MIN_SAMPLES held-out hours exist the target has
+    no interval.
+    """
+    series = HOURLY_SERIES.get(city_key)
+    if series is None:
+        return
+    UNCALIBRATED_ROWS[city_key] = 0
+    managers = [MODEL_MANAGER] + [POLLUTANT_MODELS[target] for target in FORECAST_POLLUTANTS]
+    for target, manager in zip(FORECAST_TARGETS, managers):
+        with manager.acquire(get_model_key(city_key)) as model:
+            names = list(model.feature_names) if model is not None else []
+            rows = labelled_rows(series, INTERVAL_CALIBRATION_HOURS, PREDICTION_HORIZON_HOURS, target)
+            if model is not None:
+                cutoff = model.trained_until if model.trained_until is not None else np.iinfo(np.int64).max
+                rows = rows[series.epochs()[rows + PREDICTION_HORIZON_HOURS] > cutoff]
+            # The last column is the current value, which is the forecast when there is no model
+            X = np.column_stack([feature_column(series, name)[rows] for name in names + [target]])
+            actual = series.columns[target][rows + PREDICTION_HORIZON_HOURS]
+            predicted = model.predict_matrix(X[:, :-1]) if model is not None else X[:, -1]
+        finite = np.count_nonzero(np.isfinite(predicted) & np.isfinite(actual))
+        if finite < INTERVAL_MIN_SAMPLES:
+            INTERVALS.pop((city_key, target), None)
+            continue
+        INTERVALS[(city_key, target)] = ResidualQuantiles(predicted, actual, QUANTILES)
+
+def forecast_intervals(city_key, predicted):
+    """(rows, targets, quantiles) bounds for a predict_forecast_rows matrix; NaN where uncalibrated"""
+    bounds = np.full(predicted.shape + (len(QUANTILES),), np.nan)
+    for column, target in enumerate(FORECAST_TARGETS):
+        calibration = INTERVALS.get((city_key, target))
+        if calibration is not None:
+            bounds[:, column] = calibration.apply(predicted[:, column], lower=0.0)
+    return bounds
+
+def format_interval(bounds, digits, transform=None):
+    """{'p10': ..., 'p50': ..., 'p90': ...} of one target's bounds, or None"""
+    if np.isnan(bounds).any():
+        return None
+    return {f"p{round(q * 100)}": transform(value) if transform else round(float(value), digits)
+            for q, value in zip(QUANTILES, bounds)}
+
+def format_prediction(city_key, record, predicted, bounds=None):
+    """Build the prediction payload for one feature row, its predictions and their interval bounds"""
+    if bounds is None:
+        bounds = np.full((len(FORECAST_TARGETS), len(QUANTILES)), np.nan)
+    current = {target: current_values([record], target)[0] for target in FORECAST_TARGETS}
+    current = {target: float(value) for target, value in current.items() if not np.isnan(value)}
+    current_pm25 = current.get('pm25', 0.0)
+    predicted_pm25 = float(predicted[0])
+    forecast = {target: float(value) for target, value in zip(FORECAST_TARGETS, predicted)
+                if not np.isnan(value)}
+    aqi_current, dominant_current = combined_aqi(current)
+    aqi_predicted, dominant_predicted = combined_aqi(forecast)
+    timestamp = record.get('timestamp', datetime.now().isoformat())
+    return {
+        'pm25_current': round(current_pm25, 2),
+        'pm25_predicted_24h': round(predicted_pm25, 2),
+        'aqi_current': calculate_aqi(current_pm25),
+        'aqi_predicted_24h': calculate_aqi(predicted_pm25),
+        'pm25_interval_24h': format_interval(bounds[0], 2),
+        'aqi_interval_24h': format_interval(bounds[0], 0, calculate_aqi),
+        'pollutants': {
+            target: {
+                'current': round(current[target], 4) if target in current else None,
+                'predicted_24h': round(value, 4),
+                'interval_24h': format_interval(bounds[FORECAST_TARGETS.index(target)], 4),
+                'aqi_predicted_24h': calculate_aqi(value) if target == 'pm25' else pollutant_aqi(target, value)
+            }
+            for target, value in forecast.items()
+        },
+        'aqi_combined_current': aqi_current,
+        'aqi_combined_predicted_24h': aqi_predicted,
+        'dominant_pollutant_current': dominant_current,
+        'dominant_pollutant_predicted_24h': dominant_predicted,
+        'timestamp': timestamp,
+        'prediction_timestamp': datetime.now().isoformat(),
+        'city': city_key.upper(),
+        'base_timestamp': timestamp
+    }
+
+# Served forecasts, joined with the readings that arrive 24h later
+PREDICTION_HORIZON_HOURS = 24
+ACCURACY = AccuracyTracker(
+    capacity=int(os.environ.get('ACCURACY_CAPACITY', 4096)),
+    window=int(os.environ.get('ACCURACY_WINDOW', 168))
+)
+
+def backfill_accuracy(city_key, hours):
+    """Score the active model on the last `hours` hours so accuracy is known at startup"""
+    data = DATA_FILES.get(city_key)
+    series = HOURLY_SERIES.get(city_key)
+    if not data or series is None or hours <= 0:
+        return 0
+    window = data[-(hours + PREDICTION_HORIZON_HOURS):]
+    rows = [build_feature_row(city_key, record) for record in window]
+    predictions = predict_pm25_rows(get_model_key(city_key), rows)
+    base_epochs = parse_timestamps_utc([record.get('timestamp', '') for record in window])
+    for base_epoch, predicted in zip(base_epochs, predictions):
+        ACCURACY.record(city_key, base_epoch, PREDICTION_HORIZON_HOURS, predicted)
+    observed = series.observed
+    return ACCURACY.observe(city_key, series.epochs()[observed], series.columns['pm25'][observed])
+
 def get_latest_prediction(city_key):
     """Get latest prediction based on historical data"""
     if city_key not in DATA_FILES or not DATA_FILES[city_key]:
@@ -125,38 +544,568 @@ def get_latest_prediction(city_key):
     latest = data[-1]  # Get last record
     
     try:
-        current_pm25 = float(latest.get('pm25', 0))
-        # Simple prediction: use latest PM2.5 value with small random variation
-        variation = random.uniform(-0.1, 0.1)  # -10% to +10%
-        predicted_pm25 = current_pm25 * (1 + variation)
-        
-        return {
-            'pm25_current': round(current_pm25, 2),
-            'pm25_predicted_24h': round(predicted_pm25, 2),
-            'aqi_current': calculate_aqi(current_pm25),
-            'aqi_predicted_24h': calculate_aqi(predicted_pm25),
-            'timestamp': latest.get('timestamp', datetime.now().isoformat()),
-            'prediction_timestamp': datetime.now().isoformat(),
-            'city': city_key.upper(),
-            'base_timestamp': latest.get('timestamp', datetime.now().isoformat())
-        }, None
+        features = build_feature_row(city_key, latest)
+        predicted = predict_forecast_rows(get_model_key(city_key), [features])
+        bounds = forecast_intervals(city_key, predicted)
+        base_epoch = parse_timestamps_utc([latest.get('timestamp', '')])[0]
+        ACCURACY.record(city_key, base_epoch, PREDICTION_HORIZON_HOURS, predicted[0, 0])
+        return format_prediction(city_key, latest, predicted[0], bounds[0]), None
     except Exception as e:
         return None, f"Error processing data: {e}"
 
-# API Routes
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        'status': 'ok',
+def resolve_city_key(city):
+    """Map a city name from the URL to its DATA_FILES key"""
+    city_lower = city.lower()
+    
+    if "cdmx" in city_lower or "mexicocity" in city_lower:
+        return "cdmx"
+    elif "la" in city_lower or "losangeles" in city_lower:
+        return "la"
+    return None
+
+def get_data_version(city_key):
+    """Cheap fingerprint of a city's data, used to detect new records"""
+    data = DATA_FILES.get(city_key) or []
+    return len(data), data[-1].get('timestamp') if data else None
+
+# Predictions are served from cache and recomputed in the background once
+# they pass their TTL or the underlying data changes
+PREDICTION_CACHE = PredictionCache(
+    get_latest_prediction,
+    get_data_version,
+    ttl_seconds=int(os.environ.get('PREDICTION_CACHE_TTL', 300))
+)
+
+# Stations discovered by the collectors, plus one reference point per city dataset
+STATION_CATALOG = StationCatalog(find_csv_path(CATALOG_FILE) or os.path.join(DATA_DIRS[0], CATALOG_FILE))
+CITY_COORDINATES = {
+    'cdmx': (19.4326, -99.1332),
+    'la': (34.05, -118.24)
+}
+
+def sync_city_stations(city_keys=None):
+    """Expose each city dataset's latest PM2.5 as a station (kept in memory only)"""
+    for city_key, (lat, lon) in CITY_COORDINATES.items():
+        data = DATA_FILES.get(city_key)
+        if not data or (city_keys is not None and city_key not in city_keys):
+            continue
+        latest = data[-1]
+        station = STATION_CATALOG.upsert({'id': f'dataset-{city_key}', 'name': f'{CSV_SOURCES[city_key][0]} dataset',
+                                          'lat': lat, 'lon': lon, 'city': city_key, 'source': 'dataset'})
+        pm25 = latest.get('pm25')
+        if pm25 not in (None, ''):
+            STATION_CATALOG.record_reading(station['id'], float(pm25), str(latest.get('timestamp')))
+
+# Interpolated map surfaces, keyed by the catalog version they were computed from
+SURFACE_CACHE = WindowCache(max_entries=4 * (MAX_ZOOM + 1) * len(METRO_BOUNDS))
+GRID_FORMATS = {
+    'json': 'application/json',
+    'bin': 'application/octet-stream',
+    'png': 'image/png'
+}
+
+def get_surface(city_key, zoom):
+    """Cached surface for the current station readings, computing it on first use"""
+    inputs = surface_inputs(STATION_CATALOG, city_key)
+    key = (city_key, zoom, inputs[1])
+    cached = SURFACE_CACHE.get(key)
+    if cached is None:
+        cached = (compute_surface(STATION_CATALOG, city_key, zoom, inputs=inputs), {})
+        SURFACE_CACHE.put(key, cached)
+    return cached
+
+def refresh_surfaces(city_keys=None):
+    """Recompute every zoom level of the cities whose readings changed (all by default)"""
+    for city_key in (METRO_BOUNDS if city_keys is None else city_keys):
+        for zoom in range(MAX_ZOOM + 1):
+            get_surface(city_key, zoom)
+
+def encode_surface(surface, fmt):
+    if fmt == 'png':
+        return encode_png(colorize(surface.pm25))
+    if fmt == 'bin':
+        return encode_grid(surface.pm25)
+    payload = surface.describe()
+    payload['pm25'] = [[None if np.isnan(v) else round(float(v), 1) for v in row] for row in surface.pm25]
+    payload['aqi'] = [[None if np.isnan(v) else int(v) for v in row] for row in aqi_from_pm25(surface.pm25)]
+    return jsonify(payload).get_data()
+
+# Collector output polled for new hourly readings
+REALTIME_SOURCES = {
+    'cdmx': 'datos_realtime_Centro_CDMX.csv',
+    'la': 'datos_realtime_Centro_LA.csv'
+}
+INGESTOR = RealtimeIngestor(
+    {city_key: find_csv_path(filename) for city_key, filename in REALTIME_SOURCES.items()},
+    poll_seconds=int(os.environ.get('REALTIME_POLL_SECONDS', 300))
+)
+
+# Warm-start updates of the active models from the newly labelled hours
+ONLINE_TRAINER = OnlineTrainer(
+    MODEL_MANAGER,
+    HOURLY_SERIES.get,
+    window_hours=int(os.environ.get('ONLINE_WINDOW_HOURS', 168)),
+    extra_trees=int(os.environ.get('ONLINE_EXTRA_TREES', 25)),
+    min_new_labels=int(os.environ.get('ONLINE_MIN_NEW_LABELS', 6)),
+    max_trees=int(os.environ.get('ONLINE_MAX_TREES', 2000))
+)
+
+def refresh_city_predictions(city_key):
+    """Recalibrate intervals and drop cached predictions after a city's models change"""
+    calibrate_intervals(city_key)
+    PREDICTION_CACHE.invalidate(city_key)
+
+ONLINE_TRAINER.on_publish = refresh_city_predictions
+
+# Stuck sensors, spikes and out-of-range values in the readings
+ANOMALIES = AnomalyDetector(
+    window=int(os.environ.get('ANOMALY_WINDOW', 24)),
+    spike_z=float(os.environ.get('ANOMALY_SPIKE_Z', 6.0)),
+    max_events=int(os.environ.get('ANOMALY_MAX_EVENTS', 500))
+)
+
+def scan_recent_anomalies(city_key, hours):
+    """Seed the detector with the last `hours` loaded readings so live checks have a baseline"""
+    data = DATA_FILES.get(city_key)
+    if not data or hours <= 0:
+        return 0
+    window = data[-hours:]
+    epochs = parse_timestamps_utc([record.get('timestamp', '') for record in window])
+    return ANOMALIES.observe(city_key, window, epochs)
+
+def detect_anomalies(city_key, records, epochs):
+    """Check new readings before anything else consumes them"""
+    flagged = ANOMALIES.observe(city_key, records, epochs)
+    if flagged:
+        print(f"{city_key.upper()}: {flagged} of {len(records)} new readings flagged as anomalous")
+
+# Threshold subscriptions on AQI and pollutant readings
+ALERT_POLLUTANTS = ('aqi',) + tuple(POLLUTANT_LIMITS)
+ALERTS = AlertEngine(
+    SubscriptionStore(os.environ.get('ALERTS_PATH', os.path.join('data', 'alerts.db'))),
+    sink_from_env(os.environ.get('ALERT_SINK', 'log'), path=os.environ.get('ALERT_SINK_PATH'),
+                  url=os.environ.get('ALERT_WEBHOOK_URL')),
+    max_subscriptions=int(os.environ.get('ALERT_MAX_SUBSCRIPTIONS', 100000))
+)
+# Webhook hosts anyone may subscribe with; other hosts need the admin token
+ALERT_WEBHOOK_HOSTS = {host.strip().lower() for host in os.environ.get('ALERT_WEBHOOK_HOSTS', '').split(',')
+                       if host.strip()}
+
+def alert_values(record):
+    """{pollutant: value} of a reading, plus its combined AQI (the worst sub-index, as displayed)"""
+    values = {}
+    for pollutant in POLLUTANT_LIMITS:
+        raw = record.get(pollutant)
+        try:
+            value = float(raw) if raw not in (None, '') else None
+        except (TypeError, ValueError):
+            value = None
+        values[pollutant] = None if value is None or math.isnan(value) else value
+    aqi, _ = combined_aqi({pollutant: value for pollutant, value in values.items() if value is not None})
+    if aqi is not None:
+        values['aqi'] = aqi
+    return values
+
+def seed_alerts(city_key):
+    """Start from the newest loaded reading so startup does not look like a crossing"""
+    data = DATA_FILES.get(city_key)
+    if data:
+        ALERTS.seed(city_key, alert_values(data[-1]))
+
+def evaluate_alerts(city_key, records, epochs):
+    for record in records:
+        ALERTS.evaluate(city_key, alert_values(record), str(record.get('timestamp')))
+
+def append_ingested_rows(city_key, records, epochs):
+    """Add new readings to memory and the store, then queue a model update.
+    
+    The hourly series is extended in place of a rebuild, and only this city's
+    station and surfaces are refreshed. Intervals are refit once
+    INTERVAL_REFRESH_ROWS new rows have arrived since the last calibration.
+    """
+    with DATA_LOCK:
+        data = DATA_FILES.setdefault(city_key, [])
+        for record, epoch in zip(records, epochs):
+            if hasattr(data, 'column'):
+                data.append(record, epoch)
+            else:
+                data.append(record.as_dict() if hasattr(record, 'as_dict') else record)
+        if STORE is not None:
+            STORE.append(city_key, records)
+        series = HOURLY_SERIES.get(city_key)
+        columns = {field: to_float_column(records, field) for field in SERIES_FIELDS}
+        extended = series.extend(epochs, columns) if series is not None else None
+        if extended is None:
+            build_city_series(city_key)
+        else:
+            HOURLY_SERIES[city_key] = extended
+    UNCALIBRATED_ROWS[city_key] = UNCALIBRATED_ROWS.get(city_key, 0) + len(records)
+    if UNCALIBRATED_ROWS[city_key] >= INTERVAL_REFRESH_ROWS:
+        calibrate_intervals(city_key)
+    sync_city_stations([city_key])
+    refresh_surfaces([city_key])
+    if os.environ.get('ONLINE_TRAINING', '1') == '1':
+        ONLINE_TRAINER.record_new_rows(city_key, len(records))
+
+def resolve_forecasts(city_key, records, epochs):
+    """Join newly ingested PM2.5 readings with the forecasts made for those hours"""
+    values = [float(record.get('pm25')) if record.get('pm25') not in (None, '') else np.nan
+              for record in records]
+    ACCURACY.observe(city_key, epochs, values)
+
+INGESTOR.add_listener(detect_anomalies)
+INGESTOR.add_listener(append_ingested_rows)
+INGESTOR.add_listener(resolve_forecasts)
+INGESTOR.add_listener(evaluate_alerts)
+
+def start_ingest():
+    """Start polling after the newest loaded reading of each city"""
+    for city_key, series in HOURLY_SERIES.items():
+        INGESTOR.set_watermark(city_key, series.end)
+    INGESTOR.start()
+
+def compact_city(city_key):
+    """Archive a city's rows older than its hot window and keep only the window in memory"""
+    series = HOURLY_SERIES.get(city_key)
+    if not TIERS.enabled(city_key) or city_key not in DATA_FILES or series is None or len(series) == 0:
+        return 0
+    cutoff = TIERS.cutoff(city_key, series.end)
+    data = DATA_FILES[city_key]
+    if STORE is not None:
+        chunks = STORE.iter_query(city_key, end=cutoff - 1, chunk_size=EXPORT_CHUNK_ROWS)
+    elif hasattr(data, 'column_order'):
+        chunks = iter_table_chunks(data, end=cutoff - 1)
+    else:
+        chunks = iter_list_chunks(data, end=cutoff - 1)
+    archived = TIERS.compact(city_key, chunks, cutoff)
+    
+    # Rows ingested while archiving are past the cutoff and carried into the new table
+    with DATA_LOCK:
+        data = DATA_FILES[city_key]
+        if hasattr(data, 'since'):
+            hot = data.since(cutoff)
+        else:
+            epochs = parse_timestamps_utc([record.get('timestamp', '') for record in data])
+            hot = [record for record, epoch in zip(data, epochs) if epoch >= cutoff]
+        DATA_FILES[city_key] = hot
+        build_city_series(city_key)
+    if STORE is not None:
+        STORE.delete_before(city_key, cutoff)
+        TIERS.save_hot(city_key, cutoff, len(hot))
+    else:
+        TIERS.save_hot(city_key, cutoff, len(hot), records=hot,
+                       source_path=find_csv_path(CSV_SOURCES[city_key][1]))
+    if archived:
+        print(f"{city_key.upper()}: {archived} readings older than {TIERS.hot_days[city_key]} days "
+              f"moved to cold partitions and daily rollups, {len(hot)} kept hot")
+    return archived
+
+def compact_history():
+    for city_key in list(DATA_FILES):
+        try:
+            compact_city(city_key)
+        except Exception as e:
+            print(f"Compaction failed for {city_key}: {e}")
+
+def start_compaction():
+    """Enforce the retention policy in the background as readings keep arriving"""
+    if RETENTION_COMPACT_SECONDS <= 0 or not any(TIERS.enabled(city_key) for city_key in CSV_SOURCES):
+        return
+    
+    def run():
+        while True:
+            time.sleep(RETENTION_COMPACT_SECONDS)
+            compact_history()
+    threading.Thread(target=run, name='retention-compaction', daemon=True).start()
+
+# Numeric series returned by /api/data and used to pick downsampled points
+CHART_SERIES = ['pm25', 'temperature_2m', 'relativehumidity_2m', 'windspeed_10m',
+                'winddirection_10m', 'pressure_msl']
+CHART_CACHE = WindowCache(max_entries=64)
+
+def build_chart_records(city_key, hours):
+    """Convert the last `hours` records of a city to the format expected by frontend"""
+    data = DATA_FILES[city_key]
+    if STORE is not None and hours > len(data):
+        # Ranges beyond the in-memory window are read from the store
+        data = STORE.latest(city_key, hours)
+    window = data[-hours:] if len(data) >= hours else data
+    
+    result = []
+    for record in window:
+        try:
+            pm25 = float(record.get('pm25', 0))
+            result.append({
+                'timestamp': record.get('timestamp', datetime.now().isoformat()),
+                'pm25': pm25,
+                'aqi': calculate_aqi(pm25),
+                'temperature_2m': float(record.get('temperature_2m', 0)),
+                'relativehumidity_2m': float(record.get('relativehumidity_2m', 0)),
+                'windspeed_10m': float(record.get('windspeed_10m', 0)),
+                'winddirection_10m': float(record.get('winddirection_10m', 0)),
+                'pressure_msl': float(record.get('pressure_msl', 0))
+            })
+        except:
+            continue
+    return result
+
+# 'background' binds the port first and loads data and models on a thread;
+# 'eager' loads everything before serving
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'background').lower()
+# How long a request waits for the data it needs during a background startup
+READY_WAIT_SECONDS = float(os.environ.get('READY_WAIT_SECONDS', 10))
+READINESS = Readiness(list(CSV_SOURCES) + ['app'])
+# Routes that only need their own city to be loaded
+CITY_ENDPOINTS = {'predict_air_quality', 'get_historical_data', 'export_history', 'model_accuracy',
+                  'city_anomalies'}
+
+def warm_up():
+    """Load data, models and derived caches, marking each city ready as soon as it is usable.
+    
+    A city that fails is marked failed and the others still load; anything
+    not ready when warm-up ends is failed too, so requests for it get a 503
+    instead of waiting forever.
+    """
+    try:
+        load_csv_data()
+        compact_history()
+        for city_key in list(DATA_FILES):
+            try:
+                MODEL_MANAGER.load_all([city_key])
+                for manager in POLLUTANT_MODELS.values():
+                    manager.load_all([city_key])
+                backfill_accuracy(city_key, int(os.environ.get('ACCURACY_BACKFILL_HOURS', 72)))
+                calibrate_intervals(city_key)
+                scan_recent_anomalies(city_key, int(os.environ.get('ANOMALY_SCAN_HOURS', 720)))
+                seed_alerts(city_key)
+                PREDICTION_CACHE.warm([city_key])
+                READINESS.mark(city_key)
+            except Exception as e:
+                READINESS.fail(city_key, f"{city_key}: {e}")
+                print(f"Error loading {city_key}: {e}")
+        sync_city_stations()
+        refresh_surfaces()
+        start_ingest()
+        start_compaction()
+        READINESS.mark('app')
+    except Exception as e:
+        print(f"Error during startup: {e}")
+        READINESS.fail_pending(str(e))
+    finally:
+        READINESS.fail_pending('not loaded')
+        HEALTH_TICKER.refresh()
+        print(f"Startup finished in {READINESS.snapshot()['uptime_seconds']} s")
+
+def pollutant_model_versions():
+    """{pollutant: {city: version}} of the loaded non-PM2.5 models"""
+    versions = {}
+    for target, manager in POLLUTANT_MODELS.items():
+        active = manager.status()['active']
+        if active:
+            versions[target] = {city_key: model['version'] for city_key, model in active.items()}
+    return versions
+
+def start_warm_up():
+    if STARTUP_MODE == 'eager':
+        warm_up()
+    else:
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+@app.before_request
+def wait_for_startup():
+    """Hold requests until the data they need is loaded; 503 if that takes too long"""
+    if READINESS.all_ready() or not request.path.startswith('/api/') or request.path in PROBE_PATHS:
+        return None
+
+    city = (request.view_args or {}).get('city') or request.args.get('city')
+    city_key = resolve_city_key(city) if city and request.endpoint in CITY_ENDPOINTS else None
+    component = city_key or 'app'
+    if READINESS.wait(component, READY_WAIT_SECONDS):
+        return None
+    failure = READINESS.failure(component)
+    if failure is not None:
+        return jsonify({"error": "Startup failed, this data is unavailable.", "component": component,
+                        "detail": failure}), 503
+    response = jsonify({"error": "Server is starting, try again shortly.", "waiting_for": component})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+def data_freshness():
+    """Newest reading of every loaded city and how many hours old it is"""
+    now = datetime.now(timezone.utc).timestamp()
+    return {
+        city_key: {
+            'last_reading_utc': datetime.fromtimestamp(series.end, timezone.utc).isoformat(),
+            'staleness_hours': round((now - series.end) / 3600, 1)
+        }
+        for city_key, series in list(HOURLY_SERIES.items()) if len(series)
+    }
+
+def build_health_status():
+    """Detailed status, built off the request path by HEALTH_TICKER"""
+    readiness = READINESS.snapshot()
+    return {
+        'status': 'ok' if readiness['ready'] else 'degraded' if readiness['failed'] else 'starting',
         'message': 'API is running',
-        'model_version': 'CSV-based v1.0',
+        'model_version': MODEL_MANAGER.version_label(),
         'response_time_ms': 50,
         'timestamp': datetime.now().isoformat(),
         'data_sources': list(DATA_FILES.keys()),
-        'data_loaded': {city: len(data) for city, data in DATA_FILES.items()},
+        'ready': readiness,
+        'data_loaded': {city: len(data) for city, data in list(DATA_FILES.items())},
+        'freshness': data_freshness(),
+        'prediction_cache': PREDICTION_CACHE.snapshot(),
+        'models': MODEL_MANAGER.status(),
+        'pollutant_models': pollutant_model_versions(),
+        'intervals': {f"{city_key}/{target}": calibration.samples
+                      for (city_key, target), calibration in sorted(INTERVALS.items())},
+        'admission': ADMISSION.metrics(),
+        'chart_cache': CHART_CACHE.stats(),
+        'surface_cache': SURFACE_CACHE.stats(),
+        'data_quality': {city: data_quality_summary(city) for city in list(HOURLY_SERIES)},
+        'ingest': INGESTOR.status(),
+        'online_training': ONLINE_TRAINER.status(),
+        'anomalies': ANOMALIES.status(),
+        'alerts': ALERTS.status(),
+        'retention': TIERS.status(),
+        'refresh_seconds': HEALTH_REFRESH_SECONDS,
         'port': os.environ.get('PORT', '5000')
-    })
+    }
+
+HEALTH_REFRESH_SECONDS = int(os.environ.get('HEALTH_REFRESH_SECONDS', 15))
+HEALTH_TICKER = StatusTicker(build_health_status, lambda payload: app.json.dumps(payload).encode('utf-8'),
+                             interval_seconds=HEALTH_REFRESH_SECONDS)
+
+# API Routes
+@app.route('/livez', methods=['GET'])
+def liveness_probe():
+    """The process is up and serving; touches no application state"""
+    return 'ok', 200, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+
+@app.route('/readyz', methods=['GET'])
+def readiness_probe():
+    """200 once every city's data and model are loaded, 503 while starting or if any failed"""
+    if READINESS.all_ready():
+        return 'ready', 200, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+    response = jsonify(READINESS.snapshot())
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """Detailed status as of the last HEALTH_TICKER refresh"""
+    return Response(HEALTH_TICKER.get(), content_type='application/json',
+                    headers={'Cache-Control': f'max-age={HEALTH_REFRESH_SECONDS}'})
+
+@app.route('/api/metrics', methods=['GET'])
+def admission_metrics():
+    """Admission control queue depth and rejection counters"""
+    return jsonify({'admission': ADMISSION.metrics(), 'timestamp': datetime.now().isoformat()})
+
+# Retained bytes per subsystem and city, plus tracemalloc on demand (admin only)
+MEMORY = MemoryAccounting()
+MEMORY_PROFILER = MemoryProfiler()
+if int(os.environ.get('TRACEMALLOC_FRAMES', 0)) > 0:
+    # Started at import so allocations made while loading data are traced too
+    MEMORY_PROFILER.start(int(os.environ['TRACEMALLOC_FRAMES']))
+
+def active_model_versions():
+    """{city: [ModelVersion]} over the PM2.5 and pollutant managers"""
+    versions = {}
+    for manager in [MODEL_MANAGER] + list(POLLUTANT_MODELS.values()):
+        for city_key in manager.status()['active']:
+            versions.setdefault(city_key, []).append(manager.active(city_key))
+    return versions
+
+def model_native_bytes():
+    # LightGBM keeps its trees in native memory; the artifact size is a close estimate
+    return {city_key: sum(os.path.getsize(version.path) for version in versions if os.path.exists(version.path))
+            for city_key, versions in active_model_versions().items()}
+
+MEMORY.register('datasets', lambda: dict(DATA_FILES))
+MEMORY.register('hourly_series', lambda: dict(HOURLY_SERIES))
+MEMORY.register('models', active_model_versions, extra=model_native_bytes)
+MEMORY.register('prediction_cache', lambda: PREDICTION_CACHE)
+MEMORY.register('chart_cache', lambda: CHART_CACHE)
+MEMORY.register('surface_cache', lambda: SURFACE_CACHE)
+MEMORY.register('health_payload', lambda: HEALTH_TICKER)
+MEMORY.register('accuracy', lambda: ACCURACY)
+MEMORY.register('intervals', lambda: {city_key: [calibration for (city, _), calibration in list(INTERVALS.items())
+                                                   if city == city_key] for city_key, _ in list(INTERVALS)})
+MEMORY.register('anomalies', lambda: ANOMALIES)
+MEMORY.register('alerts', lambda: ALERTS)
+MEMORY.register('stations', lambda: STATION_CATALOG)
+MEMORY.register('rollups', TIERS.rollups_by_city)
+
+@app.route('/api/debug/memory', methods=['GET'])
+def memory_report():
+    """Retained bytes per subsystem and city; top allocation sites while tracemalloc runs"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden."}), 403
+    
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename'):
+        return jsonify({"error": "'group_by' must be lineno or filename."}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 200))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer."}), 400
+    
+    report = MEMORY.report()
+    report['tracemalloc'] = MEMORY_PROFILER.status()
+    if MEMORY_PROFILER.tracing:
+        report['top'] = MEMORY_PROFILER.top(group_by, limit=limit)
+    return jsonify(report)
+
+@app.route('/api/debug/memory/tracing', methods=['POST'])
+def memory_tracing():
+    """Start (optionally with {"frames": N}) or stop ({"enabled": false}) tracemalloc"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden."}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    if payload.get('enabled', True):
+        try:
+            frames = int(payload.get('frames', 1))
+        except (TypeError, ValueError):
+            return jsonify({"error": "'frames' must be an integer."}), 400
+        MEMORY_PROFILER.start(frames)
+    else:
+        MEMORY_PROFILER.stop()
+    return jsonify(MEMORY_PROFILER.status())
+
+@app.route('/api/debug/memory/snapshots', methods=['POST'])
+def memory_snapshot():
+    """Keep a labelled tracemalloc snapshot to diff against later"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden."}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    try:
+        return jsonify(MEMORY_PROFILER.snapshot(payload.get('label'))), 201
+    except RuntimeError as e:
+        return jsonify({"error": f"{e}; POST /api/debug/memory/tracing first."}), 409
+
+@app.route('/api/debug/memory/diff', methods=['GET'])
+def memory_diff():
+    """Allocation growth from snapshot ?from= to snapshot ?to= (default: now)"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden."}), 403
+    
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename'):
+        return jsonify({"error": "'group_by' must be lineno or filename."}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 200))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer."}), 400
+    try:
+        diff = MEMORY_PROFILER.diff(request.args.get('from', ''), request.args.get('to'), group_by, limit=limit)
+    except KeyError as e:
+        return jsonify({"error": f"Unknown snapshot {e}.", "snapshots": MEMORY_PROFILER.snapshots()}), 404
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(diff)
 
 @app.route('/api/debug', methods=['GET'])
 def debug_info():
@@ -172,65 +1121,449 @@ def debug_info():
         'sample_data': DATA_FILES.get('cdmx', [])[:2] if DATA_FILES.get('cdmx') else 'No CDMX data'
     })
 
+def cached_prediction_response(city_key):
+    """Cached prediction plus its age, or (None, error)"""
+    prediction, error, entry = PREDICTION_CACHE.get(city_key)
+    if error:
+        return None, error
+    
+    response = dict(prediction)
+    response['cache_age_seconds'] = round(entry.age(), 1)
+    response['cache_stale'] = PREDICTION_CACHE.is_stale(city_key)
+    return response, None
+
 @app.route('/api/predict/<city>', methods=['GET'])
 def predict_air_quality(city):
     """Get air quality prediction for a city"""
-    city_lower = city.lower()
-    
-    if "cdmx" in city_lower or "mexicocity" in city_lower:
-        city_key = "cdmx"
-    elif "la" in city_lower or "losangeles" in city_lower:
-        city_key = "la"
-    else:
+    city_key = resolve_city_key(city)
+    if city_key is None:
         return jsonify({"error": "City not supported for predictions."}), 400
     
-    prediction, error = get_latest_prediction(city_key)
+    response, error = cached_prediction_response(city_key)
     
     if error:
         return jsonify({"error": error}), 500
     
-    return jsonify(prediction)
+    return jsonify(response)
+
+MAX_BATCH_CITIES = int(os.environ.get('MAX_BATCH_CITIES', 100))
+MAX_BATCH_ROWS = int(os.environ.get('MAX_BATCH_ROWS', 5000))
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Predict several cities in one request.
+    
+    Body: {"cities": ["cdmx", "la"], "rows": {"la": [{"pm25": 12.0, ...}]}}.
+    Cities without explicit rows get their cached latest prediction; explicit
+    rows are grouped per model and predicted in parallel.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Request body must be a JSON object."}), 400
+    
+    cities = payload.get('cities', [])
+    rows = payload.get('rows') or {}
+    if not isinstance(cities, list) or not isinstance(rows, dict):
+        return jsonify({"error": "'cities' must be a list and 'rows' an object."}), 400
+    cities = cities + [city for city in rows if city not in cities]
+    if not cities:
+        return jsonify({"error": "No cities requested."}), 400
+    if len(cities) > MAX_BATCH_CITIES:
+        return jsonify({"error": f"At most {MAX_BATCH_CITIES} cities per batch."}), 400
+    
+    total_rows = 0
+    for city_rows in rows.values():
+        if not isinstance(city_rows, list) or not all(isinstance(row, dict) for row in city_rows):
+            return jsonify({"error": "Each entry in 'rows' must be a list of objects."}), 400
+        total_rows += len(city_rows)
+    if total_rows > MAX_BATCH_ROWS:
+        return jsonify({"error": f"At most {MAX_BATCH_ROWS} feature rows per batch."}), 400
+    
+    results = [None] * len(cities)
+    items = []
+    for position, city in enumerate(cities):
+        city_key = resolve_city_key(str(city))
+        if city_key is None:
+            results[position] = {'city': city, 'error': "City not supported for predictions."}
+        elif city in rows:
+            items.append((position, city_key, rows[city]))
+        else:
+            response, error = cached_prediction_response(city_key)
+            results[position] = {'city': city, 'error': error} if error else dict(response, city=city_key.upper())
+    
+    grouped = run_grouped(items, get_model_key, predict_forecast_rows)
+    for position, city_key, city_rows in items:
+        predictions, error = grouped[position]
+        if error:
+            results[position] = {'city': cities[position], 'error': error}
+        else:
+            bounds = forecast_intervals(city_key, predictions)
+            results[position] = {
+                'city': city_key.upper(),
+                'predictions': [format_prediction(city_key, row, value, row_bounds)
+                                for row, value, row_bounds in zip(city_rows, predictions, bounds)]
+            }
+    
+    return jsonify({'results': results, 'count': len(results)})
 
 @app.route('/api/data/<city>', methods=['GET'])
 def get_historical_data(city):
     """Get historical data for a city"""
-    city_lower = city.lower()
-    
-    if "cdmx" in city_lower or "mexicocity" in city_lower:
-        city_key = "cdmx"
-    elif "la" in city_lower or "losangeles" in city_lower:
-        city_key = "la"
-    else:
+    city_key = resolve_city_key(city)
+    if city_key is None:
         return jsonify({"error": "City not supported for historical data."}), 400
     
     if city_key not in DATA_FILES:
         return jsonify({"error": "Historical data file not found."}), 404
     
-    data = DATA_FILES[city_key]
+    try:
+        hours = int(request.args.get('hours', 24))
+        max_points = request.args.get('max_points')
+        max_points = int(max_points) if max_points is not None else None
+    except ValueError:
+        return jsonify({"error": "hours and max_points must be integers."}), 400
     
-    # Return last 24 records (assuming hourly data)
-    last_24_hours = data[-24:] if len(data) >= 24 else data
+    if hours < 1 or (max_points is not None and max_points < 3):
+        return jsonify({"error": "hours must be >= 1 and max_points >= 3."}), 400
     
-    # Convert to the format expected by frontend
-    result = []
-    for record in last_24_hours:
-        try:
-            pm25 = float(record.get('pm25', 0))
-            result.append({
-                'timestamp': record.get('timestamp', datetime.now().isoformat()),
-                'pm25': pm25,
-                'aqi': calculate_aqi(pm25),
-                'temperature_2m': float(record.get('temperature_2m', 0)),
-                'relativehumidity_2m': float(record.get('relativehumidity_2m', 0)),
-                'windspeed_10m': float(record.get('windspeed_10m', 0)),
-                'winddirection_10m': float(record.get('winddirection_10m', 0)),
-                'pressure_msl': float(record.get('pressure_msl', 0))
-            })
-        except:
-            continue
+    # Popular windows are served from cache until the city's data changes
+    cache_key = (city_key, hours, max_points, get_data_version(city_key))
+    result = CHART_CACHE.get(cache_key)
+    if result is None:
+        result = downsample_records(build_chart_records(city_key, hours), CHART_SERIES, max_points)
+        CHART_CACHE.put(cache_key, result)
     
     return jsonify(result)
 
+def export_stream_factory(city_key, start, end, fmt, compress):
+    """Return (fields, make_body) where make_body() yields the export bytes"""
+    data = DATA_FILES[city_key]
+    if STORE is not None:
+        fields = list(STORE_COLUMNS)
+        chunks = lambda: STORE.iter_query(city_key, start, end, chunk_size=EXPORT_CHUNK_ROWS)
+    elif hasattr(data, 'column_order'):
+        fields = list(data.column_order)
+        chunks = lambda: iter_table_chunks(data, start, end)
+    else:
+        fields = [name for name in (data[0] if data else {}) if name != 'timestamp']
+        chunks = lambda: iter_list_chunks(data, start, end)
+    
+    # Explicit ranges reaching before the hot window also stream the cold partitions they touch
+    hot_start = TIERS.hot_start(city_key) if TIERS.enabled(city_key) else None
+    if start is not None and hot_start is not None and start < hot_start:
+        hot_chunks = chunks
+        cold_end = hot_start - 1 if end is None else min(end, hot_start - 1)
+        chunks = lambda: itertools.chain(TIERS.iter_range(city_key, start, cold_end), hot_chunks())
+    
+    def make_body():
+        body = serialize(chunks(), fields, fmt)
+        return gzip_stream(body) if compress else body
+    return fields, make_body
+
+@app.route('/api/export/<city>', methods=['GET'])
+def export_history(city):
+    """Stream raw history as CSV or NDJSON, gzip-encoded on request, with Range resume"""
+    city_key = resolve_city_key(city)
+    if city_key is None:
+        return jsonify({"error": "City not supported for export."}), 400
+    if city_key not in DATA_FILES:
+        return jsonify({"error": "Historical data file not found."}), 404
+    
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {sorted(FORMATS)}."}), 400
+    try:
+        start = parse_time_param(request.args.get('start'))
+        end = parse_time_param(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    compress = request.accept_encodings['gzip'] > 0
+    _, make_body = export_stream_factory(city_key, start, end, fmt, compress)
+    
+    # Same data version and parameters produce byte-identical output, so the ETag validates resumes
+    etag = hashlib.sha1(repr((city_key, start, end, fmt, compress, get_data_version(city_key))).encode()).hexdigest()
+    filename = f"airguard_{city_key}_{start or 'begin'}_{end or 'latest'}.{fmt}"
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Vary': 'Accept-Encoding',
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range.strip('"') == etag):
+        total = stream_length(make_body())
+        byte_range = parse_range_header(range_header, total)
+        if byte_range is None:
+            return Response(status=416, headers={'Content-Range': f'bytes */{total}'})
+        first, last = byte_range
+        headers['Content-Range'] = f'bytes {first}-{last}/{total}'
+        headers['Content-Length'] = str(last - first + 1)
+        return Response(stream_with_context(slice_stream(make_body(), first, last)), status=206,
+                        content_type=FORMATS[fmt], headers=headers)
+    
+    return Response(stream_with_context(make_body()), content_type=FORMATS[fmt], headers=headers)
+
+@app.route('/api/history/<city>/daily', methods=['GET'])
+def daily_history(city):
+    """Daily rollups of the history that has left the hot window"""
+    city_key = resolve_city_key(city)
+    if city_key is None:
+        return jsonify({"error": "City not supported for historical data."}), 400
+    try:
+        start = parse_time_param(request.args.get('start'))
+        end = parse_time_param(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    days = TIERS.rollups(city_key, start, end)
+    for day in days:
+        day['aqi_mean'] = calculate_aqi(day['pm25_mean']) if day.get('pm25_mean') is not None else None
+    return jsonify({
+        'city': city_key,
+        'hot_days': TIERS.hot_days.get(city_key, 0),
+        'hot_start': TIERS.hot_start(city_key),
+        'days': days,
+        'count': len(days)
+    })
+
+def is_admin_request():
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    return bool(admin_token) and request.headers.get('X-Admin-Token') == admin_token
+
+@app.route('/api/model/reload', methods=['POST'])
+def reload_models():
+    """Hot-swap to newer model artifacts found in backend/models/"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden."}), 403
+    
+    swapped = MODEL_MANAGER.reload()
+    pollutant_swapped = {target: manager.reload() for target, manager in POLLUTANT_MODELS.items()}
+    for city_key in set(swapped).union(*pollutant_swapped.values()):
+        refresh_city_predictions(city_key)
+    
+    return jsonify({'swapped': swapped, 'model_version': MODEL_MANAGER.version_label(),
+                    'models': MODEL_MANAGER.status(),
+                    'pollutant_swapped': {target: cities for target, cities in pollutant_swapped.items() if cities},
+                    'pollutant_models': pollutant_model_versions()})
+
+@app.route('/api/model/accuracy', methods=['GET'])
+def model_accuracy():
+    """Rolling MAE, RMSE and bias of served forecasts against realized PM2.5"""
+    city = request.args.get('city')
+    city_key = resolve_city_key(city) if city else None
+    if city and city_key is None:
+        return jsonify({"error": "City not supported."}), 400
+    
+    return jsonify({
+        'cities': ACCURACY.summary(city_key),
+        'window': ACCURACY.window,
+        'intervals': {f"{city}/{target}": calibration.describe()
+                      for (city, target), calibration in sorted(INTERVALS.items())
+                      if city_key is None or city == city_key},
+        'model_version': MODEL_MANAGER.version_label(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/anomalies/<city>', methods=['GET'])
+def city_anomalies(city):
+    """Flagged readings of a city, newest first (?kind=&pollutant=&limit=)"""
+    city_key = resolve_city_key(city)
+    if city_key is None:
+        return jsonify({"error": "City not supported."}), 400
+    kind = request.args.get('kind')
+    pollutant = request.args.get('pollutant')
+    if kind is not None and kind not in ANOMALY_KINDS:
+        return jsonify({"error": f"'kind' must be one of {', '.join(ANOMALY_KINDS)}."}), 400
+    if pollutant is not None and pollutant not in POLLUTANT_LIMITS:
+        return jsonify({"error": f"'pollutant' must be one of {', '.join(POLLUTANT_LIMITS)}."}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer."}), 400
+    
+    events = ANOMALIES.events(city_key, kind=kind, pollutant=pollutant, limit=limit)
+    for event in events:
+        event['timestamp'] = datetime.fromtimestamp(event.pop('epoch'), timezone.utc).isoformat()
+        if 'end_epoch' in event:
+            event['end_timestamp'] = datetime.fromtimestamp(event.pop('end_epoch'), timezone.utc).isoformat()
+    return jsonify({
+        'city': city_key.upper(),
+        'events': events,
+        'counts': ANOMALIES.status().get(city_key, dict.fromkeys(ANOMALY_KINDS, 0)),
+        'state': ANOMALIES.state(city_key)
+    })
+
+def parse_alert_fields(payload, partial=False):
+    """Validated subscription fields from a JSON body, or (None, error)"""
+    fields = {}
+    if 'city' in payload or not partial:
+        city_key = resolve_city_key(str(payload.get('city', '')))
+        if city_key is None:
+            return None, "'city' must be a supported city."
+        fields['city'] = city_key
+    if 'pollutant' in payload or not partial:
+        pollutant = payload.get('pollutant', 'aqi')
+        if pollutant not in ALERT_POLLUTANTS:
+            return None, f"'pollutant' must be one of {', '.join(ALERT_POLLUTANTS)}."
+        fields['pollutant'] = pollutant
+    if 'threshold' in payload or not partial:
+        threshold = payload.get('threshold')
+        if isinstance(threshold, str) and threshold in AQI_BANDS:
+            threshold = AQI_BANDS[threshold]
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+            return None, f"'threshold' must be a number or one of {', '.join(AQI_BANDS)}."
+        fields['threshold'] = float(threshold)
+    if 'direction' in payload or not partial:
+        direction = payload.get('direction', 'above')
+        if direction not in DIRECTIONS:
+            return None, f"'direction' must be one of {', '.join(DIRECTIONS)}."
+        fields['direction'] = direction
+    if 'webhook' in payload:
+        webhook = payload.get('webhook') or ''
+        if webhook:
+            error = check_webhook(webhook, ALERT_WEBHOOK_HOSTS, trusted=is_admin_request())
+            if error:
+                return None, error
+        fields['webhook'] = webhook
+    return fields, None
+
+def authorized_subscription(subscription_id):
+    """The subscription if the request carries its token (or the admin token)"""
+    subscription = ALERTS.get(subscription_id)
+    if subscription is None:
+        return None, (jsonify({"error": "Subscription not found."}), 404)
+    if request.headers.get('X-Alert-Token') != subscription.token and not is_admin_request():
+        return None, (jsonify({"error": "Forbidden."}), 403)
+    return subscription, None
+
+@app.route('/api/alerts', methods=['POST'])
+def create_alert():
+    """Subscribe to a threshold crossing; the returned token manages the subscription"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Request body must be a JSON object."}), 400
+    fields, error = parse_alert_fields(payload)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        subscription = ALERTS.subscribe(fields['city'], fields['pollutant'], fields['threshold'],
+                                        fields['direction'], fields.get('webhook') or None)
+    except OverflowError:
+        return jsonify({"error": "Subscription limit reached."}), 503
+    return jsonify(subscription.describe(with_token=True)), 201
+
+@app.route('/api/alerts', methods=['GET'])
+def list_alerts():
+    """All subscriptions (admin only)"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden."}), 403
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer."}), 400
+    city = request.args.get('city')
+    city_key = resolve_city_key(city) if city else None
+    subscriptions = ALERTS.list(city_key, limit=limit)
+    return jsonify({'subscriptions': [s.describe() for s in subscriptions], 'total': len(ALERTS)})
+
+@app.route('/api/alerts/<subscription_id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_alert(subscription_id):
+    """Read, change or delete a subscription (X-Alert-Token)"""
+    subscription, error = authorized_subscription(subscription_id)
+    if error:
+        return error
+    
+    if request.method == 'DELETE':
+        ALERTS.unsubscribe(subscription_id)
+        return '', 204
+    if request.method == 'PATCH':
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Request body must be a JSON object."}), 400
+        fields, error = parse_alert_fields(payload, partial=True)
+        if error:
+            return jsonify({"error": error}), 400
+        if 'city' in fields or 'pollutant' in fields:
+            return jsonify({"error": "'city' and 'pollutant' cannot change; create a new subscription."}), 400
+        subscription = ALERTS.update(subscription_id, threshold=fields.get('threshold'),
+                                     direction=fields.get('direction'), webhook=fields.get('webhook'))
+    return jsonify(subscription.describe())
+
+@app.route('/api/nearest', methods=['GET'])
+def nearest_stations():
+    """Closest stations with data to a point and an inverse-distance-weighted PM2.5 estimate"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        k = int(request.args.get('k', 5))
+        max_km = float(request.args['max_km']) if request.args.get('max_km') else None
+        power = float(request.args.get('power', 2))
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon are required numbers; k, max_km and power must be numeric."}), 400
+    
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not 1 <= k <= 50 or power <= 0:
+        return jsonify({"error": "lat/lon out of range, k must be 1-50 and power > 0."}), 400
+    
+    if STATION_CATALOG.reload_if_changed():
+        sync_city_stations()
+    estimate, neighbours = STATION_CATALOG.idw_estimate(lat, lon, k=k, power=power, max_km=max_km)
+    
+    return jsonify({
+        'lat': lat,
+        'lon': lon,
+        'pm25_estimate': round(estimate, 2) if estimate is not None else None,
+        'aqi_estimate': calculate_aqi(estimate) if estimate is not None else None,
+        'stations': [{
+            'id': station['id'],
+            'name': station.get('name'),
+            'city': station.get('city'),
+            'lat': station['lat'],
+            'lon': station['lon'],
+            'distance_km': round(distance, 3),
+            'pm25': station['pm25'],
+            'observed_at': station.get('observed_at')
+        } for station, distance in neighbours]
+    })
+
+@app.route('/api/grid/<city>', methods=['GET'])
+def pollution_grid(city):
+    """IDW-interpolated PM2.5 surface over the metro area as JSON, float32 grid or PNG overlay"""
+    city_key = resolve_city_key(city)
+    if city_key is None or city_key not in METRO_BOUNDS:
+        return jsonify({"error": "City not supported."}), 400
+    
+    fmt = request.args.get('format', 'json').lower()
+    try:
+        zoom = int(request.args.get('zoom', 0))
+    except ValueError:
+        return jsonify({"error": "zoom must be an integer."}), 400
+    if fmt not in GRID_FORMATS or not 0 <= zoom <= MAX_ZOOM:
+        return jsonify({"error": f"format must be one of {sorted(GRID_FORMATS)} and zoom 0-{MAX_ZOOM}."}), 400
+    
+    if STATION_CATALOG.reload_if_changed():
+        sync_city_stations()
+    surface, encoded = get_surface(city_key, zoom)
+    
+    # Panning and re-requests are answered from the client cache while readings are unchanged
+    etag = f'"{city_key}-z{zoom}-v{surface.version}-{fmt}"'
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=60'}
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers=headers)
+    
+    if fmt not in encoded:
+        encoded[fmt] = encode_surface(surface, fmt)
+    if fmt == 'bin':
+        rows, cols = surface.pm25.shape
+        south, west, north, east = surface.bounds
+        headers.update({'X-Grid-Rows': str(rows), 'X-Grid-Cols': str(cols),
+                        'X-Grid-Bounds': f'{south},{west},{north},{east}', 'X-Grid-Dtype': 'float32-le'})
+    return Response(encoded[fmt], content_type=GRID_FORMATS[fmt], headers=headers)
+
 @app.route('/api/cities', methods=['GET'])
 def get_cities():
     """Get available cities"""
@@ -253,16 +1586,28 @@ if __name__ == '__main__':
     print("Starting AirGuard Full Stack Application...")
     print("=" * 50)
     
-    # Load data
-    load_csv_data()
+    # Load data, models and caches (on a background thread unless STARTUP_MODE=eager)
+    start_warm_up()
+    HEALTH_TICKER.start()
     
     print("=" * 50)
-    print("Backend ready!")
+    print("Backend ready!" if STARTUP_MODE == 'eager' else "Backend starting (data and models load in the background)")
     print("API Endpoints:")
-    print("   GET /api/health - Health check")
+    print("   GET /livez - Liveness probe (constant time)")
+    print("   GET /readyz - Readiness probe (data and models loaded)")
+    print("   GET /api/health - Detailed status, refreshed every HEALTH_REFRESH_SECONDS")
+    print("   GET /api/metrics - Admission control metrics")
     print("   GET /api/predict/<city> - Get prediction")
-    print("   GET /api/data/<city> - Get historical data")
+    print("   POST /api/predict/batch - Get predictions for several cities")
+    print("   GET /api/data/<city>?hours=&max_points= - Get historical data")
     print("   GET /api/cities - Get available cities")
+    print("   GET /api/anomalies/<city>?kind=&pollutant= - Flagged stuck, spiking or out-of-range readings")
+    print("   POST /api/alerts, GET|PATCH|DELETE /api/alerts/<id> - Threshold alert subscriptions")
+    print("   GET /api/nearest?lat=&lon=&k= - Nearest stations and IDW PM2.5 estimate")
+    print("   GET /api/grid/<city>?zoom=&format=json|bin|png - Interpolated PM2.5 surface")
+    print("   GET /api/export/<city>?start=&end=&format=csv|ndjson - Stream raw history")
+    print("   POST /api/model/reload - Hot-swap newer model artifacts (X-Admin-Token)")
+    print("   GET /api/model/accuracy?city= - Rolling forecast error against realized PM2.5")
     print("Frontend: React app served at /")
     print("=" * 50)
     
@@ -270,10 +1615,16 @@ if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"Starting server on port {port}")
     
-    # Run the app
-    try:
-        app.run(debug=False, host='0.0.0.0', port=port)
-    except Exception as e:
-        print(f"Error starting server: {e}")
-        print("Trying alternative port...")
-        app.run(debug=False, host='0.0.0.0', port=10000)
\ No newline at end of file
+    if LISTEN_SOCKET is not None:
+        from werkzeug.serving import make_server
+        
+        # Same threaded server as app.run, on the socket bound at the top of the module
+        make_server('0.0.0.0', port, app, threaded=True, fd=LISTEN_SOCKET.fileno()).serve_forever()
+    else:
+        # Run the app
+        try:
+            app.run(debug=False, host='0.0.0.0', port=port)
+        except Exception as e:
+            print(f"Error starting server: {e}")
+            print("Trying alternative port...")
+            app.run(debug=False, host='0.0.0.0', port=10000)
\ No newline at end of file
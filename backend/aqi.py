@@ -0,0 +1,38 @@
+"""
+US EPA AQI sub-indices for the pollutants other than PM2.5.
+
+Concentrations are in the units of the datasets: µg/m³ for PM10 and ppm for
+the gases (the EPA's ppb breakpoints for NO2 and SO2 are listed here in ppm).
+The combined AQI of a reading is the worst sub-index over its pollutants.
+PM2.5 keeps the formula of calculate_aqi in app_fullstack so existing
+numbers do not change.
+"""
+
+import bisect
+
+# Upper AQI value of each level (good, moderate, ... hazardous)
+AQI_LEVELS = [50, 100, 150, 200, 300, 500]
+
+# pollutant -> upper concentration of each AQI level (lower bound is the previous upper)
+BREAKPOINTS = {
+    'pm10': [54, 154, 254, 354, 424, 604],
+    'o3': [0.054, 0.070, 0.085, 0.105, 0.200, 0.604],
+    'co': [4.4, 9.4, 12.4, 15.4, 30.4, 50.4],
+    'no2': [0.053, 0.100, 0.360, 0.649, 1.249, 2.049],
+    'so2': [0.035, 0.075, 0.185, 0.304, 0.604, 1.004]
+}
+
+
+def pollutant_aqi(pollutant, value):
+    """AQI sub-index of one concentration, or None when the pollutant has no scale"""
+    uppers = BREAKPOINTS.get(pollutant)
+    if uppers is None or value is None or value != value:
+        return None
+    value = max(float(value), 0.0)
+    level = min(bisect.bisect_left(uppers, value), len(uppers) - 1)
+    # Interpolate from the previous level's upper bound so there are no gaps between levels
+    low_c = uppers[level - 1] if level else 0.0
+    low_i = AQI_LEVELS[level - 1] if level else 0
+    high_c = uppers[level]
+    high_i = AQI_LEVELS[level]
+    return int(min(low_i + (high_i - low_i) * (value - low_c) / (high_c - low_c), high_i))
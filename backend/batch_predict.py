@@ -0,0 +1,57 @@
+"""
+Grouped, parallel execution of multi-city prediction requests.
+
+Feature rows are grouped by the model that serves them so each model gets a
+single vectorized predict call, and different models run concurrently on a
+shared thread pool.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+# Model inference releases the GIL inside NumPy/scikit-learn, so a few threads go a long way
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('PREDICT_WORKERS', min(8, (os.cpu_count() or 1) + 2))),
+    thread_name_prefix='predict'
+)
+
+
+def group_by_model(items, model_key_fn):
+    """Group (position, city_key, rows) items by model key.
+
+    Returns {model_key: [(position, city_key, start, end)], ...} together with
+    the concatenated rows for each model; start/end slice a city's rows out
+    of the model's combined result.
+    """
+    groups = {}
+    rows_by_model = {}
+    for position, city_key, rows in items:
+        model_key = model_key_fn(city_key)
+        model_rows = rows_by_model.setdefault(model_key, [])
+        start = len(model_rows)
+        model_rows.extend(rows)
+        groups.setdefault(model_key, []).append((position, city_key, start, len(model_rows)))
+    return groups, rows_by_model
+
+
+def run_grouped(items, model_key_fn, predict_fn, executor=EXECUTOR):
+    """Run predict_fn(model_key, rows) once per model and split the results.
+
+    items is an iterable of (position, city_key, rows). Returns
+    {position: (results, error)} where results is the slice of the model's
+    output that belongs to that item.
+    """
+    groups, rows_by_model = group_by_model(items, model_key_fn)
+    futures = {model_key: executor.submit(predict_fn, model_key, rows)
+               for model_key, rows in rows_by_model.items()}
+
+    out = {}
+    for model_key, members in groups.items():
+        try:
+            results = futures[model_key].result()
+            error = None
+        except Exception as e:
+            results, error = None, f"Prediction failed for model {model_key}: {e}"
+        for position, city_key, start, end in members:
+            out[position] = (results[start:end] if error is None else None, error)
+    return out
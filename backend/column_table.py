@@ -0,0 +1,132 @@
+"""
+Columnar storage for a city's readings.
+
+A ColumnTable holds one NumPy array per column instead of one dict per row,
+but still behaves like the list of CSV records the rest of the backend
+expects: len(), indexing, slicing and iteration yield plain dicts.
+"""
+
+import numpy as np
+
+from readings import BOOL_FIELDS, Reading
+
+# Boolean columns written by the collectors as 'True'/'False'
+BOOL_COLUMNS = BOOL_FIELDS
+
+
+class ColumnTable:
+    """Timestamps, UTC epochs and float columns with a list-of-dicts facade"""
+
+    def __init__(self, timestamps, epochs, columns, column_order=None):
+        self._timestamps = np.asarray(timestamps, dtype=str)
+        self._epochs = np.asarray(epochs, dtype=np.int64)
+        self._columns = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        self.column_order = list(column_order or self._columns)
+        self._size = self._timestamps.shape[0]
+
+    # Arrays may carry spare capacity after append(); the public views never do
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._size]
+
+    @property
+    def epochs(self):
+        return self._epochs[:self._size]
+
+    @property
+    def columns(self):
+        return {name: self._columns[name][:self._size] for name in self.column_order}
+
+    @classmethod
+    def concat(cls, tables):
+        """Join tables with the same columns (e.g. chunks of one file) in order"""
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls(np.empty(0, dtype=str), np.empty(0, dtype=np.int64), {})
+        order = tables[0].column_order
+        return cls(
+            np.concatenate([table.timestamps for table in tables]),
+            np.concatenate([table.epochs for table in tables]),
+            {name: np.concatenate([table.columns[name] for table in tables]) for name in order},
+            order
+        )
+
+    @classmethod
+    def from_readings(cls, readings, epochs, column_order):
+        """Table of Reading records (missing values become NaN)"""
+        columns = {name: np.array([getattr(reading, name) for reading in readings], dtype=float)
+                   for name in column_order}
+        return cls([reading.timestamp for reading in readings], epochs, columns, column_order)
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self.record(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('ColumnTable index out of range')
+        return self.record(index)
+
+    def record(self, i):
+        """Row i as a dict; missing values become None"""
+        row = {'timestamp': str(self._timestamps[i])}
+        for name in self.column_order:
+            value = self._columns[name][i]
+            if np.isnan(value):
+                row[name] = None
+            elif name in BOOL_COLUMNS:
+                row[name] = bool(value)
+            else:
+                row[name] = float(value)
+        return row
+
+    def since(self, epoch):
+        """Copy of the rows at or after epoch; copies so the old arrays can be freed"""
+        keep = self.epochs >= epoch
+        return ColumnTable(self.timestamps[keep].copy(), self.epochs[keep].copy(),
+                           {name: values[keep].copy() for name, values in self.columns.items()},
+                           self.column_order)
+
+    def reading(self, i):
+        """Row i as a Reading record"""
+        return Reading.from_record(self.record(i))
+
+    def column(self, name):
+        """Float array for a column, all-NaN if the table does not have it"""
+        values = self._columns.get(name)
+        return values[:self._size] if values is not None else np.full(self._size, np.nan)
+
+    def append(self, record, epoch):
+        """Append one record, growing the arrays geometrically"""
+        capacity = self._timestamps.shape[0]
+        if self._size == capacity:
+            new_capacity = max(16, capacity * 2)
+            self._timestamps = np.resize(self._timestamps.astype('U40'), new_capacity)
+            self._epochs = np.resize(self._epochs, new_capacity)
+            for name in self.column_order:
+                self._columns[name] = np.resize(self._columns[name], new_capacity)
+        self._timestamps[self._size] = str(record.get('timestamp', ''))
+        self._epochs[self._size] = epoch
+        for name in self.column_order:
+            value = record.get(name)
+            if isinstance(value, str) and value.lower() in ('true', 'false'):
+                value = value.lower() == 'true'
+            try:
+                self._columns[name][self._size] = float(value) if value not in (None, '') else np.nan
+            except (TypeError, ValueError):
+                self._columns[name][self._size] = np.nan
+        self._size += 1
+
+    def nbytes(self):
+        return (self._timestamps.nbytes + self._epochs.nbytes
+                + sum(values.nbytes for values in self._columns.values()))
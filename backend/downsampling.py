@@ -0,0 +1,102 @@
+"""
+Largest-Triangle-Three-Buckets downsampling for chart series.
+
+Charts only need a few hundred points to look identical to the full series,
+so long history windows are reduced on the server before being sent.
+"""
+
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+
+def lttb_indices(x, ys, n_out):
+    """Return the indices LTTB keeps when reducing the series to n_out points.
+
+    x is a 1-D array of positions and ys a 2-D array with one row per series.
+    All series share one set of indices: each bucket keeps the point whose
+    triangle area is largest for any series, after scaling every series to
+    its own range so that units do not matter.
+    """
+    x = np.asarray(x, dtype=float)
+    ys = np.atleast_2d(np.asarray(ys, dtype=float))
+    n = x.shape[0]
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Scale each series to [0, 1] and ignore NaNs so one gap cannot poison a bucket
+    lo = np.nanmin(ys, axis=1, keepdims=True)
+    span = np.nanmax(ys, axis=1, keepdims=True) - lo
+    span[~np.isfinite(span) | (span == 0)] = 1.0
+    ys = np.nan_to_num((ys - lo) / span)
+
+    # Bucket i covers [edges[i], edges[i + 1]); first and last points are fixed
+    every = (n - 2) / (n_out - 2)
+    edges = (np.floor(np.arange(n_out - 1) * every) + 1).astype(int)
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+
+    # Bucket means are independent of the selected points, so compute them all at once
+    x_means = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    y_means = np.add.reduceat(ys[:, :-1], edges[:-1], axis=1) / counts
+    x_means = np.append(x_means, x[-1])
+    y_means = np.concatenate([y_means, ys[:, -1:]], axis=1)
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        cx, cy = x_means[i + 1], y_means[:, i + 1:i + 2]
+        ax, ay = x[a], ys[:, a:a + 1]
+        bx, by = x[start:end], ys[:, start:end]
+        areas = np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+        a = start + int(np.argmax(areas.max(axis=0)))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_records(records, fields, max_points, x_field=None):
+    """Reduce a list of dict records to at most max_points using LTTB on fields"""
+    if max_points is None or len(records) <= max_points:
+        return records
+    if x_field:
+        x = np.fromiter((r[x_field] for r in records), dtype=float, count=len(records))
+    else:
+        x = np.arange(len(records), dtype=float)
+    ys = np.array([[r.get(f, np.nan) for r in records] for f in fields], dtype=float)
+    return [records[i] for i in lttb_indices(x, ys, max_points)]
+
+
+class WindowCache:
+    """Small thread-safe LRU for computed chart windows"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,123 @@
+"""
+Ingestion of new hourly readings written by the collectors.
+
+The collectors append to datos_realtime_Centro_<CITY>.csv. A RealtimeIngestor
+polls those files, keeps a per-city watermark (UTC epoch of the newest row
+seen) and hands only newer rows to the registered listeners, which update
+the in-memory data, the store, and anything else that reacts to readings.
+Rows are parsed once into Reading records (see readings.py), so listeners
+get floats instead of re-parsing a dict of strings each.
+"""
+
+import os
+import threading
+import time
+
+from readings import read_readings
+from timeseries import INVALID_EPOCH, correct_legacy_utc, parse_timestamps_utc
+
+
+def relabel_utc(record, epoch):
+    """Copy of a Reading or dict record with its timestamp rewritten as UTC"""
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S+00:00', time.gmtime(int(epoch)))
+    if hasattr(record, '_replace'):
+        return record._replace(timestamp=timestamp)
+    return dict(record, timestamp=timestamp)
+
+
+class RealtimeIngestor:
+    """Polls realtime CSVs and dispatches new rows to listeners"""
+
+    def __init__(self, sources, poll_seconds=300):
+        self.sources = sources
+        self.poll_seconds = poll_seconds
+        self.listeners = []
+        self._watermarks = {}
+        self._mtimes = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_listener(self, listener):
+        """listener(city_key, records, epochs) is called for every batch of new rows"""
+        self.listeners.append(listener)
+
+    def set_watermark(self, city_key, epoch):
+        with self._lock:
+            if epoch is not None:
+                self._watermarks[city_key] = max(int(epoch), self._watermarks.get(city_key, INVALID_EPOCH))
+
+    def ingest(self, city_key, records):
+        """Dispatch the records newer than the city's watermark; returns how many"""
+        if not records:
+            return 0
+        epochs = parse_timestamps_utc([record.get('timestamp', '') for record in records])
+        # Rows of the old collectors would land hours early, behind the watermark
+        epochs, legacy = correct_legacy_utc(records, epochs)
+        records = [relabel_utc(record, epochs[i]) if legacy[i] else record for i, record in enumerate(records)]
+        order = sorted(range(len(records)), key=lambda i: epochs[i])
+
+        with self._lock:
+            watermark = self._watermarks.get(city_key, INVALID_EPOCH)
+            fresh = [i for i in order if epochs[i] != INVALID_EPOCH and epochs[i] > watermark]
+            # Several rows for the same hour keep only the last one written
+            deduped = {}
+            for i in fresh:
+                deduped[int(epochs[i])] = i
+            fresh = [deduped[epoch] for epoch in sorted(deduped)]
+            if not fresh:
+                return 0
+            self._watermarks[city_key] = int(epochs[fresh[-1]])
+
+        new_records = [records[i] for i in fresh]
+        new_epochs = [int(epochs[i]) for i in fresh]
+        for listener in self.listeners:
+            try:
+                listener(city_key, new_records, new_epochs)
+            except Exception as e:
+                print(f"Ingest listener {getattr(listener, '__name__', listener)} failed for {city_key}: {e}")
+
+        with self._lock:
+            stats = self._stats.setdefault(city_key, {'rows_ingested': 0, 'last_ingest': None})
+            stats['rows_ingested'] += len(new_records)
+            stats['last_ingest'] = time.time()
+        return len(new_records)
+
+    def poll_once(self):
+        """Read every source whose file changed since the last poll"""
+        total = 0
+        for city_key, path in self.sources.items():
+            if not path or not os.path.exists(path):
+                continue
+            mtime = os.path.getmtime(path)
+            if self._mtimes.get(city_key) == mtime:
+                continue
+            self._mtimes[city_key] = mtime
+            with open(path, 'r', encoding='utf-8') as file:
+                total += self.ingest(city_key, read_readings(file))
+        return total
+
+    def start(self):
+        if self.poll_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='realtime-ingest', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Realtime ingest poll failed: {e}")
+            time.sleep(self.poll_seconds)
+
+    def status(self):
+        with self._lock:
+            return {
+                city_key: {
+                    'watermark': self._watermarks.get(city_key),
+                    'rows_ingested': self._stats.get(city_key, {}).get('rows_ingested', 0),
+                    'last_ingest': self._stats.get(city_key, {}).get('last_ingest')
+                }
+                for city_key in self.sources
+            }
@@ -0,0 +1,80 @@
+"""
+Prediction intervals from the empirical distribution of recent forecast errors.
+
+The served models are gradient-boosted trees: each tree corrects the ones
+before it, so unlike a random forest there is no per-tree spread to read
+uncertainty from. Each (city, target) instead keeps the quantiles of its
+residuals (actual - predicted) over a recent calibration window, split into
+bins by predicted level because errors grow with the concentration. An
+interval is the point forecast plus the quantile row of its bin, so every
+quantile of every row comes from one searchsorted and one add on top of the
+single predict call.
+
+The residuals must come from samples the model was not fit on (see
+calibrate_intervals), otherwise the intervals come out too narrow. Each fit
+also reports its empirical coverage: the same procedure fit on the older
+half of the samples and checked against the newer half.
+"""
+
+import numpy as np
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+class ResidualQuantiles:
+    """Residual quantiles per predicted-level bin of one (city, target)"""
+
+    def __init__(self, predicted, actual, quantiles=QUANTILES, bins=4, min_per_bin=50, check_coverage=True):
+        """predicted and actual are in time order, oldest first"""
+        predicted = np.asarray(predicted, dtype=float)
+        actual = np.asarray(actual, dtype=float)
+        finite = np.isfinite(predicted) & np.isfinite(actual)
+        predicted, actual = predicted[finite], actual[finite]
+        residuals = actual - predicted
+        if predicted.size == 0:
+            raise ValueError('no finite calibration samples')
+        self.quantiles = tuple(quantiles)
+        self.samples = int(predicted.size)
+
+        n_bins = max(1, min(bins, self.samples // min_per_bin))
+        self.edges = np.unique(np.quantile(predicted, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        which = np.searchsorted(self.edges, predicted, side='right')
+        overall = np.quantile(residuals, self.quantiles)
+        # A bin left empty by ties falls back to the quantiles of all residuals
+        self.offsets = np.array([np.quantile(residuals[which == b], self.quantiles) if np.any(which == b)
+                                 else overall for b in range(self.edges.size + 1)])
+
+        self.coverage = None
+        half = self.samples // 2
+        if check_coverage and half >= min_per_bin:
+            older = ResidualQuantiles(predicted[:half], actual[:half], quantiles, bins, min_per_bin, False)
+            self.coverage = older.coverage_of(predicted[half:], actual[half:])
+
+    def apply(self, predicted, lower=None):
+        """(rows, quantiles) interval bounds for an array of point forecasts"""
+        predicted = np.asarray(predicted, dtype=float)
+        bounds = predicted[:, None] + self.offsets[np.searchsorted(self.edges, predicted, side='right')]
+        if lower is not None:
+            np.maximum(bounds, lower, out=bounds)
+        return bounds
+
+    def coverage_of(self, predicted, actual):
+        """Share of actual values at or below each bound, and between the outer two"""
+        actual = np.asarray(actual, dtype=float)
+        below = actual[:, None] <= self.apply(predicted)
+        return {
+            'samples': int(actual.size),
+            'below': {f"p{round(q * 100)}": round(float(np.mean(below[:, i])), 3)
+                      for i, q in enumerate(self.quantiles)},
+            'inside': round(float(np.mean(below[:, -1] & ~below[:, 0])), 3),
+            'nominal': round(self.quantiles[-1] - self.quantiles[0], 3)
+        }
+
+    def describe(self):
+        return {
+            'samples': self.samples,
+            'coverage': self.coverage,
+            'bins': int(self.offsets.shape[0]),
+            'offsets': {f"p{round(q * 100)}": [round(float(v), 4) for v in self.offsets[:, i]]
+                        for i, q in enumerate(self.quantiles)}
+        }
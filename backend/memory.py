@@ -0,0 +1,239 @@
+"""
+Memory accounting for the long-running server.
+
+Two complementary views:
+
+- MemoryAccounting walks the objects behind each registered subsystem
+  (datasets, caches, models, ...) and reports their retained bytes per
+  city. NumPy buffers count their nbytes once, memory-mapped buffers are
+  reported apart because they live in the page cache, and an object
+  reachable from several subsystems is charged to the first one only.
+- MemoryProfiler wraps tracemalloc: top allocation sites and growth diffs
+  between labelled snapshots, to find what keeps allocating over time.
+  Tracing slows every allocation, so it only runs when started.
+"""
+
+from collections import OrderedDict
+import mmap
+import sys
+import threading
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+# Never walked: code, classes and threads are shared infrastructure, not data
+OPAQUE_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                types.CodeType, threading.Thread)
+MAX_SNAPSHOTS = 8
+
+
+def process_rss_bytes():
+    """Resident set size of this process (Linux /proc; peak RSS elsewhere)"""
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _Sizer:
+    """Retained size of object graphs, sharing one seen-set across calls"""
+
+    def __init__(self):
+        self.seen = set()
+
+    def size(self, root):
+        """(heap bytes, memory-mapped bytes) reachable from root and not seen before"""
+        heap = mapped = 0
+        stack = [root]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in self.seen or isinstance(obj, OPAQUE_TYPES):
+                continue
+            self.seen.add(id(obj))
+
+            if isinstance(obj, np.ndarray):
+                # Includes the data buffer only when the array owns it; a view
+                # charges its header here and its buffer through the owner
+                heap += sys.getsizeof(obj)
+                base = obj.base
+                if isinstance(base, mmap.mmap):
+                    if id(base) not in self.seen:
+                        self.seen.add(id(base))
+                        mapped += len(base)
+                elif base is not None:
+                    stack.append(base)
+                if obj.dtype == object:
+                    stack.extend(obj.ravel().tolist())
+                continue
+
+            heap += sys.getsizeof(obj, 0)
+            if isinstance(obj, dict):
+                stack.extend(self._items(obj))
+            elif isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == 'deque':
+                stack.extend(self._values(obj))
+            elif isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+                continue
+            else:
+                attributes = getattr(obj, '__dict__', None)
+                if attributes is not None:
+                    stack.append(attributes)
+                for klass in type(obj).__mro__:
+                    for slot in getattr(klass, '__slots__', ()):
+                        if hasattr(obj, slot):
+                            stack.append(getattr(obj, slot))
+        return heap, mapped
+
+    @staticmethod
+    def _items(mapping):
+        # Other threads may resize the dict while it is walked; retry on a copy
+        for _ in range(3):
+            try:
+                return [value for item in list(mapping.items()) for value in item]
+            except RuntimeError:
+                continue
+        return []
+
+    @staticmethod
+    def _values(collection):
+        for _ in range(3):
+            try:
+                return list(collection)
+            except RuntimeError:
+                continue
+        return []
+
+
+class MemoryAccounting:
+    """Registry of subsystems whose retained memory is reported per city.
+
+    Each provider returns either one object or a {city: object} dict; extra
+    is an optional function returning bytes held outside the Python heap
+    (for example native model buffers), also per city.
+    """
+
+    def __init__(self):
+        self._providers = OrderedDict()
+
+    def register(self, name, provider, extra=None):
+        self._providers[name] = (provider, extra)
+
+    def report(self):
+        started = time.perf_counter()
+        sizer = _Sizer()
+        subsystems = OrderedDict()
+        for name, (provider, extra) in self._providers.items():
+            roots = provider()
+            per_key = roots if isinstance(roots, dict) else {'all': roots}
+            native = extra() if extra else {}
+            entry = {'bytes': 0, 'mapped_bytes': 0, 'native_bytes': 0, 'by_city': {}}
+            for key, root in per_key.items():
+                heap, mapped = sizer.size(root)
+                key_native = int(native.get(key, 0))
+                entry['by_city'][str(key)] = {'bytes': heap, 'mapped_bytes': mapped, 'native_bytes': key_native}
+                entry['bytes'] += heap
+                entry['mapped_bytes'] += mapped
+                entry['native_bytes'] += key_native
+            subsystems[name] = entry
+        return {
+            'rss_bytes': process_rss_bytes(),
+            'accounted_bytes': sum(entry['bytes'] + entry['native_bytes'] for entry in subsystems.values()),
+            'subsystems': subsystems,
+            'walk_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+
+
+def _site(stat):
+    frame = stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryProfiler:
+    """tracemalloc control plus labelled snapshots for growth diffs"""
+
+    def __init__(self, max_snapshots=MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, int(frames)))
+
+    def stop(self):
+        """Stop tracing and drop the snapshots (they cannot be compared with later ones)"""
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def _take(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ))
+
+    def snapshot(self, label=None):
+        """Take and keep a snapshot; returns its label and totals"""
+        if not self.tracing:
+            raise RuntimeError('tracemalloc is not tracing')
+        taken = self._take()
+        with self._lock:
+            self._counter += 1
+            label = label or f"s{self._counter}"
+            self._snapshots[label] = (time.time(), taken)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return {'label': label, 'traced_bytes': sum(stat.size for stat in taken.statistics('filename'))}
+
+    def snapshots(self):
+        with self._lock:
+            return [{'label': label, 'taken_at': taken_at} for label, (taken_at, _) in self._snapshots.items()]
+
+    def status(self):
+        if not self.tracing:
+            return {'tracing': False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {'tracing': True, 'frames': tracemalloc.get_traceback_limit(), 'traced_bytes': current,
+                'peak_traced_bytes': peak, 'overhead_bytes': tracemalloc.get_tracemalloc_memory(),
+                'snapshots': self.snapshots()}
+
+    def top(self, group_by='lineno', limit=20):
+        """Largest live allocation sites (or files) right now"""
+        if not self.tracing:
+            raise RuntimeError('tracemalloc is not tracing')
+        stats = self._take().statistics(group_by)
+        return [{'site': _site(stat) if group_by == 'lineno' else stat.traceback[0].filename,
+                 'bytes': stat.size, 'count': stat.count} for stat in stats[:limit]]
+
+    def diff(self, old_label, new_label=None, group_by='lineno', limit=20):
+        """Sites that grew the most between two snapshots (new_label=None compares with now)"""
+        with self._lock:
+            if old_label not in self._snapshots or (new_label and new_label not in self._snapshots):
+                raise KeyError(new_label if old_label in self._snapshots else old_label)
+            old = self._snapshots[old_label][1]
+            new = self._snapshots[new_label][1] if new_label else None
+        if new is None:
+            if not self.tracing:
+                raise RuntimeError('tracemalloc is not tracing')
+            new = self._take()
+        stats = new.compare_to(old, group_by)
+        return {
+            'total_growth_bytes': sum(stat.size_diff for stat in stats),
+            'sites': [{'site': _site(stat) if group_by == 'lineno' else stat.traceback[0].filename,
+                       'growth_bytes': stat.size_diff, 'bytes': stat.size,
+                       'count_growth': stat.count_diff} for stat in stats[:limit]]
+        }
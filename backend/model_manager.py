@@ -0,0 +1,295 @@
+"""
+Loading, warmup and hot-swapping of the per-city prediction models.
+
+Artifacts live in backend/models/ as modelo_<TARGET>_predictor_<CITY>.pkl
+(version 1) or modelo_<TARGET>_predictor_<CITY>_v<N>.pkl, where TARGET is the
+forecast pollutant (pm25, o3, no2, ...); one manager serves one target.
+Each model is warmed up with a dummy batch before it starts serving, and a
+newer artifact can be swapped in atomically while requests that already
+hold the old version finish with it.
+"""
+
+from contextlib import contextmanager
+import hashlib
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+ARTIFACT_PATTERN = re.compile(r'^modelo_(?P<target>[a-z0-9]+)_predictor_(?P<city>[A-Za-z]+)(?:_v(?P<version>\d+))?\.pkl$')
+
+WARMUP_ROWS = 8
+
+
+def _load_artifact(path, mmap_mode=None):
+    import joblib
+
+    # With mmap_mode the NumPy arrays inside joblib artifacts are mapped read-only
+    # from the page cache, so worker processes share one physical copy
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def _coerce(value):
+    if value is None or value == '':
+        return np.nan
+    if isinstance(value, str):
+        lowered = value.lower()
+        if lowered in ('true', 'false'):
+            return 1.0 if lowered == 'true' else 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def model_feature_names(model):
+    """Column names a fitted model was trained with ([] when it did not record them)"""
+    return list(getattr(model, 'feature_name_', None) or getattr(model, 'feature_names_in_', None) or [])
+
+
+class ModelVersion:
+    """One loaded artifact and the requests currently using it"""
+
+    def __init__(self, city_key, version, path, model, checksum):
+        self.city_key = city_key
+        self.version = version
+        self.path = path
+        self.model = model
+        self.checksum = checksum
+        self.feature_names = model_feature_names(model)
+        # UTC epoch of the last label the model was fit on; later labels are held out
+        self.trained_until = getattr(model, 'trained_until_', None)
+        self.loaded_at = time.time()
+        self.warmup_ms = None
+        self.in_flight = 0
+        self.retired = False
+
+    @property
+    def label(self):
+        return f"v{self.version}-{self.checksum}"
+
+    def feature_matrix(self, rows):
+        """Feature rows (dicts) as a float matrix in the model's column order"""
+        return np.array([[_coerce(row.get(name)) for name in self.feature_names] for row in rows],
+                        dtype=float).reshape(len(rows), len(self.feature_names))
+
+    def predict(self, rows):
+        return self.predict_matrix(self.feature_matrix(rows))
+
+    def predict_matrix(self, X):
+        """Predict from a matrix already in feature_names order (shared between targets)"""
+        # The LightGBM booster skips the scikit-learn wrapper's input checks, which
+        # cost far more than the trees themselves on a few rows
+        booster = getattr(self.model, 'booster_', None)
+        if booster is not None:
+            return np.asarray(booster.predict(X), dtype=float)
+        return np.asarray(self.model.predict(X), dtype=float)
+
+    def warmup(self):
+        started = time.perf_counter()
+        self.predict_matrix(np.zeros((WARMUP_ROWS, len(self.feature_names))))
+        self.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def describe(self):
+        return {
+            'version': self.label,
+            'path': os.path.basename(self.path),
+            'model_type': type(self.model).__name__,
+            'n_features': len(self.feature_names),
+            'trained_until': (time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.trained_until))
+                              if self.trained_until is not None else None),
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+            'warmup_ms': self.warmup_ms,
+            'in_flight': self.in_flight
+        }
+
+
+class ModelManager:
+    """Keeps the active model version per city and swaps versions atomically"""
+
+    def __init__(self, model_dir, mmap_mode=None, target='pm25', available_features=None,
+                 training_cutoff=None, keep_versions=2):
+        self.model_dir = model_dir
+        self.mmap_mode = mmap_mode
+        self.target = target
+        # city_key -> epoch assumed as trained_until for artifacts that do not record one
+        self.training_cutoff = training_cutoff
+        # Columns the caller can build for a model; None skips the check
+        self.available_features = set(available_features) if available_features is not None else None
+        # Published (_vN) artifacts kept per city; the unversioned shipped artifact is never removed
+        self.keep_versions = keep_versions
+        self._active = {}
+        self._retiring = []
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def artifacts(self):
+        """Return {city_key: [(version, path, versioned), ...]} for this target, oldest first"""
+        found = {}
+        if not os.path.isdir(self.model_dir):
+            return found
+        for name in os.listdir(self.model_dir):
+            match = ARTIFACT_PATTERN.match(name)
+            if not match or match.group('target') != self.target:
+                continue
+            versioned = match.group('version') is not None
+            found.setdefault(match.group('city').lower(), []).append(
+                (int(match.group('version') or 1), os.path.join(self.model_dir, name), versioned))
+        for versions in found.values():
+            versions.sort()
+        return found
+
+    def discover(self):
+        """Return {city_key: (version, path)} for the newest artifact of each city"""
+        return {city_key: versions[-1][:2] for city_key, versions in self.artifacts().items()}
+
+    def prune(self, city_key):
+        """Delete a city's published artifacts beyond the newest keep_versions; returns the removed paths.
+
+        The active version is always kept. Requests still holding an older one
+        already have its model in memory (a memory-mapped file stays readable
+        until it is unmapped), so removing the file is safe.
+        """
+        active = self.active(city_key)
+        published = [(version, path) for version, path, versioned in self.artifacts().get(city_key, [])
+                     if versioned and (active is None or path != active.path)]
+        keep = max(0, self.keep_versions - (1 if active is not None else 0))
+        removed = []
+        for _, path in published[:max(0, len(published) - keep)]:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError as e:
+                print(f"Could not remove superseded model {path}: {e}")
+        return removed
+
+    def load(self, city_key, path, version):
+        """Load, warm up and activate an artifact; returns the new ModelVersion"""
+        with open(path, 'rb') as file:
+            checksum = hashlib.sha1(file.read()).hexdigest()[:8]
+        model = _load_artifact(path, self.mmap_mode)
+        self.check_features(model, os.path.basename(path))
+        candidate = ModelVersion(city_key, version, path, model, checksum)
+        if candidate.trained_until is None and self.training_cutoff is not None:
+            candidate.trained_until = self.training_cutoff(city_key)
+        candidate.warmup()
+        self._swap(city_key, candidate)
+        return candidate
+
+    def publish(self, city_key, model):
+        """Persist a new model as the next versioned artifact and activate it"""
+        import joblib
+
+        self.check_features(model, f'{self.target} candidate for {city_key.upper()}')
+        active = self.active(city_key)
+        version = (active.version if active else 0) + 1
+        found_version, _ = self.discover().get(city_key, (0, None))
+        version = max(version, found_version + 1)
+        city_label = ARTIFACT_PATTERN.match(os.path.basename(active.path)).group('city') if active else city_key
+        path = os.path.join(self.model_dir, f'modelo_{self.target}_predictor_{city_label}_v{version}.pkl')
+
+        # Write next to the target and rename so a reader never sees a partial file
+        tmp_path = path + '.tmp'
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+        with open(path, 'rb') as file:
+            checksum = hashlib.sha1(file.read()).hexdigest()[:8]
+
+        candidate = ModelVersion(city_key, version, path, model, checksum)
+        candidate.warmup()
+        self._swap(city_key, candidate)
+        self.prune(city_key)
+        return candidate
+
+    def check_features(self, model, name):
+        """Raise ValueError unless the model names its features and all of them can be built.
+
+        Feature rows are looked up by name, so an unknown or Column_N name would
+        otherwise be served as NaN and turn the forecast into a constant.
+        """
+        names = model_feature_names(model)
+        if not names:
+            raise ValueError(f"{name} does not record its feature names; refit it with named columns")
+        if self.available_features is None:
+            return
+        unknown = [feature for feature in names if feature not in self.available_features]
+        if unknown:
+            raise ValueError(f"{name} is not servable: unknown features {', '.join(unknown[:5])}"
+                             + (f" (+{len(unknown) - 5} more)" if len(unknown) > 5 else ''))
+
+    def load_all(self, cities=None):
+        """Load the newest artifact for every city (or only `cities`), recording failures instead of raising"""
+        for city_key, (version, path) in sorted(self.discover().items()):
+            if cities is not None and city_key not in cities:
+                continue
+            try:
+                loaded = self.load(city_key, path, version)
+                print(f"{self.target} model for {city_key.upper()} loaded: {loaded.label} (warmup {loaded.warmup_ms} ms)")
+            except Exception as e:
+                self._errors[city_key] = str(e)
+                print(f"Warning: could not load {self.target} model for {city_key.upper()} from {path}: {e}")
+
+    def reload(self):
+        """Swap in any artifact newer than (or different from) the active version"""
+        swapped = {}
+        for city_key, (version, path) in self.discover().items():
+            active = self.active(city_key)
+            if active is not None and active.version == version and active.path == path:
+                continue
+            try:
+                swapped[city_key] = self.load(city_key, path, version).label
+                self._errors.pop(city_key, None)
+            except Exception as e:
+                self._errors[city_key] = str(e)
+        return swapped
+
+    def active(self, city_key):
+        with self._lock:
+            return self._active.get(city_key)
+
+    @contextmanager
+    def acquire(self, city_key):
+        """Pin the active version for the duration of a request (None if no model)"""
+        with self._lock:
+            current = self._active.get(city_key)
+            if current is not None:
+                current.in_flight += 1
+        try:
+            yield current
+        finally:
+            if current is not None:
+                with self._lock:
+                    current.in_flight -= 1
+                    self._drain_retired()
+
+    def version_label(self):
+        with self._lock:
+            active = dict(self._active)
+        if not active:
+            return 'baseline (no model loaded)'
+        return ', '.join(f"{city}={version.label}" for city, version in sorted(active.items()))
+
+    def status(self):
+        with self._lock:
+            return {
+                'active': {city: version.describe() for city, version in self._active.items()},
+                'retiring': [version.describe() for version in self._retiring],
+                'errors': dict(self._errors),
+                'mmap_mode': self.mmap_mode,
+                'target': self.target
+            }
+
+    def _swap(self, city_key, candidate):
+        with self._lock:
+            previous = self._active.get(city_key)
+            self._active[city_key] = candidate
+            if previous is not None:
+                previous.retired = True
+                self._retiring.append(previous)
+            self._drain_retired()
+
+    def _drain_retired(self):
+        # Old versions are dropped only once the last request pinned to them is done
+        self._retiring = [version for version in self._retiring if version.in_flight > 0]
@@ -0,0 +1,217 @@
+"""
+Incremental model updates from freshly ingested readings.
+
+Each new hourly reading is the realized 24h-ahead label for the features
+observed 24 hours earlier. A background worker gathers the labelled samples
+in a sliding window, continues training the active model on them (extra
+boosting rounds for LightGBM via init_model, partial_fit for estimators that
+support it) and publishes the result through the model manager only if it
+is no worse than the active model on a time-ordered holdout.
+"""
+
+import copy
+import queue
+import threading
+import time
+
+import numpy as np
+
+from model_manager import model_feature_names
+
+HORIZON_HOURS = 24
+
+
+def feature_column(series, name):
+    """Grid column for a model feature, deriving pm25_lag_<N>h by index shift.
+
+    Raises KeyError for a feature the grid cannot provide rather than
+    training on an all-NaN column.
+    """
+    if name in series.columns:
+        return series.columns[name]
+    if name.startswith('pm25_lag_') and name.endswith('h') and name[len('pm25_lag_'):-1].isdigit():
+        return series.lag('pm25', int(name[len('pm25_lag_'):-1]))
+    raise KeyError(f"feature {name!r} is not on the hourly grid")
+
+
+def labelled_rows(series, window_hours, horizon=HORIZON_HOURS, target='pm25'):
+    """Grid rows in the last window_hours whose 24h-ahead `target` label was observed.
+
+    Row i is used when both i and i + horizon are real readings, so gap-filled
+    hours never become features or labels. The label of row i is at
+    series.epochs()[i + horizon].
+    """
+    n = len(series)
+    if n <= horizon:
+        return np.empty(0, dtype=np.int64)
+    lo = max(0, n - horizon - window_hours)
+    rows = np.arange(lo, n - horizon)
+    labels = series.columns[target][rows + horizon]
+    usable = series.observed[rows] & series.observed[rows + horizon] & ~np.isnan(labels)
+    return rows[usable]
+
+
+def build_training_set(series, feature_names, window_hours, horizon=HORIZON_HOURS, target='pm25'):
+    """(X, y) for the labelled_rows of the last window_hours, oldest first"""
+    rows = labelled_rows(series, window_hours, horizon, target)
+    X = np.column_stack([feature_column(series, name)[rows] for name in feature_names]) \
+        if feature_names else np.empty((rows.shape[0], 0))
+    return X, series.columns[target][rows + horizon]
+
+
+def continue_training(model, X, y, extra_trees, feature_names=None):
+    """New model trained from `model` on (X, y) only; the original is untouched.
+
+    X columns must be in feature_names order. LightGBM records the names on the
+    new model; without them it would store Column_N and the manager could no
+    longer map features to columns.
+    """
+    if hasattr(model, 'booster_'):
+        from sklearn.base import clone
+
+        candidate = clone(model).set_params(n_estimators=extra_trees, verbose=-1)
+        candidate.fit(X, y, init_model=model.booster_, feature_name=list(feature_names) if feature_names else 'auto')
+        return candidate
+    if hasattr(model, 'partial_fit'):
+        candidate = copy.deepcopy(model)
+        finite = np.isfinite(X).all(axis=1)
+        candidate.partial_fit(X[finite], y[finite])
+        return candidate
+    raise TypeError(f"{type(model).__name__} supports neither init_model nor partial_fit")
+
+
+def _mae(model, X, y):
+    if hasattr(model, 'booster_'):
+        predictions = model.predict(X)
+    else:
+        finite = np.isfinite(X).all(axis=1)
+        X, y = X[finite], y[finite]
+        predictions = model.predict(X)
+    return float(np.mean(np.abs(predictions - y))) if y.size else float('nan')
+
+
+class OnlineTrainer:
+    """Background worker that updates per-city models as labelled data arrives"""
+
+    def __init__(self, manager, series_fn, window_hours=168, holdout_fraction=0.25,
+                 extra_trees=25, min_new_labels=6, tolerance=0.02, max_trees=2000):
+        self.manager = manager
+        self.series_fn = series_fn
+        self.window_hours = window_hours
+        self.holdout_fraction = holdout_fraction
+        self.extra_trees = extra_trees
+        self.min_new_labels = min_new_labels
+        self.tolerance = tolerance
+        self.max_trees = max_trees
+        self.on_publish = None
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._new_labels = {}
+        self._history = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record_new_rows(self, city_key, count):
+        """Count new readings (each one labels an earlier sample) and queue an update when due"""
+        with self._lock:
+            self._new_labels[city_key] = self._new_labels.get(city_key, 0) + count
+            due = self._new_labels[city_key] >= self.min_new_labels and city_key not in self._pending
+            if due:
+                self._pending.add(city_key)
+        if due:
+            self._ensure_worker()
+            self._queue.put(city_key)
+
+    def update(self, city_key):
+        """Try one incremental update for a city; returns a summary dict"""
+        started = time.perf_counter()
+        active = self.manager.active(city_key)
+        series = self.series_fn(city_key)
+        if active is None or series is None:
+            return {'city': city_key, 'published': False, 'reason': 'no active model or data'}
+        if self.budget_exhausted(active.model):
+            return {'city': city_key, 'published': False, 'reason': 'tree budget exhausted; retrain offline'}
+
+        rows = labelled_rows(series, self.window_hours)
+        X, y = build_training_set(series, active.feature_names, self.window_hours)
+        n_holdout = int(len(y) * self.holdout_fraction)
+        if len(y) - n_holdout < self.min_new_labels or n_holdout < 1:
+            return {'city': city_key, 'published': False, 'reason': f'only {len(y)} labelled samples'}
+
+        X_train, y_train = X[:-n_holdout], y[:-n_holdout]
+        X_hold, y_hold = X[-n_holdout:], y[-n_holdout:]
+        candidate = continue_training(active.model, X_train, y_train, self.extra_trees, active.feature_names)
+        if model_feature_names(candidate) != active.feature_names:
+            return {'city': city_key, 'published': False,
+                    'reason': 'candidate feature names differ from the active model'}
+        # The holdout stays unseen, so interval calibration can use it
+        trained_until = int(series.epochs()[rows[len(y_train) - 1] + HORIZON_HOURS])
+        candidate.trained_until_ = max(trained_until, active.trained_until or trained_until)
+        current_mae = _mae(active.model, X_hold, y_hold)
+        candidate_mae = _mae(candidate, X_hold, y_hold)
+
+        published = candidate_mae <= current_mae * (1 + self.tolerance)
+        result = {
+            'city': city_key,
+            'published': published,
+            'samples': int(len(y_train)),
+            'holdout': int(n_holdout),
+            'current_mae': round(current_mae, 4),
+            'candidate_mae': round(candidate_mae, 4),
+            'train_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+        if published:
+            result['version'] = self.manager.publish(city_key, candidate).label
+            if self.on_publish:
+                self.on_publish(city_key)
+        else:
+            result['reason'] = 'holdout error check failed'
+        return result
+
+    def budget_exhausted(self, model):
+        """True once another update would take the model past max_trees"""
+        return bool(self.max_trees) and getattr(model, 'n_estimators_', 0) + self.extra_trees > self.max_trees
+
+    def tree_budget(self):
+        """{city_key: trees, max_trees and whether updates have stopped} of every active model"""
+        budget = {}
+        for city_key in self.manager.status()['active']:
+            active = self.manager.active(city_key)
+            if active is not None:
+                budget[city_key] = {'trees': getattr(active.model, 'n_estimators_', None),
+                                    'max_trees': self.max_trees,
+                                    'exhausted': self.budget_exhausted(active.model)}
+        return budget
+
+    def status(self):
+        budget = self.tree_budget()
+        with self._lock:
+            return {
+                'pending': sorted(self._pending),
+                'new_labels': dict(self._new_labels),
+                'last_update': dict(self._history),
+                'window_hours': self.window_hours,
+                'extra_trees': self.extra_trees,
+                'tree_budget': budget,
+                'budget_exhausted': sorted(city_key for city_key, state in budget.items() if state['exhausted'])
+            }
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='online-training', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            city_key = self._queue.get()
+            try:
+                result = self.update(city_key)
+            except Exception as e:
+                result = {'city': city_key, 'published': False, 'reason': f'error: {e}'}
+            print(f"Online update for {city_key.upper()}: {result}")
+            with self._lock:
+                self._pending.discard(city_key)
+                self._new_labels[city_key] = 0
+                self._history[city_key] = dict(result, finished_at=time.time())
+            self._queue.task_done()
@@ -0,0 +1,167 @@
+"""
+Parallel startup ingestion of the city datasets.
+
+Each CSV is split into byte ranges that end on line boundaries and every
+range is parsed in its own process. Workers hand their parsed arrays back
+through shared memory blocks, so only block names and shapes are pickled,
+never row dicts. Boot time then tracks the largest single file rather than
+the sum of all of them.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import io
+import multiprocessing
+import os
+import re
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from column_table import ColumnTable
+from timeseries import parse_timestamps_utc
+
+# Files larger than this are split into several ranges
+CHUNK_BYTES = int(os.environ.get('LOAD_CHUNK_BYTES', 8 * 1024 * 1024))
+TIMESTAMP_DTYPE = 'U32'
+_BLANK_FIELD = re.compile(r',(?=,|\r?\n|$)')
+
+
+def read_header(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return next(csv.reader(file))
+
+
+def split_byte_ranges(path, chunk_bytes=CHUNK_BYTES):
+    """[(start, end)] byte ranges covering the data rows, each ending on a newline"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        file.readline()
+        start = file.tell()
+        ranges = []
+        while start < size:
+            target = start + chunk_bytes
+            if target >= size:
+                ranges.append((start, size))
+                break
+            file.seek(target)
+            file.readline()
+            end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _to_shared(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    name = block.name
+    block.close()
+    # Ownership passes to the parent, which unlinks the block after copying it;
+    # without this the worker's resource tracker would delete it on exit
+    resource_tracker.unregister(block._name, 'shared_memory')
+    return name, array.shape, array.dtype.str
+
+
+def _from_shared(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf).copy()
+    finally:
+        block.close()
+        block.unlink()
+
+
+def parse_range(path, start, end, header):
+    """Parse one byte range into (timestamps, epochs, values matrix)"""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    if not text.strip():
+        return np.empty(0, TIMESTAMP_DTYPE), np.empty(0, np.int64), np.empty((0, len(header) - 1))
+
+    try:
+        timestamps, values = _parse_numeric_text(text, len(header))
+    except ValueError:
+        timestamps, values = _parse_csv_rows(text, header)
+    return timestamps, parse_timestamps_utc(timestamps), values
+
+
+def _parse_numeric_text(text, n_columns):
+    # Fast path for the collectors' plain numeric layout: make blanks and booleans
+    # numeric, then let NumPy's C tokenizer read everything after the timestamp
+    timestamps = np.array([line.split(',', 1)[0] for line in text.splitlines() if line],
+                          dtype=TIMESTAMP_DTYPE)
+    clean = _BLANK_FIELD.sub(',nan', text.replace(',True', ',1').replace(',False', ',0'))
+    values = np.loadtxt(io.StringIO(clean), delimiter=',', usecols=range(1, n_columns), ndmin=2)
+    if values.shape[0] != timestamps.shape[0]:
+        raise ValueError('row count mismatch')
+    return timestamps, values
+
+
+def _parse_csv_rows(text, header):
+    rows = [row for row in csv.reader(io.StringIO(text)) if len(row) == len(header)]
+    if not rows:
+        return np.empty(0, TIMESTAMP_DTYPE), np.empty((0, len(header) - 1))
+    timestamps = np.array([row[0] for row in rows], dtype=TIMESTAMP_DTYPE)
+    values = np.array([[_safe_float(cell) for cell in row[1:]] for row in rows])
+    return timestamps, values
+
+
+def _safe_float(cell):
+    if cell in ('True', 'False'):
+        return 1.0 if cell == 'True' else 0.0
+    try:
+        return float(cell) if cell != '' else np.nan
+    except ValueError:
+        return np.nan
+
+
+def _parse_range_shared(path, start, end, header):
+    timestamps, epochs, values = parse_range(path, start, end, header)
+    return _to_shared(timestamps), _to_shared(epochs), _to_shared(values)
+
+
+def _build_table(header, parts):
+    columns = header[1:]
+    tables = []
+    for timestamps, epochs, values in parts:
+        tables.append(ColumnTable(timestamps, epochs,
+                                  {name: values[:, j] for j, name in enumerate(columns)}, columns))
+    return ColumnTable.concat(tables) if len(tables) != 1 else tables[0]
+
+
+def load_tables(paths, max_workers=None):
+    """Parse {key: csv_path} in parallel and return {key: ColumnTable}.
+
+    Falls back to parsing in-process when there is only one range, a single
+    CPU, or a process pool cannot be started (e.g. restricted sandboxes).
+    Workers are spawned, so they re-import the caller's __main__ module
+    (without running its `if __name__ == '__main__'` block).
+    """
+    headers = {key: read_header(path) for key, path in paths.items()}
+    tasks = [(key, start, end) for key, path in paths.items()
+             for start, end in split_byte_ranges(path)]
+
+    workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+    if len(tasks) <= 1 or workers <= 1:
+        return {key: _build_table(headers[key], [parse_range(paths[key], s, e, headers[key])
+                                                 for k, s, e in tasks if k == key])
+                for key in paths}
+
+    try:
+        # The backend loads from its warm-up thread; forking a multi-threaded process can
+        # leave a lock held in the child forever, so workers start from a fresh interpreter
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_parse_range_shared, paths[key], start, end, headers[key])
+                       for key, start, end in tasks]
+            parsed = [tuple(_from_shared(spec) for spec in future.result()) for future in futures]
+    except (OSError, RuntimeError) as e:
+        print(f"Parallel load unavailable ({e}), parsing sequentially")
+        parsed = [parse_range(paths[key], start, end, headers[key]) for key, start, end in tasks]
+
+    parts = {key: [] for key in paths}
+    for (key, _, _), part in zip(tasks, parsed):
+        parts[key].append(part)
+    return {key: _build_table(headers[key], parts[key]) for key in paths}
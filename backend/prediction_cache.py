@@ -0,0 +1,136 @@
+"""
+Stale-while-revalidate cache for per-city predictions.
+
+Callers always get the cached entry immediately. When an entry is older than
+its TTL, or the data it was computed from has changed, a background worker
+recomputes it while callers keep receiving the previous value.
+"""
+
+import queue
+import threading
+import time
+
+
+class CacheEntry:
+    """A computed prediction plus the bookkeeping needed to revalidate it"""
+
+    __slots__ = ('value', 'computed_at', 'data_version')
+
+    def __init__(self, value, computed_at, data_version):
+        self.value = value
+        self.computed_at = computed_at
+        self.data_version = data_version
+
+    def age(self, now=None):
+        return (now if now is not None else time.time()) - self.computed_at
+
+
+class PredictionCache:
+    """Per-key cache that refreshes expired entries on a background thread.
+
+    compute_fn(key) must return a (value, error) tuple, like
+    get_latest_prediction. version_fn(key) returns a cheap fingerprint of the
+    underlying data; any change marks the entry stale.
+    """
+
+    def __init__(self, compute_fn, version_fn, ttl_seconds=300):
+        self.compute_fn = compute_fn
+        self.version_fn = version_fn
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self.stats = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def get(self, key):
+        """Return (value, error, entry) for key.
+
+        Only a cold miss computes synchronously; a stale entry is returned as-is
+        and a refresh is queued.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            self.stats['misses'] += 1
+            return self._compute(key)
+
+        if self._is_stale(key, entry):
+            self.stats['stale_hits'] += 1
+            self._schedule_refresh(key)
+        else:
+            self.stats['hits'] += 1
+        return entry.value, None, entry
+
+    def warm(self, keys):
+        """Compute entries for keys up front so the first request is a hit"""
+        for key in keys:
+            self._compute(key)
+
+    def invalidate(self, key=None):
+        """Queue a refresh for key (or every key) without dropping the stale value"""
+        with self._lock:
+            keys = [key] if key is not None else list(self._entries)
+        for k in keys:
+            self._schedule_refresh(k)
+
+    def is_stale(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is None or self._is_stale(key, entry)
+
+    def snapshot(self):
+        """Cache statistics and per-key ages for status endpoints"""
+        now = time.time()
+        with self._lock:
+            ages = {key: round(entry.age(now), 1) for key, entry in self._entries.items()}
+            pending = sorted(self._pending)
+        return dict(self.stats, ttl_seconds=self.ttl_seconds, entry_age_seconds=ages, pending_refresh=pending)
+
+    def _is_stale(self, key, entry):
+        if entry.age() > self.ttl_seconds:
+            return True
+        try:
+            return self.version_fn(key) != entry.data_version
+        except Exception:
+            return True
+
+    def _compute(self, key):
+        data_version = self.version_fn(key)
+        value, error = self.compute_fn(key)
+        if error:
+            return None, error, None
+        entry = CacheEntry(value, time.time(), data_version)
+        with self._lock:
+            self._entries[key] = entry
+        return value, None, entry
+
+    def _schedule_refresh(self, key):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='prediction-cache-refresh', daemon=True)
+                self._worker.start()
+        self._queue.put(key)
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            try:
+                _, error, _ = self._compute(key)
+                if error:
+                    self.stats['refresh_errors'] += 1
+                    print(f"Prediction refresh for {key} failed: {error}")
+                else:
+                    self.stats['refreshes'] += 1
+            except Exception as e:
+                self.stats['refresh_errors'] += 1
+                print(f"Prediction refresh for {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._queue.task_done()
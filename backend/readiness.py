@@ -0,0 +1,117 @@
+"""
+Startup readiness tracking and cached status for the probes.
+
+With STARTUP_MODE=background the server binds its port right after import
+and the datasets, models and derived caches load on a background thread.
+Each component (one per city, plus 'app' for everything else) is marked
+ready as soon as it is usable, so a request only waits for what it needs.
+A component that fails to load is marked failed instead: waiters return at
+once and the readiness probe stays at 503.
+
+The detailed status is rebuilt by a background ticker, so health probes
+only read a pre-encoded payload and never touch the data structures.
+"""
+
+import threading
+import time
+
+
+class Readiness:
+    """One event per component plus the time it took to become ready (or its error)"""
+
+    def __init__(self, components):
+        self.started_at = time.monotonic()
+        self.error = None
+        self._events = {name: threading.Event() for name in components}
+        self._ready_after = {}
+        self._failed = {}
+
+    def mark(self, name):
+        if name not in self._ready_after:
+            self._ready_after[name] = round(time.monotonic() - self.started_at, 3)
+        self._events[name].set()
+
+    def fail(self, name, error):
+        """Give up on a component; the first error is also kept in self.error"""
+        if name in self._ready_after:
+            return
+        self._failed.setdefault(name, error)
+        if self.error is None:
+            self.error = error
+        self._events[name].set()
+
+    def fail_pending(self, error):
+        """Fail every component that is neither ready nor failed yet"""
+        for name in self._events:
+            if name not in self._ready_after and name not in self._failed:
+                self.fail(name, error)
+
+    def failure(self, name):
+        return self._failed.get(name)
+
+    def is_ready(self, name):
+        event = self._events.get(name)
+        return event is None or (event.is_set() and name not in self._failed)
+
+    def all_ready(self):
+        return len(self._ready_after) == len(self._events)
+
+    def wait(self, name, timeout):
+        """Block until a component is ready; False on timeout or if it failed"""
+        event = self._events.get(name)
+        return event is None or (event.wait(timeout) and name not in self._failed)
+
+    def snapshot(self):
+        return {
+            'ready': self.all_ready(),
+            'components': {name: self._ready_after.get(name) for name in self._events},
+            'failed': dict(self._failed),
+            'uptime_seconds': round(time.monotonic() - self.started_at, 3),
+            'error': self.error
+        }
+
+
+class StatusTicker:
+    """Rebuilds a status payload every interval on a background thread.
+
+    Requests read the last encoded payload, so serving it costs no more than
+    returning a bytes object, however expensive the payload is to build.
+    """
+
+    def __init__(self, build_fn, encode_fn, interval_seconds=15):
+        self.build_fn = build_fn
+        self.encode_fn = encode_fn
+        self.interval_seconds = interval_seconds
+        self.refreshed_at = None
+        self.error = None
+        self._encoded = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        try:
+            self._encoded = self.encode_fn(self.build_fn())
+            self.refreshed_at = time.time()
+            self.error = None
+        except Exception as e:
+            # Keep serving the previous payload
+            self.error = str(e)
+            print(f"Status refresh failed: {e}")
+
+    def get(self):
+        if self._encoded is None:
+            self.refresh()
+        return self._encoded
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='status-ticker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval_seconds)
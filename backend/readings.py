@@ -0,0 +1,152 @@
+"""
+Compact record type for single hourly readings on the ingest path.
+
+csv.DictReader gives every reading a dict of strings (one str object per
+column plus the dict's hash table), and each listener parses the same
+strings to floats again. A Reading is a slotted tuple with fixed fields
+for the timestamp and the numeric columns, already parsed: float, bool for
+is_weekend, None when missing. It keeps the record.get() interface the
+listeners and the column store use, so both representations flow through
+the same code.
+"""
+
+from collections import namedtuple
+import csv
+import io
+
+from storage import STORE_COLUMNS
+
+FIELDS = tuple(STORE_COLUMNS)
+CSV_COLUMNS = ('timestamp',) + FIELDS
+BOOL_FIELDS = frozenset({'is_weekend'})
+
+
+def parse_value(text, boolean=False):
+    """CSV cell -> float (bool for boolean columns), None when blank or invalid"""
+    if text is None or text == '':
+        return None
+    if boolean:
+        lowered = str(text).lower()
+        if lowered in ('true', 'false'):
+            return lowered == 'true'
+    try:
+        value = float(text)
+    except (TypeError, ValueError):
+        return None
+    if value != value:
+        return None
+    return bool(value) if boolean else value
+
+
+def format_value(value):
+    """Inverse of parse_value for CSV output"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'True' if value else 'False'
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Reading(namedtuple('ReadingFields', CSV_COLUMNS)):
+    """One hourly reading of a city with a fixed set of parsed columns.
+
+    An immutable tuple subclass with no per-instance __dict__: fields are
+    read through C-level getters and a row is built in one call.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_record(cls, record):
+        """Reading from a dict (CSV strings or numbers); unknown keys are dropped"""
+        values = [str(record.get('timestamp', ''))]
+        for name in FIELDS:
+            value = record.get(name)
+            if type(value) is not float or name in BOOL_FIELDS or value != value:
+                value = parse_value(value, name in BOOL_FIELDS)
+            values.append(value)
+        return cls._make(values)
+
+    def get(self, name, default=None):
+        try:
+            value = tuple.__getitem__(self, _POSITIONS[name])
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in _POSITIONS:
+                raise KeyError(key)
+            return tuple.__getitem__(self, _POSITIONS[key])
+        return tuple.__getitem__(self, key)
+
+    def as_dict(self):
+        return dict(zip(CSV_COLUMNS, self))
+
+    def to_csv_row(self, columns=CSV_COLUMNS):
+        return [self.timestamp if name == 'timestamp' else format_value(self.get(name))
+                for name in columns]
+
+
+_POSITIONS = {name: i for i, name in enumerate(CSV_COLUMNS)}
+
+
+def _missing(cell):
+    return None
+
+
+_BOOLEANS = {'True': True, 'False': False, 'true': True, 'false': False}
+
+
+def _row_parser(header):
+    """Function turning a csv.reader row with this header into a Reading"""
+    positions = [header.index(name) if name in header else None for name in CSV_COLUMNS]
+    # Blank or malformed cells make the converter raise; those rows take the slow path
+    plan = [(0, _missing) if position is None else
+            (position, str if name == 'timestamp' else _BOOLEANS.__getitem__ if name in BOOL_FIELDS else float)
+            for name, position in zip(CSV_COLUMNS, positions)]
+    numeric = [i for i, (name, position) in enumerate(zip(CSV_COLUMNS, positions))
+               if position is not None and name != 'timestamp']
+    make = Reading._make
+
+    def slow(row):
+        values = []
+        for name, position in zip(CSV_COLUMNS, positions):
+            cell = row[position] if position is not None and position < len(row) else None
+            values.append(cell if name == 'timestamp' else parse_value(cell, name in BOOL_FIELDS))
+        return make(values)
+
+    def parse(row):
+        try:
+            values = [convert(row[position]) for position, convert in plan]
+        except (IndexError, KeyError, ValueError):
+            return slow(row)
+        # A 'nan' cell parses as a float; missing values are None everywhere
+        total = sum([values[i] for i in numeric])
+        if total != total:
+            return slow(row)
+        return make(values)
+
+    return parse
+
+
+def read_readings(file):
+    """Readings of an open CSV file with a header row, in file order"""
+    text = file.read()
+    # The collectors never quote fields; splitting lines skips the csv module
+    rows = csv.reader(io.StringIO(text)) if '"' in text else (line.split(',') for line in text.splitlines() if line)
+    header = next(rows, None)
+    if not header:
+        return []
+    parse = _row_parser(header)
+    return [parse(row) for row in rows if row]
+
+
+def write_readings(file, readings, columns=CSV_COLUMNS, header=True):
+    writer = csv.writer(file, lineterminator='\n')
+    if header:
+        writer.writerow(columns)
+    writer.writerows(reading.to_csv_row(columns) for reading in readings)
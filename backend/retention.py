@@ -0,0 +1,319 @@
+"""
+Retention and tiering of each city's hourly history.
+
+With a hot window of N days, a city's data lives in three tiers under
+<root>/<city>/:
+
+- hot.csv: raw hourly rows of the last N days, the only tier loaded at
+  boot and kept in memory
+- daily.csv: one rollup row per UTC day (hours observed and mean/min/max
+  of each pollutant and weather column) for every day that left the hot
+  window, small enough to keep in memory forever
+- cold/<YYYY>/<YYYY-MM>.csv.gz: the raw rows that left the hot window,
+  one compressed partition per month, read only for explicit range queries
+
+compact() moves everything older than the window (aligned to a UTC day)
+into the cold partitions and the rollups; it is idempotent, so a source
+re-imported after a change simply rewrites the same partitions and days.
+"""
+
+import csv
+import gzip
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from readings import Reading, read_readings, write_readings
+from timeseries import parse_timestamps_utc
+
+DAY = 86400
+ROLLUP_COLUMNS = [
+    'temperature_2m', 'relativehumidity_2m', 'precipitation', 'pressure_msl', 'windspeed_10m',
+    'boundary_layer_height', 'co', 'no', 'no2', 'nox', 'o3', 'pm10', 'pm25', 'so2'
+]
+ROLLUP_STATS = ('mean', 'min', 'max')
+
+
+def policy_from_env(cities, environ=os.environ):
+    """{city: hot days} from RETENTION_HOT_DAYS and RETENTION_HOT_DAYS_<CITY>; 0 keeps everything hot"""
+    default = int(environ.get('RETENTION_HOT_DAYS', 0))
+    return {city: int(environ.get(f'RETENTION_HOT_DAYS_{city.upper()}', default)) for city in cities}
+
+
+def file_signature(path):
+    """(size, mtime) of a file, to notice when a source dataset changes"""
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+ROLLUP_FIELDS = [f'{name}_{stat}' for name in ROLLUP_COLUMNS for stat in ROLLUP_STATS]
+
+
+class DailyRollups:
+    """Per-UTC-day aggregates as arrays: day epochs, hours observed, one column per statistic"""
+
+    def __init__(self, epochs=(), hours=(), values=None):
+        self.epochs = np.asarray(epochs, dtype=np.int64)
+        self.hours = np.asarray(hours, dtype=np.int64)
+        self.values = np.empty((0, len(ROLLUP_FIELDS))) if values is None else np.asarray(values, dtype=float)
+
+    def __len__(self):
+        return self.epochs.shape[0]
+
+    @classmethod
+    def from_readings(cls, epochs, readings):
+        days = np.asarray(epochs, dtype=np.int64) // DAY * DAY
+        unique, which = np.unique(days, return_inverse=True)
+        values = np.full((unique.size, len(ROLLUP_FIELDS)), np.nan)
+        for c, name in enumerate(ROLLUP_COLUMNS):
+            column = np.array([reading.get(name) for reading in readings], dtype=float)
+            finite = np.isfinite(column)
+            counts = np.bincount(which[finite], minlength=unique.size)
+            sums = np.bincount(which[finite], weights=column[finite], minlength=unique.size)
+            lows = np.full(unique.size, np.inf)
+            highs = np.full(unique.size, -np.inf)
+            np.minimum.at(lows, which[finite], column[finite])
+            np.maximum.at(highs, which[finite], column[finite])
+            seen = counts > 0
+            base = c * len(ROLLUP_STATS)
+            values[seen, base] = sums[seen] / counts[seen]
+            values[seen, base + 1] = lows[seen]
+            values[seen, base + 2] = highs[seen]
+        return cls(unique, np.bincount(which, minlength=unique.size), values)
+
+    def merge(self, newer):
+        """Rollups with the days of newer replacing the same days here"""
+        keep = ~np.isin(self.epochs, newer.epochs)
+        epochs = np.concatenate([self.epochs[keep], newer.epochs])
+        order = np.argsort(epochs, kind='stable')
+        return DailyRollups(epochs[order], np.concatenate([self.hours[keep], newer.hours])[order],
+                            np.concatenate([self.values[keep], newer.values])[order])
+
+    @classmethod
+    def read(cls, path):
+        epochs, hours, values = [], [], []
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            for row in csv.DictReader(file):
+                epochs.append(int(row['epoch']))
+                hours.append(int(row['hours']))
+                values.append([float(row[field]) if row.get(field) else np.nan for field in ROLLUP_FIELDS])
+        return cls(epochs, hours, np.array(values, dtype=float).reshape(len(epochs), len(ROLLUP_FIELDS)))
+
+    def write(self, path):
+        with open(path + '.tmp', 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, lineterminator='\n')
+            writer.writerow(['day', 'epoch', 'hours'] + ROLLUP_FIELDS)
+            for epoch, hours, values in zip(self.epochs, self.hours, self.values):
+                writer.writerow([_day(epoch), int(epoch), int(hours)]
+                                + ['' if np.isnan(value) else round(float(value), 4) for value in values])
+        os.replace(path + '.tmp', path)
+
+    def records(self, start=None, end=None):
+        """Days whose start lies within [start, end] (start rounded down to its day)"""
+        lo = 0 if start is None else int(np.searchsorted(self.epochs, start // DAY * DAY, side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.epochs, end, side='right'))
+        return [{'day': _day(self.epochs[i]), 'epoch': int(self.epochs[i]), 'hours': int(self.hours[i]),
+                 **{field: None if np.isnan(value) else round(float(value), 4)
+                    for field, value in zip(ROLLUP_FIELDS, self.values[i])}}
+                for i in range(lo, hi)]
+
+
+def _day(epoch):
+    return str(np.datetime64(int(epoch), 's').astype('datetime64[D]'))
+
+
+class TieredHistory:
+    """Hot file, daily rollups and cold monthly partitions of every city"""
+
+    def __init__(self, root, hot_days):
+        self.root = root
+        self.hot_days = dict(hot_days)
+        self._rollups = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+        for city in self.hot_days:
+            self._rollups[city] = self._read_rollups(city)
+
+    def enabled(self, city):
+        return self.hot_days.get(city, 0) > 0
+
+    def _city_dir(self, city):
+        return os.path.join(self.root, city)
+
+    def hot_path(self, city):
+        return os.path.join(self._city_dir(city), 'hot.csv')
+
+    def _daily_path(self, city):
+        return os.path.join(self._city_dir(city), 'daily.csv')
+
+    def _manifest_path(self, city):
+        return os.path.join(self._city_dir(city), 'manifest.json')
+
+    def _partition_path(self, city, month):
+        return os.path.join(self._city_dir(city), 'cold', month[:4], f'{month}.csv.gz')
+
+    def manifest(self, city):
+        try:
+            with open(self._manifest_path(city), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, city, manifest):
+        path = self._manifest_path(city)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def boot_path(self, city, source_path):
+        """File to load a city from: its hot file once the source has been compacted"""
+        if not self.enabled(city) or not source_path:
+            return source_path
+        manifest = self.manifest(city)
+        if os.path.exists(self.hot_path(city)) and manifest.get('source') == file_signature(source_path):
+            return self.hot_path(city)
+        return source_path
+
+    def cutoff(self, city, latest_epoch):
+        """First epoch kept hot: the start of the UTC day hot_days before the newest reading"""
+        return (int(latest_epoch) - self.hot_days[city] * DAY) // DAY * DAY
+
+    def hot_start(self, city):
+        return self.manifest(city).get('hot_start')
+
+    def partitions(self, city):
+        """[(month, path)] of a city's cold partitions, oldest first"""
+        found = []
+        cold = os.path.join(self._city_dir(city), 'cold')
+        for year in sorted(os.listdir(cold)) if os.path.isdir(cold) else []:
+            for name in sorted(os.listdir(os.path.join(cold, year))):
+                if name.endswith('.csv.gz'):
+                    found.append((name[:-len('.csv.gz')], os.path.join(cold, year, name)))
+        return found
+
+    def _read_partition(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+            return read_readings(file)
+
+    def _write_partition(self, path, readings):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8', newline='') as file:
+            write_readings(file, readings)
+        os.replace(path + '.tmp', path)
+
+    def iter_range(self, city, start=None, end=None):
+        """Chunks of cold readings with start <= epoch <= end, one per partition touched"""
+        first = None if start is None else str(np.datetime64(int(start), 's').astype('datetime64[M]'))
+        last = None if end is None else str(np.datetime64(int(end), 's').astype('datetime64[M]'))
+        for month, path in self.partitions(city):
+            if (first and month < first) or (last and month > last):
+                continue
+            readings = self._read_partition(path)
+            epochs = parse_timestamps_utc([reading.timestamp for reading in readings])
+            keep = np.ones(len(readings), dtype=bool)
+            if start is not None:
+                keep &= epochs >= start
+            if end is not None:
+                keep &= epochs <= end
+            selected = [reading for reading, k in zip(readings, keep) if k]
+            if selected:
+                yield selected
+
+    def _read_rollups(self, city):
+        path = self._daily_path(city)
+        return DailyRollups.read(path) if os.path.exists(path) else DailyRollups()
+
+    def rollups(self, city, start=None, end=None):
+        """Daily rollups of a city whose day starts within [start, end]"""
+        with self._lock:
+            rollups = self._rollups.get(city)
+        return rollups.records(start, end) if rollups is not None else []
+
+    def rollups_by_city(self):
+        return dict(self._rollups)
+
+    def compact(self, city, chunks, cutoff):
+        """Archive record chunks older than cutoff into cold partitions and rollups; returns rows archived"""
+        started = time.perf_counter()
+        readings = [Reading.from_record(record) for chunk in chunks for record in chunk]
+        epochs = parse_timestamps_utc([reading.timestamp for reading in readings])
+        keep = (epochs < cutoff) & (epochs != np.iinfo(np.int64).min)
+        readings = [reading for reading, k in zip(readings, keep) if k]
+        epochs = epochs[keep]
+        os.makedirs(self._city_dir(city), exist_ok=True)
+
+        if readings:
+            months = epochs.astype('datetime64[s]').astype('datetime64[M]').astype(str)
+            days = set((epochs // DAY * DAY).tolist())
+            # Rollups of the touched days come from the merged partitions, so a pass
+            # over part of an archived day does not shrink that day to its own rows
+            day_epochs, day_readings = [], []
+            for month in np.unique(months):
+                selected = np.flatnonzero(months == month)
+                path = self._partition_path(city, str(month))
+                # Merge with what the partition already holds; rows of the same hour are replaced
+                merged = {}
+                if os.path.exists(path):
+                    existing = self._read_partition(path)
+                    for reading, epoch in zip(existing, parse_timestamps_utc([r.timestamp for r in existing])):
+                        merged[int(epoch)] = reading
+                for i in selected:
+                    merged[int(epochs[i])] = readings[i]
+                self._write_partition(path, [merged[epoch] for epoch in sorted(merged)])
+                for epoch in sorted(merged):
+                    if epoch // DAY * DAY in days:
+                        day_epochs.append(epoch)
+                        day_readings.append(merged[epoch])
+
+            with self._lock:
+                rollups = self._rollups.get(city, DailyRollups()).merge(
+                    DailyRollups.from_readings(day_epochs, day_readings))
+                rollups.write(self._daily_path(city))
+                self._rollups[city] = rollups
+
+        with self._lock:
+            stats = self._stats.setdefault(city, {'archived_rows': 0, 'compactions': 0})
+            stats['archived_rows'] += len(readings)
+            stats['compactions'] += 1
+            stats['last_compaction'] = time.time()
+            stats['last_compaction_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return len(readings)
+
+    def save_hot(self, city, cutoff, hot_rows, records=None, source_path=None):
+        """Record the new hot window; records (the CSV backend) are written as the next boot's hot file"""
+        os.makedirs(self._city_dir(city), exist_ok=True)
+        if records is not None:
+            path = self.hot_path(city)
+            with open(path + '.tmp', 'w', encoding='utf-8', newline='') as file:
+                write_readings(file, (Reading.from_record(record) for record in records))
+            os.replace(path + '.tmp', path)
+        manifest = self.manifest(city)
+        manifest.update({'hot_days': self.hot_days[city], 'hot_start': int(cutoff), 'hot_rows': int(hot_rows),
+                         'compacted_at': time.time()})
+        if source_path:
+            manifest['source'] = file_signature(source_path)
+        self._write_manifest(city, manifest)
+
+    def status(self):
+        summary = {}
+        for city, days in self.hot_days.items():
+            if days <= 0:
+                continue
+            partitions = self.partitions(city)
+            manifest = self.manifest(city)
+            with self._lock:
+                stats = dict(self._stats.get(city, {}))
+                rollup_days = len(self._rollups.get(city, ()))
+            summary[city] = {
+                'hot_days': days,
+                'hot_start': manifest.get('hot_start'),
+                'hot_rows': manifest.get('hot_rows'),
+                'rollup_days': rollup_days,
+                'cold_partitions': len(partitions),
+                'cold_bytes': sum(os.path.getsize(path) for _, path in partitions),
+                **stats
+            }
+        return summary
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de alertas.
+
+Crea N suscripciones aleatorias (umbrales sobre pm25, pm10 y o3, subiendo o
+bajando) y reproduce el histórico de una ciudad lectura por lectura. Compara
+el tiempo por lectura de AlertEngine.evaluate (índices ordenados) contra un
+recorrido ingenuo de todas las suscripciones y verifica que ambos generan
+exactamente las mismas notificaciones.
+
+    python bench_alerts.py --subscriptions 100000 --readings 2000
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from alerts import AlertEngine
+
+# contaminante -> (mínimo, máximo) de los umbrales aleatorios
+RANGOS = {'pm25': (0.0, 120.0), 'pm10': (0.0, 250.0), 'o3': (0.0, 0.15)}
+
+
+class SinkContador:
+    def __init__(self):
+        self.enviadas = 0
+
+    def send(self, notificacion):
+        self.enviadas += 1
+
+
+def leer_lecturas(ruta, limite):
+    lecturas = []
+    with open(ruta, newline='', encoding='utf-8') as archivo:
+        for fila in csv.DictReader(archivo):
+            valores = {}
+            for contaminante in RANGOS:
+                try:
+                    valores[contaminante] = float(fila[contaminante])
+                except (KeyError, TypeError, ValueError):
+                    valores[contaminante] = None
+            lecturas.append(valores)
+    return lecturas[-limite:]
+
+
+def recorrido_ingenuo(suscripciones, ultimos, valores):
+    """Revisa todas las suscripciones de la ciudad en cada lectura"""
+    cruzadas = []
+    for contaminante, valor in valores.items():
+        if valor is None:
+            continue
+        previo = ultimos.get(contaminante)
+        ultimos[contaminante] = valor
+        if previo is None:
+            continue
+        for s in suscripciones:
+            if s.pollutant != contaminante:
+                continue
+            if s.direction == 'above' and previo < s.threshold <= valor:
+                cruzadas.append(s.id)
+            elif s.direction == 'below' and valor < s.threshold <= previo:
+                cruzadas.append(s.id)
+    return cruzadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del motor de alertas')
+    parser.add_argument('--subscriptions', type=int, default=100000, help='Suscripciones aleatorias')
+    parser.add_argument('--readings', type=int, default=2000, help='Lecturas del histórico a reproducir')
+    parser.add_argument('--csv', default=os.path.join(BACKEND_DIR, 'data', 'dataset_final_cdmx_limpio.csv'))
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sink = SinkContador()
+    motor = AlertEngine(store=None, sink=sink, max_subscriptions=args.subscriptions)
+
+    t0 = time.perf_counter()
+    for _ in range(args.subscriptions):
+        contaminante = random.choice(list(RANGOS))
+        bajo, alto = RANGOS[contaminante]
+        motor.subscribe('cdmx', contaminante, round(random.uniform(bajo, alto), 3),
+                        random.choice(('above', 'below')), persist=False)
+    print(f"🔔 {args.subscriptions} suscripciones creadas en {time.perf_counter() - t0:.2f} s")
+
+    lecturas = leer_lecturas(args.csv, args.readings)
+    print(f"📊 {len(lecturas)} lecturas de {os.path.basename(args.csv)}")
+
+    tiempos = []
+    notificaciones = []
+    for valores in lecturas:
+        inicio = time.perf_counter()
+        notificaciones.append(sorted(n['subscription_id'] for n in motor.evaluate('cdmx', valores)))
+        tiempos.append(time.perf_counter() - inicio)
+
+    suscripciones = motor.list(limit=args.subscriptions)
+    ultimos = {}
+    tiempos_ingenuo = []
+    iguales = True
+    for valores, esperadas in zip(lecturas, notificaciones):
+        inicio = time.perf_counter()
+        cruzadas = recorrido_ingenuo(suscripciones, ultimos, valores)
+        tiempos_ingenuo.append(time.perf_counter() - inicio)
+        iguales = iguales and sorted(cruzadas) == esperadas
+
+    tiempos.sort()
+    total = sum(len(n) for n in notificaciones)
+    indice_ms = sum(tiempos) / len(tiempos) * 1000
+    ingenuo_ms = sum(tiempos_ingenuo) / len(tiempos_ingenuo) * 1000
+    print(f"⚡ Índice ordenado: {indice_ms:.3f} ms/lectura (p99 {tiempos[int(len(tiempos) * 0.99)] * 1000:.3f} ms)")
+    print(f"🐢 Recorrido ingenuo: {ingenuo_ms:.3f} ms/lectura")
+    print(f"📈 Aceleración: {ingenuo_ms / indice_ms:.0f}x, {total} notificaciones "
+          f"({total / len(lecturas):.1f} por lectura)")
+    print(f"{'✅' if iguales else '❌'} Mismas notificaciones en ambos métodos: {iguales}")
+
+    # El envío es asíncrono; esperar a que el hilo vacíe la cola
+    while motor.status()['pending']:
+        time.sleep(0.01)
+    print(f"📬 Entregadas al sink: {sink.enviadas}")
+
+
+if __name__ == "__main__":
+    main()
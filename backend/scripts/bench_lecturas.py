@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la representación de una lectura en el camino de ingesta.
+
+Compara cuatro formas de guardar cada fila del CSV:
+
+- pd.Series(index=columnas, dtype='object'), como hacían los colectores
+- dict de strings de csv.DictReader, como recibían los listeners
+- Reading (readings.py), con __slots__ y valores ya convertidos a float
+- fila de la ColumnTable (un float64 por columna), como referencia
+
+Mide la memoria por registro con tracemalloc, el parseo (filas/s) y el
+parseo más la conversión a float que hace cada listener de la ingesta
+(anomalías, alertas y precisión leen los contaminantes una vez cada uno).
+
+    python bench_lecturas.py --rows 15000
+"""
+
+import argparse
+import csv
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+import pandas as pd
+
+from anomalies import POLLUTANT_LIMITS
+from column_table import ColumnTable
+from readings import FIELDS, Reading, read_readings
+from timeseries import parse_timestamps_utc
+
+# Listeners de la ingesta que convierten cada contaminante por su cuenta
+LISTENERS = 3
+
+
+def leer_texto(ruta, filas):
+    with open(ruta, encoding='utf-8') as archivo:
+        lineas = archivo.readlines()
+    return ''.join(lineas[:1] + lineas[1:filas + 1])
+
+
+def como_series(texto):
+    lector = csv.reader(io.StringIO(texto))
+    columnas = next(lector)
+    return [pd.Series(fila, index=columnas, dtype='object') for fila in lector]
+
+
+def como_dicts(texto):
+    return list(csv.DictReader(io.StringIO(texto)))
+
+
+def como_readings(texto):
+    return read_readings(io.StringIO(texto))
+
+
+def como_tabla(texto):
+    lecturas = read_readings(io.StringIO(texto))
+    epocas = parse_timestamps_utc([lectura.timestamp for lectura in lecturas])
+    return ColumnTable.from_readings(lecturas, epocas, list(FIELDS))
+
+
+def valor(registro, contaminante):
+    crudo = registro.get(contaminante)
+    if crudo is None or crudo == '':
+        return None
+    try:
+        return float(crudo)
+    except (TypeError, ValueError):
+        return None
+
+
+def consumir(registros):
+    """Lo que hacen los listeners con cada lectura: leer sus contaminantes"""
+    total = 0.0
+    for _ in range(LISTENERS):
+        for registro in registros:
+            for contaminante in POLLUTANT_LIMITS:
+                numero = valor(registro, contaminante)
+                if numero is not None:
+                    total += numero
+    return total
+
+
+def memoria_por_registro(constructor, texto, filas):
+    gc.collect()
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    resultado = constructor(texto)
+    usada = tracemalloc.get_traced_memory()[0] - inicio
+    tracemalloc.stop()
+    del resultado
+    return usada / filas
+
+
+def mejor_tiempo(funcion, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la representación de lecturas')
+    parser.add_argument('--csv', default=os.path.join(BACKEND_DIR, 'data', 'dataset_final_cdmx_limpio.csv'))
+    parser.add_argument('--rows', type=int, default=15000, help='Filas del CSV a usar')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por medición (se toma la mejor)')
+    args = parser.parse_args()
+
+    texto = leer_texto(args.csv, args.rows)
+    filas = texto.count('\n') - 1
+    print(f"📊 {filas} filas de {os.path.basename(args.csv)}")
+
+    dicts = como_dicts(texto)
+    lecturas = como_readings(texto)
+    iguales = all(Reading.from_record(d) == r for d, r in zip(dicts, lecturas))
+    print(f"{'✅' if iguales else '❌'} Reading equivale al dict de strings en todas las filas: {iguales}")
+    if not np.isclose(consumir(dicts), consumir(lecturas)):
+        print("❌ Los listeners leen valores distintos")
+
+    # La Series es tan lenta que basta una muestra para medirla
+    muestra = min(filas, 2000)
+    texto_muestra = leer_texto(args.csv, muestra)
+    formas = [
+        ('pd.Series', como_series, texto_muestra, muestra),
+        ('dict de str', como_dicts, texto, filas),
+        ('Reading', como_readings, texto, filas),
+        ('ColumnTable', como_tabla, texto, filas)
+    ]
+
+    print(f"\n{'forma':<14}{'bytes/registro':>16}{'parseo filas/s':>17}{'parseo+listeners':>19}")
+    base = {}
+    for nombre, constructor, datos, n in formas:
+        memoria = memoria_por_registro(constructor, datos, n)
+        parseo = mejor_tiempo(lambda: constructor(datos), args.repeat)
+        registros = constructor(datos)
+        if isinstance(registros, ColumnTable):
+            # La tabla se consume por columnas, no fila a fila
+            consumo = mejor_tiempo(lambda: [registros.column(c) for c in POLLUTANT_LIMITS], args.repeat)
+        else:
+            consumo = mejor_tiempo(lambda: consumir(registros), args.repeat)
+        print(f"{nombre:<14}{memoria:>16,.0f}{n / parseo:>17,.0f}{n / (parseo + consumo):>19,.0f}")
+        if nombre == 'dict de str':
+            base['dict'] = (memoria, parseo + consumo, n)
+        elif nombre == 'Reading':
+            memoria_dict, total_dict, n_dict = base['dict']
+            print(f"   ➜ frente al dict de strings: {memoria_dict / memoria:.1f}x menos memoria, "
+                  f"velocidad relativa {(total_dict / n_dict) / ((parseo + consumo) / n):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
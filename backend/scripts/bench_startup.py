@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque del backend.
+
+1. Perfil de importación: ejecuta `python -X importtime -c "import app_fullstack"`
+   y muestra los módulos con mayor tiempo acumulado.
+2. Arranque real: lanza app_fullstack.py en cada STARTUP_MODE y mide cuándo
+   acepta conexiones el puerto, cuándo responde /livez (primer byte), cuándo
+   está lista cada ciudad y cuánto tarda la primera predicción.
+
+    python bench_startup.py --modes background,eager --top 15
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def perfil_importacion(top):
+    """(total_us, [(acumulado_us, propio_us, módulo)]) de `-X importtime`"""
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app_fullstack'],
+                               cwd=BACKEND_DIR, capture_output=True, text=True)
+    filas = []
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, modulo = linea[len('import time:'):].split('|')
+        filas.append((int(acumulado), int(propio), modulo.rstrip()))
+    total = next((acumulado for acumulado, _, modulo in filas if modulo.strip() == 'app_fullstack'), 0)
+    # Solo módulos de primer nivel (importados directamente por app_fullstack)
+    primer_nivel = [fila for fila in filas if fila[2].startswith('   ') and not fila[2].startswith('    ')]
+    return total, sorted(primer_nivel or filas, reverse=True)[:top]
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def obtener_json(url, timeout=5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as respuesta:
+            return respuesta.status, json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def medir_arranque(modo, ciudades, limite):
+    """Segundos hasta puerto abierto, primer byte de /livez, ciudades listas y primera predicción por ciudad"""
+    puerto = puerto_libre()
+    entorno = dict(os.environ, PORT=str(puerto), STARTUP_MODE=modo)
+    inicio = time.monotonic()
+    proceso = subprocess.Popen([sys.executable, 'app_fullstack.py'], cwd=BACKEND_DIR, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    resultado = {'modo': modo}
+    try:
+        while time.monotonic() - inicio < limite:
+            try:
+                socket.create_connection(('127.0.0.1', puerto), timeout=0.05).close()
+                break
+            except OSError:
+                time.sleep(0.005)
+        resultado['puerto_s'] = round(time.monotonic() - inicio, 3)
+
+        base = f'http://127.0.0.1:{puerto}'
+        # El puerto puede abrirse antes de importar Flask; /livez mide cuándo se atiende de verdad
+        while time.monotonic() - inicio < limite:
+            try:
+                with urllib.request.urlopen(f'{base}/livez', timeout=limite):
+                    break
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.005)
+        resultado['primer_byte_s'] = round(time.monotonic() - inicio, 3)
+        for ciudad in ciudades:
+            t0 = time.monotonic()
+            estado, _ = obtener_json(f'{base}/api/predict/{ciudad}', timeout=limite)
+            resultado[f'prediccion_{ciudad}_s'] = round(time.monotonic() - inicio, 3)
+            resultado[f'prediccion_{ciudad}_espera_s'] = round(time.monotonic() - t0, 3)
+            resultado[f'prediccion_{ciudad}_status'] = estado
+
+        while time.monotonic() - inicio < limite:
+            try:
+                with urllib.request.urlopen(f'{base}/readyz', timeout=5):
+                    break
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.05)
+        _, salud = obtener_json(f'{base}/api/health')
+        if salud:
+            resultado['componentes_listos_s'] = salud['ready']['components']
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de importación y arranque del backend')
+    parser.add_argument('--modes', default='background,eager', help='Modos de arranque a comparar')
+    parser.add_argument('--cities', default='cdmx,la', help='Ciudades a predecir tras el arranque')
+    parser.add_argument('--top', type=int, default=15, help='Módulos a mostrar del perfil de importación')
+    parser.add_argument('--timeout', type=float, default=120, help='Límite por arranque (s)')
+    args = parser.parse_args()
+
+    total, modulos = perfil_importacion(args.top)
+    print(f"📦 import app_fullstack: {total / 1000:.1f} ms")
+    for acumulado, propio, modulo in modulos:
+        print(f"   {acumulado / 1000:8.1f} ms acumulado {propio / 1000:7.1f} ms propio  {modulo.strip()}")
+
+    ciudades = [ciudad.strip() for ciudad in args.cities.split(',') if ciudad.strip()]
+    for modo in args.modes.split(','):
+        resultado = medir_arranque(modo.strip(), ciudades, args.timeout)
+        print(f"\n🚀 STARTUP_MODE={resultado.pop('modo')}")
+        for clave, valor in resultado.items():
+            print(f"   {clave}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Daemon único de captura para todas las ciudades.
+
+Sustituye a los bucles --continuo de cada script: despierta en ticks horarios
+alineados (HH:MM con un desfase configurable para dar tiempo a que OpenAQ
+publique), captura la hora actual de cada ciudad y rellena las horas que
+falten en los CSV realtime tras una caída. Las peticiones pasan por
+upstream.fetch_json (reintentos con backoff exponencial con jitter y caché en
+disco), así que repetir una captura o un backfill no vuelve a descargar lo
+que ya se tiene.
+
+Ejemplo contra el servidor local de pruebas (stub_upstream.py):
+
+    API_KEY_OPENAQ=dummy OPENAQ_BASE_URL=http://127.0.0.1:8765/openaq/v3 \\
+    OPENMETEO_BASE_URL=http://127.0.0.1:8765/openmeteo/v1 \\
+    python collector_daemon.py --once --backfill-hours 6 --data-dir /tmp/airguard
+"""
+
+import argparse
+import csv
+import importlib
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from timeseries import INVALID_EPOCH, correct_legacy_utc, parse_timestamps_utc
+from upstream import backoff_delay
+
+# ciudad -> (módulo del colector, función de captura, CSV realtime)
+CIUDADES = {
+    'cdmx': ('generar_datos_CDMX_24h', 'capturar_hora_actual_cdmx', 'datos_realtime_Centro_CDMX.csv'),
+    'la': ('generar_datos_LA_24h', 'capturar_hora_actual_la', 'datos_realtime_Centro_LA.csv')
+}
+
+HORA = timedelta(hours=1)
+
+
+def horas_capturadas(ruta):
+    """Epochs UTC de las horas que ya están en un CSV realtime"""
+    if not os.path.exists(ruta):
+        return set()
+    with open(ruta, 'r', encoding='utf-8') as archivo:
+        filas = list(csv.DictReader(archivo))
+    # Las filas de los colectores antiguos llevan la hora local etiquetada como +00:00
+    epocas, _ = correct_legacy_utc(filas, parse_timestamps_utc([fila.get('timestamp', '') for fila in filas]))
+    return {int(epoca) for epoca in epocas if epoca != INVALID_EPOCH}
+
+
+def horas_pendientes(ruta, ahora, backfill_horas):
+    """Horas (UTC, de la más antigua a la actual) de la ventana de backfill que faltan en el CSV"""
+    actual = ahora.replace(minute=0, second=0, microsecond=0)
+    capturadas = horas_capturadas(ruta)
+    ventana = [actual - HORA * atras for atras in range(backfill_horas, -1, -1)]
+    return [hora for hora in ventana if int(hora.timestamp()) not in capturadas]
+
+
+def siguiente_tick(ahora, desfase_minutos):
+    """Próximo instante HH:desfase estrictamente posterior a ahora"""
+    tick = ahora.replace(minute=0, second=0, microsecond=0) + timedelta(minutes=desfase_minutos)
+    return tick if tick > ahora else tick + HORA
+
+
+def cargar_capturadores(ciudades):
+    capturadores = {}
+    for ciudad in ciudades:
+        modulo, funcion, _ = CIUDADES[ciudad]
+        capturadores[ciudad] = getattr(importlib.import_module(modulo), funcion)
+    return capturadores
+
+
+def ejecutar_tick(capturadores, backfill_horas, reintentos):
+    """Captura las horas pendientes de cada ciudad; devuelve {ciudad: (capturadas, fallidas)}"""
+    resumen = {}
+    ahora = datetime.now(timezone.utc)
+    actual = ahora.replace(minute=0, second=0, microsecond=0)
+
+    for ciudad, capturar in capturadores.items():
+        ruta = CIUDADES[ciudad][2]
+        pendientes = horas_pendientes(ruta, ahora, backfill_horas)
+        capturadas, fallidas = 0, 0
+        if len(pendientes) > 1:
+            print(f"🔁 {ciudad.upper()}: {len(pendientes) - (actual in pendientes)} horas por rellenar")
+
+        for hora in pendientes:
+            # Solo la hora actual se reintenta aquí; las pasadas siguen pendientes para el próximo tick
+            intentos = reintentos + 1 if hora == actual else 1
+            resultado = None
+            for intento in range(intentos):
+                try:
+                    resultado = capturar(None if hora == actual else hora)
+                except Exception as e:
+                    print(f"❌ {ciudad.upper()} {hora.isoformat()}: {e}")
+                if resultado:
+                    break
+                if intento + 1 < intentos:
+                    espera = backoff_delay(intento, base_delay=30, max_delay=300)
+                    print(f"⏳ Reintentando {ciudad.upper()} en {espera:.0f}s")
+                    time.sleep(espera)
+            if resultado:
+                capturadas += 1
+            else:
+                fallidas += 1
+        resumen[ciudad] = (capturadas, fallidas)
+    return resumen
+
+
+def ejecutar(capturadores, backfill_horas=24, desfase_minutos=5, reintentos=2, una_vez=False):
+    """Bucle principal: un tick al arrancar (recupera lo perdido) y luego uno por hora"""
+    print(f"🚀 Daemon de captura: {', '.join(c.upper() for c in capturadores)} en {os.getcwd()}")
+    try:
+        while True:
+            resumen = ejecutar_tick(capturadores, backfill_horas, reintentos)
+            for ciudad, (capturadas, fallidas) in resumen.items():
+                print(f"📊 {ciudad.upper()}: {capturadas} horas capturadas, {fallidas} pendientes")
+            if una_vez:
+                break
+
+            tick = siguiente_tick(datetime.now(timezone.utc), desfase_minutos)
+            print(f"⏰ Próximo tick: {tick.isoformat()}")
+            time.sleep(max(0, (tick - datetime.now(timezone.utc)).total_seconds()))
+    except KeyboardInterrupt:
+        print("\n🛑 Daemon detenido por el usuario")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Daemon de captura horaria para todas las ciudades')
+    parser.add_argument('--once', action='store_true', help='Ejecutar un solo tick (con backfill) y salir')
+    parser.add_argument('--ciudades', default=','.join(CIUDADES), help='Ciudades separadas por comas')
+    parser.add_argument('--backfill-hours', type=int, default=int(os.getenv('COLLECTOR_BACKFILL_HOURS', 24)),
+                        help='Horas hacia atrás que se revisan en cada tick')
+    parser.add_argument('--offset-minutes', type=int, default=int(os.getenv('COLLECTOR_OFFSET_MINUTES', 5)),
+                        help='Minuto de cada hora en el que se ejecuta el tick')
+    parser.add_argument('--retries', type=int, default=2, help='Reintentos de la hora actual si falla')
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'),
+                        help='Directorio de los CSV realtime')
+    args = parser.parse_args()
+
+    ciudades = [ciudad.strip().lower() for ciudad in args.ciudades.split(',') if ciudad.strip()]
+    desconocidas = [ciudad for ciudad in ciudades if ciudad not in CIUDADES]
+    if desconocidas:
+        parser.error(f"Ciudades desconocidas: {', '.join(desconocidas)}")
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.chdir(args.data_dir)
+    capturadores = cargar_capturadores(ciudades)
+
+    ejecutar(capturadores, args.backfill_hours, args.offset_minutes, args.retries, una_vez=args.once)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Entrena modelos de pronóstico a 24h para PM2.5 y los demás contaminantes.
+
+Cada modelo usa exactamente las mismas columnas que el modelo de PM2.5 de su
+ciudad, de modo que el backend construye la matriz de features una sola vez
+por petición y la comparte entre todos los contaminantes. Los
+hiperparámetros se copian del modelo de PM2.5. Cada modelo se evalúa en un
+holdout temporal frente a la persistencia (repetir el valor actual, que es
+lo que sirve el backend sin modelo); solo si la mejora se reentrena y se
+guarda.
+
+El reentrenamiento final deja fuera las últimas --calibration horas y guarda
+en el modelo trained_until_ (época UTC de la última etiqueta usada): el
+backend calibra los intervalos solo con etiquetas posteriores, que el modelo
+no ha visto. El modelo de PM2.5 incluido en el repositorio no lo registra,
+así que también se reentrena (mismos hiperparámetros y árboles) y se guarda
+como la versión 2 de la ciudad, que el backend prefiere a la original.
+
+    python entrenar_contaminantes.py --cities cdmx,la --trees 500
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from model_manager import ModelManager
+from online_training import HORIZON_HOURS, build_training_set, labelled_rows
+from timeseries import normalize_records
+
+MODEL_DIR = os.path.join(BACKEND_DIR, 'models')
+DATASETS = {
+    'cdmx': os.path.join(BACKEND_DIR, 'data', 'dataset_final_cdmx_limpio.csv'),
+    'la': os.path.join(BACKEND_DIR, 'data', 'dataset_final_LA_limpio.csv')
+}
+CONTAMINANTES = ['co', 'no', 'no2', 'nox', 'o3', 'so2', 'pm10']
+
+
+def entrenar_ciudad(ciudad, arboles, fraccion_holdout, horas_calibracion):
+    modelo_pm25 = ModelManager(MODEL_DIR).discover().get(ciudad)
+    if modelo_pm25 is None:
+        print(f"⚠️ {ciudad.upper()}: no hay modelo de PM2.5 del que copiar features")
+        return
+    base = joblib.load(modelo_pm25[1])
+    etiqueta = os.path.basename(modelo_pm25[1]).split('_predictor_')[1].split('_v')[0].split('.')[0]
+    features = list(base.feature_name_)
+
+    with open(DATASETS[ciudad], 'r', encoding='utf-8') as archivo:
+        registros = list(csv.DictReader(archivo))
+    columnas = sorted({nombre for nombre in features if not nombre.startswith('pm25_lag_')}
+                      | set(CONTAMINANTES) | {'pm25'})
+    serie = normalize_records(registros, columnas)
+    print(f"📊 {ciudad.upper()}: {len(registros)} registros, {len(features)} features")
+
+    for contaminante in ['pm25'] + CONTAMINANTES:
+        if np.isnan(serie.columns[contaminante]).all():
+            continue
+        # La última columna es el valor actual del contaminante, para comparar con la persistencia
+        X, y = build_training_set(serie, features + [contaminante], len(serie), target=contaminante)
+        epocas = serie.epochs()[labelled_rows(serie, len(serie), target=contaminante) + HORIZON_HOURS]
+        X, actual = X[:, :-1], X[:, -1]
+        if len(y) < 100:
+            print(f"   {contaminante}: solo {len(y)} muestras, se omite")
+            continue
+
+        n_holdout = int(len(y) * fraccion_holdout)
+        parametros = dict(base.get_params(), verbose=-1)
+        if contaminante != 'pm25':
+            parametros['n_estimators'] = arboles
+        modelo = base.__class__(**parametros)
+        t0 = time.perf_counter()
+        # Sin nombres LightGBM guarda Column_N y el backend no sabría qué columna va en cada feature
+        modelo.fit(X[:-n_holdout], y[:-n_holdout], feature_name=features)
+        mae = float(np.mean(np.abs(modelo.predict(X[-n_holdout:]) - y[-n_holdout:])))
+        persistencia = float(np.nanmean(np.abs(actual[-n_holdout:] - y[-n_holdout:])))
+        # PM2.5 se guarda siempre: sin él el backend no usa la persistencia sino el modelo incluido
+        if contaminante != 'pm25' and mae > persistencia:
+            # Sin modelo el backend repite el valor actual, que aquí es mejor
+            print(f"   ➖ {contaminante}: MAE holdout {mae:.4f} peor que la persistencia {persistencia:.4f}, "
+                  f"no se guarda")
+            continue
+
+        # Las últimas horas quedan fuera del ajuste final para calibrar los intervalos
+        fin = int(np.count_nonzero(epocas <= epocas[-1] - horas_calibracion * 3600))
+        modelo.fit(X[:fin], y[:fin], feature_name=features)
+        if list(modelo.feature_name_) != features:
+            raise RuntimeError(f"{contaminante}: el modelo quedó con features {modelo.feature_name_[:3]}...")
+        modelo.trained_until_ = int(epocas[fin - 1])
+        version = '_v2' if contaminante == 'pm25' else ''
+        ruta = os.path.join(MODEL_DIR, f'modelo_{contaminante}_predictor_{etiqueta}{version}.pkl')
+        joblib.dump(modelo, ruta + '.tmp')
+        os.replace(ruta + '.tmp', ruta)
+        print(f"   ✅ {contaminante}: MAE holdout {mae:.4f} (persistencia {persistencia:.4f}), "
+              f"{fin} muestras (+{len(y) - fin} para calibrar), {time.perf_counter() - t0:.1f} s "
+              f"-> {os.path.basename(ruta)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entrena modelos de contaminantes con las features de PM2.5')
+    parser.add_argument('--cities', default='cdmx,la', help='Ciudades a entrenar')
+    parser.add_argument('--trees', type=int, default=500,
+                        help='Árboles por modelo (PM2.5 conserva los del modelo incluido)')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Fracción final usada como holdout')
+    parser.add_argument('--calibration', type=int, default=720,
+                        help='Horas finales que no entran al modelo guardado (INTERVAL_CALIBRATION_HOURS)')
+    args = parser.parse_args()
+
+    for ciudad in args.cities.split(','):
+        entrenar_ciudad(ciudad.strip().lower(), args.trees, args.holdout, args.calibration)
+
+
+if __name__ == "__main__":
+    main()
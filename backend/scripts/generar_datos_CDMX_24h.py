@@ -5,15 +5,20 @@ Basado en datos_historicos_mexico_hourly.py que SÍ funcionó para CDMX
 Genera CSV con formato correcto para el modelo de predicción
 """
 
+import csv
 import os
-import requests
-import json
-import pandas as pd
+import sys
 from datetime import datetime, timedelta, date, timezone
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 import argparse
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from upstream import UpstreamError, fetch_json, ttl_for
+from storage import save_collected_rows
+from weather_cache import weather_for
+
 # Cargar variables de entorno
 load_dotenv()
 API_KEY = os.getenv("API_KEY_OPENAQ")
@@ -39,25 +44,51 @@ CSV_COLUMNS = [
     'pm25_lag_3h', 'pm25_lag_6h', 'pm25_lag_12h', 'pm25_lag_24h'
 ]
 
-base_url = "https://api.openaq.org/v3/"
+# URLs base de las APIs (se pueden apuntar a un servidor local de pruebas)
+base_url = os.getenv("OPENAQ_BASE_URL", "https://api.openaq.org/v3").rstrip('/') + '/'
 headers = {"accept": "application/json", "X-API-Key": API_KEY}
 
-def obtener_sensores_cdmx(location_id):
-    """Obtiene sensores para CDMX usando el método exitoso."""
+def cargar_catalogo_estaciones():
+    """Catálogo local de estaciones compartido con el backend (data/stations.json)."""
+    from stations import CATALOG_FILE, StationCatalog
+    
+    ruta = os.getenv("STATIONS_CATALOG") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'data', CATALOG_FILE)
+    return StationCatalog(ruta)
+
+def obtener_sensores_cdmx(location_id, catalogo=None):
+    """Obtiene sensores para CDMX; usa el catálogo local mientras no haya caducado."""
+    if catalogo is not None:
+        estacion = catalogo.get(location_id)
+        if estacion and estacion.get('sensors') and \
+                time.time() - estacion.get('sensors_refreshed_at', 0) < catalogo.max_age_seconds:
+            print(f"📡 {len(estacion['sensors'])} sensores CDMX desde el catálogo local")
+            return {name: int(sensor_id) for sensor_id, name in estacion['sensors'].items()}
+    
     sensors_url = f"{base_url}locations/{location_id}/sensors"
     print(f"📡 Obteniendo sensores CDMX desde: {sensors_url}")
     
     try:
-        response = requests.get(sensors_url, headers=headers)
-        response.raise_for_status()
-        
-        sensors_list = response.json()['results']
+        sensors_list = fetch_json(sensors_url, headers=headers, ttl=24 * 3600)['results']
         if not sensors_list:
             print(f"❌ No se encontraron sensores para CDMX")
             return []
         
         print(f"✅ Se encontraron {len(sensors_list)} sensores CDMX")
         
+        if catalogo is not None:
+            catalogo.upsert({
+                'id': location_id,
+                'name': CDMX_CONFIG["name"],
+                'lat': CDMX_CONFIG["lat"],
+                'lon': CDMX_CONFIG["lon"],
+                'city': 'cdmx',
+                'sensors': {str(sensor['id']): sensor['name'] for sensor in sensors_list},
+                'sensors_refreshed_at': time.time(),
+                'source': 'openaq'
+            })
+            catalogo.save()
+        
         # Mostrar detalles de sensores y crear mapeo
         sensor_mapping = {}
         for sensor in sensors_list:
@@ -83,16 +114,14 @@ def obtener_mediciones_cdmx_rango(sensor_id, datetime_from, datetime_to):
     }
     
     try:
-        response = requests.get(measurements_url, headers=headers, params=params)
+        # Las mediciones de horas pasadas ya no cambian: se guardan en caché mucho tiempo
+        hasta = datetime.fromisoformat(datetime_to.replace('Z', '+00:00'))
+        data = fetch_json(measurements_url, params=params, headers=headers, ttl=ttl_for(hasta))
+        return data.get('results', [])
         
-        if response.status_code == 200:
-            data = response.json()
-            measurements = data.get('results', [])
-            return measurements
-        else:
-            print(f"      ❌ Error HTTP {response.status_code} para sensor {sensor_id}")
-            return []
-            
+    except UpstreamError as e:
+        print(f"      ❌ Error HTTP {e.status} para sensor {sensor_id}")
+        return []
     except Exception as e:
         print(f"      ❌ Error obteniendo mediciones sensor {sensor_id}: {e}")
         return []
@@ -102,8 +131,9 @@ def obtener_datos_openaq_cdmx_hora(sensor_mapping, target_hour):
     print(f"   🔍 Obteniendo datos OpenAQ CDMX para hora {target_hour}")
     
     # Crear rango de tiempo para esta hora
-    datetime_from = target_hour.strftime('%Y-%m-%dT%H:%M:%SZ')
-    datetime_to = (target_hour + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    target_hour_utc = target_hour.astimezone(timezone.utc)
+    datetime_from = target_hour_utc.strftime('%Y-%m-%dT%H:%M:%SZ')
+    datetime_to = (target_hour_utc + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
     
     air_quality_data = {}
     
@@ -162,7 +192,7 @@ def obtener_pm25_lag_cdmx(sensor_mapping, target_hour):
         lag_key = f"pm25_lag_{hours_back}h"
         
         # Calcular tiempo objetivo
-        target_time = target_hour - timedelta(hours=hours_back)
+        target_time = target_hour.astimezone(timezone.utc) - timedelta(hours=hours_back)
         datetime_from = target_time.strftime('%Y-%m-%dT%H:%M:%SZ')
         datetime_to = (target_time + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
         
@@ -183,63 +213,57 @@ def obtener_pm25_lag_cdmx(sensor_mapping, target_hour):
     
     return lag_data
 
-def get_openmeteo_data_cdmx(lat, lon, start_date, end_date):
-    """Obtiene datos meteorológicos para CDMX."""
-    base_url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "timezone": "America/Mexico_City",
-        "start_date": start_date,
-        "end_date": end_date,
-        "hourly": ["temperature_2m", "relativehumidity_2m", "precipitation", "pressure_msl", 
-                   "windspeed_10m", "winddirection_10m", "boundary_layer_height"],
-        "daily": ["shortwave_radiation_sum"]
-    }
-    
-    # Construir URL con parámetros múltiples
-    hourly_params = "&".join([f"hourly={var}" for var in params['hourly']])
-    daily_params = "&".join([f"daily={var}" for var in params['daily']])
-    del params['hourly'], params['daily']
-    
-    import urllib.parse
-    full_url = f"{base_url}?{urllib.parse.urlencode(params)}&{hourly_params}&{daily_params}"
+def guardar_filas_csv(filename, filas):
+    """Agrega filas al CSV realtime sin releerlo: solo se lee la cabecera si ya existe."""
+    if os.path.exists(filename) and os.path.getsize(filename) > 0:
+        with open(filename, 'r', encoding='utf-8', newline='') as archivo:
+            columnas = next(csv.reader(archivo))
+        print(f"📝 Agregando datos a archivo existente")
+        modo = 'a'
+    else:
+        columnas = CSV_COLUMNS
+        print(f"📝 Creando nuevo archivo")
+        modo = 'w'
     
-    import urllib.request
-    with urllib.request.urlopen(full_url) as response:
-        if response.status != 200:
-            raise Exception(f"API Open-Meteo falló con código {response.status}")
-        return json.loads(response.read().decode("utf-8"))
+    with open(filename, modo, encoding='utf-8', newline='') as archivo:
+        writer = csv.DictWriter(archivo, fieldnames=columnas, extrasaction='ignore')
+        if modo == 'w':
+            writer.writeheader()
+        writer.writerows(filas)
 
-def capturar_hora_actual_cdmx():
-    """Captura datos de CDMX para la hora actual solamente."""
+def capturar_hora_actual_cdmx(hora_objetivo_utc=None):
+    """Captura datos de CDMX para la hora actual (o para hora_objetivo_utc en un backfill)."""
     print("🌍 CAPTURANDO DATOS HORA ACTUAL - CIUDAD DE MÉXICO")
     print("="*60)
     
-    # Obtener sensores disponibles
-    sensor_mapping = obtener_sensores_cdmx(CDMX_CONFIG["location_id"])
+    # Obtener sensores disponibles (catálogo local, OpenAQ solo si caducó)
+    try:
+        catalogo = cargar_catalogo_estaciones()
+    except Exception as e:
+        print(f"⚠️ Catálogo de estaciones no disponible: {e}")
+        catalogo = None
+    sensor_mapping = obtener_sensores_cdmx(CDMX_CONFIG["location_id"], catalogo)
     if not sensor_mapping:
         print("❌ No se pudieron obtener sensores para CDMX")
         return None
     
     # Obtener hora actual
-    now_utc = datetime.now(timezone.utc)
+    now_utc = hora_objetivo_utc or datetime.now(timezone.utc)
     today = now_utc.date()
     current_hour = now_utc.hour
     
     print(f"⏰ Hora UTC actual: {now_utc.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"🎯 Capturando datos para hora: {current_hour:02d}:00")
     
-    # Obtener datos meteorológicos para todo el día
-    print(f"\n🌤️ OBTENIENDO DATOS METEOROLÓGICOS CDMX...")
-    weather_data = get_openmeteo_data_cdmx(
-        CDMX_CONFIG["lat"], CDMX_CONFIG["lon"],
-        today.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
-    )
+    # Hora objetivo en zona horaria CDMX (respeta cambios de offset)
+    target_timestamp = datetime.combine(today, datetime.min.time().replace(hour=current_hour))
+    target_timestamp = target_timestamp.replace(tzinfo=timezone.utc)
+    target_timestamp_cdmx = target_timestamp.astimezone(ZoneInfo(CDMX_CONFIG["timezone"]))
+    local_hour = target_timestamp_cdmx.hour
     
-    df_hourly = pd.DataFrame(weather_data['hourly'])
-    df_hourly['time'] = pd.to_datetime(df_hourly['time'])
-    radiation_sum = weather_data['daily']['shortwave_radiation_sum'][0]
+    # Datos meteorológicos de la caché local (una petición multi-día y multi-ciudad al fallar)
+    print(f"\n🌤️ OBTENIENDO DATOS METEOROLÓGICOS CDMX...")
+    clima = weather_for('cdmx', target_timestamp)
     
     all_rows = []
     
@@ -248,42 +272,37 @@ def capturar_hora_actual_cdmx():
     print(f"\n📅 PROCESANDO HORA ACTUAL CDMX: {hour:02d}:00")
     
     try:
-            # Crear timestamp para esta hora en zona horaria CDMX
-            target_timestamp = datetime.combine(today, datetime.min.time().replace(hour=hour))
-            target_timestamp = target_timestamp.replace(tzinfo=timezone.utc)
-            target_timestamp_cdmx = target_timestamp - timedelta(hours=6)  # UTC-6 para CDMX
-            
             print(f"Hora objetivo CDMX: {target_timestamp_cdmx.strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # Buscar datos meteorológicos para esta hora
-            matching_weather = df_hourly[df_hourly['time'].dt.hour == hour]
-            
-            if not matching_weather.empty:
-                current_weather_row = matching_weather.iloc[0]
-                
+            if clima is not None:
                 # Crear nueva fila con formato correcto
-                new_row = pd.Series(index=CSV_COLUMNS, dtype='object')
+                new_row = dict.fromkeys(CSV_COLUMNS)
                 new_row['timestamp'] = target_timestamp_cdmx
                 
                 # Añadir datos meteorológicos
-                for col in current_weather_row.index:
-                    if col in new_row.index:
-                        new_row[col] = current_weather_row[col]
-                new_row['shortwave_radiation_sum'] = radiation_sum
+                for col, value in clima.items():
+                    if col in new_row:
+                        new_row[col] = value
                 
                 # Obtener datos de calidad del aire para esta hora
                 air_quality_data = obtener_datos_openaq_cdmx_hora(sensor_mapping, target_timestamp_cdmx)
                 for param, value in air_quality_data.items():
-                    if param in new_row.index:
+                    if param in new_row:
                         new_row[param] = value
                 
+                # Última lectura de PM2.5 para /api/nearest
+                if catalogo is not None and air_quality_data.get('pm25') is not None:
+                    catalogo.record_reading(CDMX_CONFIG["location_id"], air_quality_data['pm25'],
+                                            target_timestamp.isoformat())
+                    catalogo.save()
+                
                 # Obtener datos de lag PM2.5
                 lag_data = obtener_pm25_lag_cdmx(sensor_mapping, target_timestamp_cdmx)
                 for lag_col, lag_value in lag_data.items():
                     new_row[lag_col] = lag_value
                 
                 # Añadir características temporales
-                new_row['hour_of_day'] = hour
+                new_row['hour_of_day'] = local_hour
                 new_row['day_of_week'] = target_timestamp_cdmx.weekday()
                 new_row['month_of_year'] = target_timestamp_cdmx.month
                 new_row['is_weekend'] = target_timestamp_cdmx.weekday() >= 5
@@ -298,24 +317,9 @@ def capturar_hora_actual_cdmx():
     
     # Guardar CSV (agregar a archivo existente o crear nuevo)
     if all_rows:
-        df_new = pd.DataFrame(all_rows)
         filename = f"datos_realtime_Centro_CDMX.csv"
-        
-        # Verificar si el archivo ya existe
-        if os.path.exists(filename):
-            # Leer archivo existente y agregar nueva fila
-            try:
-                df_existing = pd.read_csv(filename)
-                df_final = pd.concat([df_existing, df_new], ignore_index=True)
-                print(f"📝 Agregando datos a archivo existente")
-            except Exception as e:
-                print(f"⚠️ Error leyendo archivo existente: {e}")
-                df_final = df_new
-        else:
-            df_final = df_new
-            print(f"📝 Creando nuevo archivo")
-        
-        df_final.to_csv(filename, index=False)
+        guardar_filas_csv(filename, all_rows)
+        save_collected_rows('cdmx', all_rows)
         
         print(f"\n🎉 DATOS CAPTURADOS PARA CDMX")
         print(f"📊 Hora procesada: {current_hour:02d}:00")
@@ -327,34 +331,10 @@ def capturar_hora_actual_cdmx():
         return None
 
 def ejecutar_captura_continua_cdmx():
-    """Ejecuta la captura de datos cada hora de manera continua."""
-    print("🔄 INICIANDO CAPTURA CONTINUA PARA CIUDAD DE MÉXICO")
-    print("⏰ Capturará datos automáticamente cada hora")
-    print("🛑 Presiona Ctrl+C para detener")
-    print("="*60)
+    """Ejecuta la captura cada hora mediante el daemon común (ticks alineados, reintentos y backfill)."""
+    from collector_daemon import ejecutar
     
-    ultima_hora_procesada = -1
-    
-    try:
-        while True:
-            now_utc = datetime.now(timezone.utc)
-            hora_actual = now_utc.hour
-            
-            # Solo procesar si es una nueva hora
-            if hora_actual != ultima_hora_procesada:
-                print(f"\n🕐 Nueva hora detectada: {hora_actual:02d}:00 UTC")
-                capturar_hora_actual_cdmx()
-                ultima_hora_procesada = hora_actual
-                
-                # Esperar hasta el siguiente minuto para evitar procesamiento múltiple
-                print(f"⏳ Esperando próxima hora...")
-            
-            # Verificar cada 30 segundos
-            time.sleep(30)
-            
-    except KeyboardInterrupt:
-        print("\n🛑 Captura detenida por el usuario")
-        print("💾 Datos guardados hasta el momento")
+    ejecutar({'cdmx': capturar_hora_actual_cdmx})
 
 def main():
     parser = argparse.ArgumentParser(description='Captura datos de Ciudad de México por hora')
@@ -5,16 +5,21 @@ Basado en captura_realtime_open_aq_x_meteo.py que SÍ funcionó para LA
 Genera CSV con formato correcto para el modelo de predicción
 """
 
-import pandas as pd
 from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import csv
 import os
+import sys
 import time
-import urllib.request
 import urllib.parse
-import json
 from dotenv import load_dotenv
 import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from upstream import UpstreamError, fetch_json, ttl_for
+from storage import save_collected_rows
+from weather_cache import weather_for
+
 # Cargar variables de entorno
 load_dotenv()
 API_KEY_OPENAQ = os.getenv("API_KEY_OPENAQ")
@@ -22,6 +27,9 @@ API_KEY_OPENAQ = os.getenv("API_KEY_OPENAQ")
 if not API_KEY_OPENAQ:
     raise ValueError("No se encontró la API Key. Asegúrate de crear un archivo .env con API_KEY_OPENAQ.")
 
+# URLs base de las APIs (se pueden apuntar a un servidor local de pruebas)
+OPENAQ_BASE_URL = os.getenv("OPENAQ_BASE_URL", "https://api.openaq.org/v3")
+
 # Configuración específica para LA (basada en el script exitoso)
 LA_CONFIG = {
     "lat": 34.05, 
@@ -53,15 +61,12 @@ PARAMETER_MAPPING = {
 def obtener_sensores_ubicacion_la(location_id, api_key):
     """Obtiene la lista de sensores para una ubicación específica en LA."""
     headers = {"X-API-Key": api_key}
-    sensors_url = f"https://api.openaq.org/v3/locations/{location_id}/sensors"
+    sensors_url = f"{OPENAQ_BASE_URL}/locations/{location_id}/sensors"
     
     try:
-        req = urllib.request.Request(sensors_url, headers=headers)
-        with urllib.request.urlopen(req) as response:
-            if response.status == 200:
-                data = json.loads(response.read().decode("utf-8"))
-                if data.get('results'):
-                    return data['results']
+        data = fetch_json(sensors_url, headers=headers, ttl=24 * 3600)
+        if data.get('results'):
+            return data['results']
     except Exception as e:
         print(f"...⚠️ Error obteniendo sensores LA: {e}")
     
@@ -71,10 +76,10 @@ def obtener_mediciones_sensor_historicas_la(sensor_id, datetime_from, datetime_t
     """Obtiene mediciones históricas de un sensor específico para LA."""
     headers = {"X-API-Key": api_key}
     
-    start_time = datetime_from.strftime('%Y-%m-%dT%H:%M:%SZ')
-    end_time = datetime_to.strftime('%Y-%m-%dT%H:%M:%SZ')
+    start_time = datetime_from.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    end_time = datetime_to.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
     
-    measurements_url = f"https://api.openaq.org/v3/sensors/{sensor_id}/measurements"
+    measurements_url = f"{OPENAQ_BASE_URL}/sensors/{sensor_id}/measurements"
     params = {
         'datetime_from': start_time,
         'datetime_to': end_time,
@@ -82,15 +87,11 @@ def obtener_mediciones_sensor_historicas_la(sensor_id, datetime_from, datetime_t
     }
     
     try:
-        full_url = f"{measurements_url}?{urllib.parse.urlencode(params)}"
-        req = urllib.request.Request(full_url, headers=headers)
-        
-        with urllib.request.urlopen(req) as response:
-            if response.status == 200:
-                data = json.loads(response.read().decode("utf-8"))
-                return data.get('results', [])
-            else:
-                print(f"...❌ Error HTTP {response.status} para sensor {sensor_id}")
+        # Las mediciones de horas pasadas ya no cambian: se guardan en caché mucho tiempo
+        data = fetch_json(measurements_url, params=params, headers=headers, ttl=ttl_for(datetime_to))
+        return data.get('results', [])
+    except UpstreamError as e:
+        print(f"...❌ Error HTTP {e.status} para sensor {sensor_id}")
     except Exception as e:
         print(f"...⚠️ Error obteniendo mediciones del sensor {sensor_id}: {e}")
     
@@ -163,119 +164,149 @@ def obtener_pm25_historico_la(location_id, target_timestamp, api_key):
     
     return lag_values
 
-def get_openaq_data_la(lat, lon, api_key):
-    """Obtiene datos de calidad del aire para LA (método exitoso)."""
+def cargar_catalogo_estaciones():
+    """Catálogo local de estaciones compartido con el backend (data/stations.json)."""
+    from stations import CATALOG_FILE, StationCatalog
+    
+    ruta = os.getenv("STATIONS_CATALOG") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'data', CATALOG_FILE)
+    return StationCatalog(ruta)
+
+def buscar_ubicaciones_la(catalogo, lat, lon, api_key, radio_km=10):
+    """Ubicaciones cercanas desde el catálogo; solo consulta OpenAQ si el área caducó."""
+    if catalogo.area_is_fresh(lat, lon, radio_km):
+        estaciones = [estacion for estacion, _ in catalogo.within(lat, lon, radio_km)]
+        print(f"...{len(estaciones)} ubicaciones LA desde el catálogo local")
+        return estaciones
+    
+    from stations import station_from_openaq
+    
+    params = {
+        "coordinates": f"{lat},{lon}",
+        "radius": int(radio_km * 1000),
+        "limit": 5
+    }
+    headers = {"X-API-Key": api_key}
+    locations_url = f"{OPENAQ_BASE_URL}/locations"
+    print(f"...Buscando ubicaciones LA: {locations_url}?{urllib.parse.urlencode(params)}")
+    
+    locations_data = fetch_json(locations_url, params=params, headers=headers, ttl=0)
+    
+    estaciones = [catalogo.upsert(station_from_openaq(location, city='la'))
+                  for location in locations_data.get('results', [])]
+    catalogo.mark_area(lat, lon, radio_km)
+    catalogo.save()
+    print(f"...Encontradas {len(estaciones)} ubicaciones LA (catálogo actualizado)")
+    return estaciones
+
+def get_openaq_data_la(lat, lon, api_key, hora_objetivo=None):
+    """Obtiene datos de calidad del aire para LA (método exitoso).
+    
+    Sin hora_objetivo usa las mediciones más recientes; con una hora pasada
+    (backfill) consulta las mediciones de cada sensor en esa hora.
+    """
     print("...Iniciando petición OpenAQ para LA...")
     air_quality_data = {}
     location_id = None
     
     try:
-        base_url = "https://api.openaq.org/v3/locations"
-        params = {
-            "coordinates": f"{lat},{lon}",
-            "radius": 10000,
-            "limit": 5
-        }
+        catalogo = cargar_catalogo_estaciones()
+        ubicaciones = buscar_ubicaciones_la(catalogo, lat, lon, api_key)
         headers = {"X-API-Key": api_key}
         
-        locations_url = f"{base_url}?{urllib.parse.urlencode(params)}"
-        print(f"...Buscando ubicaciones LA: {locations_url}")
+        # Buscar la ubicación con más parámetros disponibles
+        best_location = None
+        max_params = 0
         
-        req = urllib.request.Request(locations_url, headers=headers)
+        for location in ubicaciones:
+            sensor_params = list(location.get('sensors', {}).values())
+            target_params_count = sum(1 for param in sensor_params if param in PARAMETER_MAPPING)
+            
+            print(f"...Ubicación LA: {location['name']} - Parámetros: {target_params_count}")
+            
+            if target_params_count > max_params:
+                max_params = target_params_count
+                best_location = location
         
-        with urllib.request.urlopen(req) as response:
-            if response.status == 200:
-                locations_data = json.loads(response.read().decode("utf-8"))
+        if best_location:
+            location_id = best_location['id']
+            print(f"...Usando ubicación LA: {best_location['name']} (ID: {location_id})")
+            
+            # Mapeo de sensores (id -> nombre) guardado en el catálogo
+            sensor_mapping = {int(sensor_id): name for sensor_id, name in best_location.get('sensors', {}).items()}
+            
+            if hora_objetivo is not None:
+                # Backfill: mediciones de cada sensor dentro de la hora objetivo
+                for sensor_id, param_name in sensor_mapping.items():
+                    if param_name in PARAMETER_MAPPING:
+                        mediciones = obtener_mediciones_sensor_historicas_la(
+                            sensor_id, hora_objetivo, hora_objetivo + timedelta(hours=1), api_key)
+                        if mediciones:
+                            air_quality_data[PARAMETER_MAPPING[param_name]] = mediciones[0].get('value')
+                print(f"...Datos calidad aire LA (histórico): {len(air_quality_data)} parámetros")
+                return air_quality_data, location_id
+            
+            # Obtener mediciones más recientes
+            measurements_url = f"{OPENAQ_BASE_URL}/locations/{location_id}/latest"
+            print(f"...Obteniendo mediciones LA: {measurements_url}")
+            
+            measurements_data = fetch_json(measurements_url, headers=headers)
+            
+            if measurements_data.get('results'):
+                print(f"...Procesando {len(measurements_data['results'])} mediciones LA")
                 
-                if locations_data.get('results'):
-                    print(f"...Encontradas {len(locations_data['results'])} ubicaciones LA")
+                for measurement in measurements_data['results']:
+                    sensor_id = measurement.get('sensorsId')
+                    value = measurement.get('value')
                     
-                    # Buscar la ubicación con más parámetros disponibles
-                    best_location = None
-                    max_params = 0
-                    
-                    for location in locations_data['results']:
-                        sensors = location.get('sensors', [])
-                        sensor_params = [s['name'] for s in sensors]
-                        target_params_count = sum(1 for param in sensor_params if param in PARAMETER_MAPPING)
-                        
-                        print(f"...Ubicación LA: {location['name']} - Parámetros: {target_params_count}")
+                    if sensor_id in sensor_mapping:
+                        param_name = sensor_mapping[sensor_id]
                         
-                        if target_params_count > max_params:
-                            max_params = target_params_count
-                            best_location = location
-                    
-                    if best_location:
-                        location_id = best_location['id']
-                        print(f"...Usando ubicación LA: {best_location['name']} (ID: {location_id})")
-                        
-                        # Crear mapeo de sensores
-                        sensor_mapping = {}
-                        for sensor in best_location.get('sensors', []):
-                            sensor_id = sensor['id']
-                            sensor_name = sensor['name']
-                            sensor_mapping[sensor_id] = sensor_name
-                        
-                        # Obtener mediciones más recientes
-                        measurements_url = f"https://api.openaq.org/v3/locations/{location_id}/latest"
-                        print(f"...Obteniendo mediciones LA: {measurements_url}")
-                        
-                        req = urllib.request.Request(measurements_url, headers=headers)
-                        
-                        with urllib.request.urlopen(req) as response:
-                            if response.status == 200:
-                                measurements_data = json.loads(response.read().decode("utf-8"))
-                                
-                                if measurements_data.get('results'):
-                                    print(f"...Procesando {len(measurements_data['results'])} mediciones LA")
-                                    
-                                    for measurement in measurements_data['results']:
-                                        sensor_id = measurement.get('sensorsId')
-                                        value = measurement.get('value')
-                                        
-                                        if sensor_id in sensor_mapping:
-                                            param_name = sensor_mapping[sensor_id]
-                                            
-                                            if param_name in PARAMETER_MAPPING:
-                                                mapped_param = PARAMETER_MAPPING[param_name]
-                                                air_quality_data[mapped_param] = value
-                                                print(f"...✓ LA {mapped_param}: {value}")
-                                
-                                print(f"...Datos calidad aire LA: {len(air_quality_data)} parámetros")
+                        if param_name in PARAMETER_MAPPING:
+                            mapped_param = PARAMETER_MAPPING[param_name]
+                            air_quality_data[mapped_param] = value
+                            print(f"...✓ LA {mapped_param}: {value}")
+            
+            print(f"...Datos calidad aire LA: {len(air_quality_data)} parámetros")
+            
+            # Última lectura de PM2.5 para /api/nearest
+            if air_quality_data.get('pm25') is not None:
+                catalogo.record_reading(location_id, air_quality_data['pm25'],
+                                        datetime.now(timezone.utc).isoformat(timespec='seconds'))
+                catalogo.save()
 
     except Exception as e:
         print(f"--- ERROR en OpenAQ LA: {e} ---")
 
     return air_quality_data, location_id
 
-def get_openmeteo_data_la(lat, lon, timezone, start_date, end_date):
-    """Obtiene datos climáticos de Open-Meteo para LA."""
-    base_url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat, "longitude": lon, "timezone": timezone,
-        "start_date": start_date, "end_date": end_date,
-        "hourly": ["temperature_2m", "relativehumidity_2m", "precipitation", "pressure_msl", 
-                   "windspeed_10m", "winddirection_10m", "boundary_layer_height"],
-        "daily": ["shortwave_radiation_sum"]
-    }
-    hourly_params = "&".join([f"hourly={var}" for var in params['hourly']])
-    daily_params = "&".join([f"daily={var}" for var in params['daily']])
-    del params['hourly'], params['daily']
-    
-    full_url = f"{base_url}?{urllib.parse.urlencode(params)}&{hourly_params}&{daily_params}"
+def guardar_filas_csv(filename, filas):
+    """Agrega filas al CSV realtime sin releerlo: solo se lee la cabecera si ya existe."""
+    if os.path.exists(filename) and os.path.getsize(filename) > 0:
+        with open(filename, 'r', encoding='utf-8', newline='') as archivo:
+            columnas = next(csv.reader(archivo))
+        print(f"📝 Agregando datos a archivo existente")
+        modo = 'a'
+    else:
+        columnas = CSV_COLUMNS
+        print(f"📝 Creando nuevo archivo")
+        modo = 'w'
     
-    with urllib.request.urlopen(full_url) as response:
-        if response.status != 200:
-            raise Exception(f"API Open-Meteo falló con código {response.status}")
-        return json.loads(response.read().decode("utf-8"))
+    with open(filename, modo, encoding='utf-8', newline='') as archivo:
+        writer = csv.DictWriter(archivo, fieldnames=columnas, extrasaction='ignore')
+        if modo == 'w':
+            writer.writeheader()
+        writer.writerows(filas)
 
-def capturar_hora_actual_la():
-    """Captura datos de LA para la hora actual solamente."""
+def capturar_hora_actual_la(hora_objetivo_utc=None):
+    """Captura datos de LA para la hora actual (o para hora_objetivo_utc en un backfill)."""
     print("🌍 CAPTURANDO DATOS HORA ACTUAL - LOS ANGELES")
     print("="*60)
     
     # Obtener hora actual
-    now_utc = datetime.now(timezone.utc)
+    now_utc = hora_objetivo_utc or datetime.now(timezone.utc)
+    es_backfill = hora_objetivo_utc is not None and \
+        hora_objetivo_utc < datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
     today = now_utc.date()
     current_hour = now_utc.hour
     
@@ -293,47 +324,34 @@ def capturar_hora_actual_la():
             target_timestamp = datetime.combine(today, datetime.min.time().replace(hour=hour))
             target_timestamp = target_timestamp.replace(tzinfo=timezone.utc)
             
-            # Ajustar a zona horaria de LA
-            target_timestamp_la = target_timestamp - timedelta(hours=8)  # UTC-8 para LA
+            # Ajustar a zona horaria de LA (respeta el horario de verano)
+            target_timestamp_la = target_timestamp.astimezone(ZoneInfo(LA_CONFIG["tz_api"]))
+            local_hour = target_timestamp_la.hour
             
             print(f"Hora objetivo LA: {target_timestamp_la.strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # Obtener datos meteorológicos
-            weather_data = get_openmeteo_data_la(
-                LA_CONFIG["lat"], LA_CONFIG["lon"], LA_CONFIG["tz_api"], 
-                today.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
-            )
+            # Datos meteorológicos de la caché local (una petición multi-día y multi-ciudad al fallar)
+            clima = weather_for('la', target_timestamp)
             
             # Obtener datos de calidad del aire
             air_quality_data, location_id = get_openaq_data_la(
-                LA_CONFIG["lat"], LA_CONFIG["lon"], API_KEY_OPENAQ
+                LA_CONFIG["lat"], LA_CONFIG["lon"], API_KEY_OPENAQ,
+                hora_objetivo=target_timestamp if es_backfill else None
             )
             
-            # Procesar datos meteorológicos
-            df_hourly = pd.DataFrame(weather_data['hourly'])
-            df_hourly['time'] = pd.to_datetime(df_hourly['time'])
-            
-            # Buscar datos para esta hora específica
-            target_timestamp_naive = target_timestamp_la.replace(tzinfo=None)
-            matching_rows = df_hourly[df_hourly['time'].dt.hour == hour]
-            
-            if not matching_rows.empty:
-                current_weather_row = matching_rows.iloc[0]
-                radiation_sum = weather_data['daily']['shortwave_radiation_sum'][0]
-                
+            if clima is not None:
                 # Crear nueva fila con formato correcto
-                new_row = pd.Series(index=CSV_COLUMNS, dtype='object')
+                new_row = dict.fromkeys(CSV_COLUMNS)
                 new_row['timestamp'] = target_timestamp_la
                 
                 # Añadir datos meteorológicos
-                for col in current_weather_row.index:
-                    if col in new_row.index:
-                        new_row[col] = current_weather_row[col]
-                new_row['shortwave_radiation_sum'] = radiation_sum
+                for col, value in clima.items():
+                    if col in new_row:
+                        new_row[col] = value
                 
                 # Añadir datos de calidad del aire
                 for param, value in air_quality_data.items():
-                    if param in new_row.index:
+                    if param in new_row:
                         new_row[param] = value
                 
                 # Obtener datos históricos de PM2.5
@@ -346,7 +364,7 @@ def capturar_hora_actual_la():
                         new_row[lag_col] = None
                 
                 # Añadir características temporales
-                new_row['hour_of_day'] = hour
+                new_row['hour_of_day'] = local_hour
                 new_row['day_of_week'] = target_timestamp_la.weekday()
                 new_row['month_of_year'] = target_timestamp_la.month
                 new_row['is_weekend'] = target_timestamp_la.weekday() >= 5
@@ -361,24 +379,9 @@ def capturar_hora_actual_la():
     
     # Guardar CSV (agregar a archivo existente o crear nuevo)
     if all_rows:
-        df_new = pd.DataFrame(all_rows)
         filename = f"datos_realtime_Centro_LA.csv"
-        
-        # Verificar si el archivo ya existe
-        if os.path.exists(filename):
-            # Leer archivo existente y agregar nueva fila
-            try:
-                df_existing = pd.read_csv(filename)
-                df_final = pd.concat([df_existing, df_new], ignore_index=True)
-                print(f"📝 Agregando datos a archivo existente")
-            except Exception as e:
-                print(f"⚠️ Error leyendo archivo existente: {e}")
-                df_final = df_new
-        else:
-            df_final = df_new
-            print(f"📝 Creando nuevo archivo")
-        
-        df_final.to_csv(filename, index=False)
+        guardar_filas_csv(filename, all_rows)
+        save_collected_rows('la', all_rows)
         
         print(f"\n🎉 DATOS CAPTURADOS PARA LA")
         print(f"📊 Hora procesada: {current_hour:02d}:00")
@@ -390,34 +393,10 @@ def capturar_hora_actual_la():
         return None
 
 def ejecutar_captura_continua_la():
-    """Ejecuta la captura de datos cada hora de manera continua."""
-    print("🔄 INICIANDO CAPTURA CONTINUA PARA LOS ANGELES")
-    print("⏰ Capturará datos automáticamente cada hora")
-    print("🛑 Presiona Ctrl+C para detener")
-    print("="*60)
+    """Ejecuta la captura cada hora mediante el daemon común (ticks alineados, reintentos y backfill)."""
+    from collector_daemon import ejecutar
     
-    ultima_hora_procesada = -1
-    
-    try:
-        while True:
-            now_utc = datetime.now(timezone.utc)
-            hora_actual = now_utc.hour
-            
-            # Solo procesar si es una nueva hora
-            if hora_actual != ultima_hora_procesada:
-                print(f"\n🕐 Nueva hora detectada: {hora_actual:02d}:00 UTC")
-                capturar_hora_actual_la()
-                ultima_hora_procesada = hora_actual
-                
-                # Esperar hasta el siguiente minuto para evitar procesamiento múltiple
-                print(f"⏳ Esperando próxima hora...")
-            
-            # Verificar cada 30 segundos
-            time.sleep(30)
-            
-    except KeyboardInterrupt:
-        print("\n🛑 Captura detenida por el usuario")
-        print("💾 Datos guardados hasta el momento")
+    ejecutar({'la': capturar_hora_actual_la})
 
 def main():
     parser = argparse.ArgumentParser(description='Captura datos de Los Angeles por hora')
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Generador de carga determinista y reproductor de logs de acceso.
+
+Los logs usan el formato compacto de access_log.py (el backend lo escribe con
+ACCESS_LOG_PATH). Tres comandos:
+
+  generar     crea un log sintético reproducible (misma semilla, mismo log)
+              con la mezcla de /api/predict, /api/data, /api/health y
+              estáticos servidos por serve_react_app
+  importar    convierte el log de acceso de werkzeug (stderr del servidor
+              de desarrollo) al formato compacto
+  reproducir  reproduce un log a 1x-100x con un cliente asyncio contra un
+              servidor local (o lo lanza con --lanzar) y reporta
+              percentiles de latencia, tasa de errores y CPU/RSS del
+              servidor a lo largo del tiempo
+
+La carga es de lazo abierto: cada petición sale en su instante programado
+aunque las anteriores no hayan terminado, y la latencia se mide desde ese
+instante, así un servidor saturado no reduce la carga que recibe.
+
+    python replay_carga.py generar --salida carga.tsv --peticiones 5000 --rps 20
+    python replay_carga.py reproducir --log carga.tsv --velocidad 10 --lanzar
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from access_log import client_id, read_log, write_log
+
+MEZCLA_POR_DEFECTO = 'predict=0.35,data=0.25,health=0.1,static=0.3'
+CIUDADES = ['cdmx', 'la']
+ESTATICOS = ['/', '/index.html', '/favicon.ico', '/manifest.json', '/static/js/main.js', '/static/css/main.css']
+LINEA_WERKZEUG = re.compile(r'^(?P<ip>\S+) - - \[(?P<fecha>[^\]]+)\] "(?P<metodo>[A-Z]+) (?P<ruta>\S+) [^"]*" '
+                            r'(?P<estado>\d{3}) (?P<bytes>\S+)')
+
+
+def grupo(ruta):
+    """Categoría de una ruta para agrupar el reporte"""
+    if ruta.split('?')[0] in ('/livez', '/readyz'):
+        return 'probes'
+    if ruta.startswith('/api/'):
+        return ruta[len('/api/'):].split('/')[0].split('?')[0]
+    return 'static'
+
+
+# ---------------------------------------------------------------- generar
+
+def ruta_sintetica(rng, tipo):
+    ciudad = rng.choice(CIUDADES)
+    if tipo == 'predict':
+        return f'/api/predict/{ciudad}'
+    if tipo == 'data':
+        return f'/api/data/{ciudad}?hours={rng.choice([24, 24, 72, 168, 720])}&max_points=500'
+    if tipo == 'health':
+        return '/api/health'
+    return rng.choice(ESTATICOS)
+
+
+def generar(args):
+    rng = random.Random(args.semilla)
+    mezcla = {}
+    for parte in args.mezcla.split(','):
+        tipo, peso = parte.split('=')
+        mezcla[tipo.strip()] = float(peso)
+    tipos, pesos = list(mezcla), list(mezcla.values())
+    clientes = [client_id(f'10.0.{i // 256}.{i % 256}') for i in range(args.clientes)]
+
+    # Llegadas de Poisson: intervalos exponenciales con media 1/rps
+    entradas = []
+    instante = 0.0
+    for _ in range(args.peticiones):
+        instante += rng.expovariate(args.rps)
+        tipo = rng.choices(tipos, pesos)[0]
+        entradas.append((int(instante * 1000), rng.choice(clientes), 'GET', ruta_sintetica(rng, tipo), 0, 0.0, 0))
+    write_log(args.salida, 0.0, entradas)
+    print(f"📝 {len(entradas)} peticiones en {instante:.0f} s ({args.rps} rps) -> {args.salida}")
+
+
+# ---------------------------------------------------------------- importar
+
+def importar(args):
+    entradas = []
+    inicio = None
+    with open(args.entrada, 'r', encoding='utf-8', errors='replace') as archivo:
+        for linea in archivo:
+            coincidencia = LINEA_WERKZEUG.search(linea)
+            if not coincidencia:
+                continue
+            instante = datetime.strptime(coincidencia.group('fecha'), '%d/%b/%Y %H:%M:%S').timestamp()
+            inicio = instante if inicio is None else inicio
+            tam = coincidencia.group('bytes')
+            entradas.append((int((instante - inicio) * 1000), client_id(coincidencia.group('ip')),
+                             coincidencia.group('metodo'), coincidencia.group('ruta'),
+                             int(coincidencia.group('estado')), 0.0, int(tam) if tam.isdigit() else -1))
+    write_log(args.salida, inicio or 0.0, entradas)
+    print(f"📥 {len(entradas)} peticiones importadas -> {args.salida}")
+
+
+# ---------------------------------------------------------------- reproducir
+
+def ip_de_cliente(cliente):
+    """IP falsa estable por cliente, enviada en X-Forwarded-For para el límite por IP"""
+    valor = int(cliente, 16)
+    return f'10.{(valor >> 16) & 255}.{(valor >> 8) & 255}.{valor & 255}'
+
+
+async def peticion(host, puerto, metodo, ruta, cliente, limite):
+    """(estado, bytes) de una petición HTTP/1.1 con su propia conexión"""
+    lector, escritor = await asyncio.wait_for(asyncio.open_connection(host, puerto), limite)
+    try:
+        escritor.write((f'{metodo} {ruta} HTTP/1.1\r\nHost: {host}:{puerto}\r\n'
+                        f'X-Forwarded-For: {ip_de_cliente(cliente)}\r\nAccept-Encoding: identity\r\n'
+                        f'Connection: close\r\n\r\n').encode('latin-1'))
+        await escritor.drain()
+        respuesta = await asyncio.wait_for(lector.read(), limite)
+    finally:
+        escritor.close()
+    linea = respuesta.split(b'\r\n', 1)[0].split()
+    return int(linea[1]) if len(linea) > 1 else 0, len(respuesta)
+
+
+class MuestreoProceso:
+    """CPU (% de un núcleo) y RSS de un pid leídos de /proc"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.tick = os.sysconf('SC_CLK_TCK')
+        self.muestras = []
+        self._previo = None
+
+    def leer(self):
+        try:
+            with open(f'/proc/{self.pid}/stat') as archivo:
+                campos = archivo.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{self.pid}/status') as archivo:
+                rss_kb = next(int(linea.split()[1]) for linea in archivo if linea.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            return
+        ahora = time.monotonic()
+        cpu = (int(campos[11]) + int(campos[12])) / self.tick
+        if self._previo is not None:
+            porcentaje = (cpu - self._previo[1]) / (ahora - self._previo[0]) * 100
+            self.muestras.append((ahora, round(porcentaje, 1), round(rss_kb / 1024, 1)))
+        self._previo = (ahora, cpu)
+
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else float('nan')
+
+
+async def reproducir_log(entradas, host, puerto, velocidad, concurrencia, limite, muestreo, intervalo):
+    semaforo = asyncio.Semaphore(concurrencia)
+    resultados = []
+    inicio = time.monotonic() + 0.2
+
+    async def una(entrada):
+        offset_ms, cliente, metodo, ruta, _, _, _ = entrada
+        programado = inicio + offset_ms / 1000 / velocidad
+        await asyncio.sleep(max(0.0, programado - time.monotonic()))
+        async with semaforo:
+            try:
+                estado, tam = await peticion(host, puerto, metodo, ruta, cliente, limite)
+            except (OSError, asyncio.TimeoutError):
+                estado, tam = 0, 0
+        resultados.append((grupo(ruta), estado, time.monotonic() - programado, tam, programado - inicio))
+
+    async def muestrear():
+        while True:
+            muestreo.leer()
+            await asyncio.sleep(intervalo)
+
+    tarea_muestreo = asyncio.ensure_future(muestrear()) if muestreo else None
+    await asyncio.gather(*(una(entrada) for entrada in entradas))
+    if tarea_muestreo:
+        tarea_muestreo.cancel()
+    return resultados, time.monotonic() - inicio
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def lanzar_servidor(entorno_extra, limite):
+    puerto = puerto_libre()
+    entorno = dict(os.environ, PORT=str(puerto), **entorno_extra)
+    proceso = subprocess.Popen([sys.executable, 'app_fullstack.py'], cwd=BACKEND_DIR, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{puerto}/readyz', timeout=2):
+                return proceso, puerto
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError('el servidor no quedó listo a tiempo')
+
+
+def reportar(resultados, duracion, muestreo, velocidad):
+    print(f"\n⏱️ {len(resultados)} peticiones en {duracion:.1f} s a {velocidad}x "
+          f"({len(resultados) / duracion:.1f} rps)")
+    print(f"   {'grupo':<10}{'n':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'máx ms':>9}"
+          f"{'5xx/err':>9}{'429':>6}{'4xx':>6}")
+    grupos = sorted({r[0] for r in resultados}) + ['TOTAL']
+    for nombre in grupos:
+        filas = [r for r in resultados if nombre == 'TOTAL' or r[0] == nombre]
+        latencias = sorted(r[2] * 1000 for r in filas)
+        errores = sum(1 for r in filas if r[1] == 0 or r[1] >= 500)
+        limitadas = sum(1 for r in filas if r[1] == 429)
+        cliente = sum(1 for r in filas if 400 <= r[1] < 500 and r[1] != 429)
+        print(f"   {nombre:<10}{len(filas):>7}{percentil(latencias, 0.5):>9.1f}{percentil(latencias, 0.9):>9.1f}"
+              f"{percentil(latencias, 0.99):>9.1f}{latencias[-1]:>9.1f}"
+              f"{errores / len(filas):>8.1%}{limitadas:>6}{cliente:>6}")
+
+    if muestreo and muestreo.muestras:
+        print("\n🖥️ Servidor (CPU % de un núcleo, RSS MB, peticiones completadas en el intervalo)")
+        origen = muestreo.muestras[0][0]
+        previo = origen
+        for instante, cpu, rss in muestreo.muestras:
+            completadas = sum(1 for r in resultados if previo - origen <= r[4] + r[2] < instante - origen)
+            print(f"   t={instante - origen:6.1f}s  cpu {cpu:6.1f}%  rss {rss:7.1f} MB  {completadas:5d} pet.")
+            previo = instante
+        print(f"   Pico: cpu {max(m[1] for m in muestreo.muestras):.1f}%, "
+              f"rss {max(m[2] for m in muestreo.muestras):.1f} MB")
+
+
+def reproducir(args):
+    _, entradas = read_log(args.log)
+    if args.limite_peticiones:
+        entradas = entradas[:args.limite_peticiones]
+    proceso = None
+    if args.lanzar:
+        # El límite por IP sigue activo: cada cliente del log llega con su propia IP
+        proceso, puerto = lanzar_servidor({'STARTUP_MODE': 'eager'}, args.timeout_arranque)
+        host, pid = '127.0.0.1', proceso.pid
+    else:
+        url = urllib.parse.urlparse(args.url)
+        host, puerto, pid = url.hostname, url.port or 80, args.pid
+    print(f"▶️ Reproduciendo {len(entradas)} peticiones contra {host}:{puerto}"
+          f"{f' (pid {pid})' if pid else ''}")
+    muestreo = MuestreoProceso(pid) if pid else None
+    try:
+        resultados, duracion = asyncio.run(reproducir_log(
+            entradas, host, puerto, args.velocidad, args.concurrencia, args.timeout, muestreo, args.intervalo))
+    finally:
+        if proceso:
+            proceso.terminate()
+            proceso.wait()
+    reportar(resultados, duracion, muestreo, args.velocidad)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador y reproductor de carga para el backend')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('generar', help='Log sintético determinista')
+    p.add_argument('--salida', required=True)
+    p.add_argument('--peticiones', type=int, default=5000)
+    p.add_argument('--rps', type=float, default=20.0, help='Peticiones por segundo a 1x')
+    p.add_argument('--clientes', type=int, default=50, help='Clientes distintos (IPs)')
+    p.add_argument('--mezcla', default=MEZCLA_POR_DEFECTO, help='Pesos por tipo: predict, data, health, static')
+    p.add_argument('--semilla', type=int, default=42)
+    p.set_defaults(funcion=generar)
+
+    p = sub.add_parser('importar', help='Convierte un log de werkzeug al formato compacto')
+    p.add_argument('--entrada', required=True)
+    p.add_argument('--salida', required=True)
+    p.set_defaults(funcion=importar)
+
+    p = sub.add_parser('reproducir', help='Reproduce un log y mide latencias y recursos')
+    p.add_argument('--log', required=True)
+    p.add_argument('--url', default='http://127.0.0.1:5000')
+    p.add_argument('--pid', type=int, help='Pid del servidor para muestrear CPU/RSS')
+    p.add_argument('--lanzar', action='store_true', help='Lanzar app_fullstack.py en un puerto libre')
+    p.add_argument('--velocidad', type=float, default=1.0, help='Factor de aceleración (1-100)')
+    p.add_argument('--concurrencia', type=int, default=256, help='Conexiones simultáneas máximas')
+    p.add_argument('--timeout', type=float, default=30.0, help='Límite por petición (s)')
+    p.add_argument('--intervalo', type=float, default=1.0, help='Segundos entre muestras de CPU/RSS')
+    p.add_argument('--limite-peticiones', type=int, default=0, help='Reproducir solo las primeras N')
+    p.add_argument('--timeout-arranque', type=float, default=120.0)
+    p.set_defaults(funcion=reproducir)
+
+    args = parser.parse_args()
+    if getattr(args, 'velocidad', 1.0) <= 0:
+        parser.error('--velocidad debe ser positiva')
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
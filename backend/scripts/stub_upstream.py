@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local que imita las partes de OpenAQ v3 y Open-Meteo que usan
+los colectores, para probar el daemon sin red ni API key real.
+
+    python stub_upstream.py --port 8765 --fail-every 3
+
+Con --fail-every N cada N-ésima petición responde 503, lo que ejercita los
+reintentos con backoff. GET /stats devuelve cuántas peticiones llegaron por
+ruta, útil para comprobar que un re-run o un backfill sale de la caché.
+"""
+
+import argparse
+import json
+import math
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+LOCATIONS = [
+    {'id': 10534, 'name': 'CCA_CDMX', 'coordinates': {'latitude': 19.4326, 'longitude': -99.1332}},
+    {'id': 7936, 'name': 'Los Angeles - N. Main St', 'coordinates': {'latitude': 34.0664, 'longitude': -118.2267}}
+]
+PARAMETERS = ['co ppm', 'no ppm', 'no2 ppm', 'nox ppm', 'o3 ppm', 'pm25 µg/m³', 'so2 ppm']
+WEATHER = ['temperature_2m', 'relativehumidity_2m', 'precipitation', 'pressure_msl',
+           'windspeed_10m', 'winddirection_10m', 'boundary_layer_height']
+
+
+def sensors_for(location_id):
+    return [{'id': location_id * 10 + i, 'name': name} for i, name in enumerate(PARAMETERS)]
+
+
+def value_for(sensor_id, when):
+    """Deterministic value so repeated captures are comparable"""
+    return round(10 + 5 * math.sin(when.timestamp() / 3600 / 24 * 2 * math.pi) + sensor_id % 7, 3)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    counts = Counter()
+    total = 0
+    fail_every = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ['stats']:
+            return self.reply(200, {'total': StubHandler.total, 'by_path': dict(StubHandler.counts)})
+
+        with StubHandler.lock:
+            StubHandler.total += 1
+            StubHandler.counts['/'.join(part if not part.isdigit() else '<id>' for part in parts)] += 1
+            fail = StubHandler.fail_every and StubHandler.total % StubHandler.fail_every == 0
+        if fail:
+            return self.reply(503, {'detail': 'stub: simulated outage'})
+
+        if parts[:2] == ['openaq', 'v3']:
+            return self.openaq(parts[2:], query)
+        if parts == ['openmeteo', 'v1', 'forecast']:
+            return self.openmeteo(query)
+        return self.reply(404, {'detail': 'not found'})
+
+    def openaq(self, parts, query):
+        if parts == ['locations']:
+            lat, lon = (float(v) for v in query.get('coordinates', '0,0').split(','))
+            radius_km = float(query.get('radius', 25000)) / 1000
+            nearby = [location for location in LOCATIONS
+                      if math.hypot(location['coordinates']['latitude'] - lat,
+                                    (location['coordinates']['longitude'] - lon) * math.cos(math.radians(lat)))
+                      * 111.2 <= radius_km]
+            return self.reply(200, {'results': [dict(location, sensors=sensors_for(location['id']))
+                                                for location in nearby]})
+        if len(parts) == 3 and parts[0] == 'locations' and parts[2] == 'sensors':
+            return self.reply(200, {'results': sensors_for(int(parts[1]))})
+        if len(parts) == 3 and parts[0] == 'locations' and parts[2] == 'latest':
+            now = datetime.now(timezone.utc)
+            return self.reply(200, {'results': [{'sensorsId': sensor['id'], 'value': value_for(sensor['id'], now)}
+                                                for sensor in sensors_for(int(parts[1]))]})
+        if len(parts) == 3 and parts[0] == 'sensors' and parts[2] == 'measurements':
+            start = datetime.fromisoformat(query['datetime_from'].replace('Z', '+00:00'))
+            end = datetime.fromisoformat(query['datetime_to'].replace('Z', '+00:00'))
+            results, when = [], start
+            while when < end:
+                stamp = (when + timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
+                results.append({'value': value_for(int(parts[1]), when),
+                                'period': {'datetimeTo': {'utc': stamp, 'local': stamp}}})
+                when += timedelta(hours=1)
+            return self.reply(200, {'results': results})
+        return self.reply(404, {'detail': 'not found'})
+
+    def openmeteo(self, query):
+        """Hourly/daily series per location; comma-separated coordinates return a list"""
+        latitudes = query['latitude'].split(',')
+        zones = query.get('timezone', 'GMT').split(',')
+        start = datetime.fromisoformat(query['start_date']).replace(tzinfo=timezone.utc)
+        end = datetime.fromisoformat(query['end_date']).replace(tzinfo=timezone.utc)
+        days = (end - start).days + 1
+        unixtime = query.get('timeformat') == 'unixtime'
+
+        locations = []
+        for position, latitude in enumerate(latitudes):
+            offset = ZoneInfo(zones[min(position, len(zones) - 1)]).utcoffset(start.replace(tzinfo=None))
+            # Local midnight of start_date, expressed in UTC
+            first = start - offset
+            times = [first + timedelta(hours=h) for h in range(24 * days)]
+            day_starts = [first + timedelta(days=d) for d in range(days)]
+            if unixtime:
+                hourly = {'time': [int(t.timestamp()) for t in times]}
+                daily = {'time': [int(t.timestamp()) for t in day_starts]}
+            else:
+                hourly = {'time': [(t + offset).strftime('%Y-%m-%dT%H:%M') for t in times]}
+                daily = {'time': [(t + offset).strftime('%Y-%m-%d') for t in day_starts]}
+            for i, name in enumerate(WEATHER):
+                hourly[name] = [round(value_for(i + int(float(latitude)), t), 2) for t in times]
+            daily['shortwave_radiation_sum'] = [18.5] * days
+            locations.append({'latitude': float(latitude), 'utc_offset_seconds': int(offset.total_seconds()),
+                              'hourly': hourly, 'daily': daily})
+        return self.reply(200, locations if len(locations) > 1 else locations[0])
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub local de OpenAQ/Open-Meteo')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fail-every', type=int, default=0, help='Responder 503 a cada N-ésima petición')
+    args = parser.parse_args()
+
+    StubHandler.fail_every = args.fail_every
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"Stub upstream escuchando en http://127.0.0.1:{args.port} (fail-every={args.fail_every})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
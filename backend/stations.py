@@ -0,0 +1,216 @@
+"""
+Local catalog of monitoring stations with a spatial index.
+
+The collectors used to ask OpenAQ for the locations around a city (and their
+sensors) on every hourly run. The catalog keeps those answers on disk
+(data/stations.json) together with each station's latest PM2.5 reading, and
+indexes station coordinates in a KD-tree over unit-sphere vectors so nearest
+station and inverse-distance-weighted lookups for any lat/lon are a single
+vectorized query.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+CATALOG_FILE = 'stations.json'
+# Station lists barely change; re-query OpenAQ for an area at most this often
+CATALOG_MAX_AGE = 7 * 24 * 3600
+
+
+def to_unit_vectors(lat, lon):
+    """(n, 3) points on the unit sphere; chord distance is monotonic in great-circle distance"""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(km / (2 * EARTH_RADIUS_KM), math.pi / 2))
+
+
+def _area_key(lat, lon, radius_km):
+    return f"{lat:.3f},{lon:.3f},{radius_km:g}"
+
+
+class _Index:
+    """KD-tree over a fixed list of stations"""
+
+    def __init__(self, stations):
+        from scipy.spatial import cKDTree
+
+        self.stations = stations
+        self.tree = cKDTree(to_unit_vectors([s['lat'] for s in stations], [s['lon'] for s in stations])) \
+            if stations else None
+
+    def query(self, lat, lon, k, max_km=None):
+        """[(station, distance_km)] for the k nearest stations, closest first"""
+        if self.tree is None or k <= 0:
+            return []
+        k = min(k, len(self.stations))
+        bound = km_to_chord(max_km) if max_km is not None else np.inf
+        chords, positions = self.tree.query(to_unit_vectors([lat], [lon])[0], k=k, distance_upper_bound=bound)
+        chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+        found = np.isfinite(chords)
+        distances = chord_to_km(chords[found])
+        return [(self.stations[i], float(d)) for i, d in zip(positions[found], distances)]
+
+    def within(self, lat, lon, radius_km):
+        if self.tree is None:
+            return []
+        center = to_unit_vectors([lat], [lon])[0]
+        positions = self.tree.query_ball_point(center, km_to_chord(radius_km))
+        if not positions:
+            return []
+        distances = chord_to_km(np.linalg.norm(self.tree.data[positions] - center, axis=1))
+        order = np.argsort(distances)
+        return [(self.stations[positions[i]], float(distances[i])) for i in order]
+
+
+class StationCatalog:
+    """Stations persisted as JSON, indexed for nearest-neighbour queries"""
+
+    def __init__(self, path, max_age_seconds=CATALOG_MAX_AGE):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self._stations = {}
+        self._areas = {}
+        self._indexes = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        # Bumped whenever stations or readings change; derived caches key on it
+        self.version = 0
+        self.load()
+
+    def load(self):
+        """(Re)read the catalog file; a missing or unreadable file leaves it empty"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, 'r', encoding='utf-8') as file:
+                payload = json.load(file)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self._stations = {str(s['id']): s for s in payload.get('stations', [])}
+            self._areas = payload.get('areas', {})
+            self._indexes = {}
+            self._mtime = mtime
+            self.version += 1
+        return True
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        return mtime != self._mtime and self.load()
+
+    def save(self):
+        """Write atomically so a collector and the app never see a partial file"""
+        with self._lock:
+            payload = {'areas': self._areas, 'stations': sorted(self._stations.values(), key=lambda s: str(s['id']))}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(payload, file, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def __len__(self):
+        return len(self._stations)
+
+    def get(self, station_id):
+        with self._lock:
+            return self._stations.get(str(station_id))
+
+    def upsert(self, station):
+        """Add or update a station (id, name, lat, lon, ...); readings already held are kept"""
+        with self._lock:
+            key = str(station['id'])
+            current = self._stations.get(key, {})
+            merged = dict(current)
+            merged.update({name: value for name, value in station.items() if value is not None})
+            if merged != current:
+                self._stations[key] = merged
+                self._indexes = {}
+                self.version += 1
+        return merged
+
+    def record_reading(self, station_id, pm25, observed_at):
+        """Store a station's latest PM2.5 value (observed_at: ISO timestamp)"""
+        with self._lock:
+            station = self._stations.get(str(station_id))
+            if station is None or pm25 is None:
+                return False
+            if station.get('pm25') == float(pm25) and station.get('observed_at') == observed_at:
+                return True
+            station['pm25'] = float(pm25)
+            station['observed_at'] = observed_at
+            self._indexes.pop('with_data', None)
+            self.version += 1
+        return True
+
+    def area_is_fresh(self, lat, lon, radius_km):
+        refreshed_at = self._areas.get(_area_key(lat, lon, radius_km))
+        return refreshed_at is not None and time.time() - refreshed_at < self.max_age_seconds
+
+    def mark_area(self, lat, lon, radius_km):
+        with self._lock:
+            self._areas[_area_key(lat, lon, radius_km)] = time.time()
+
+    def _index(self, with_data):
+        name = 'with_data' if with_data else 'all'
+        with self._lock:
+            index = self._indexes.get(name)
+            if index is None:
+                stations = [s for s in self._stations.values()
+                            if s.get('lat') is not None and s.get('lon') is not None
+                            and (not with_data or s.get('pm25') is not None)]
+                index = self._indexes[name] = _Index(stations)
+            return index
+
+    def nearest(self, lat, lon, k=5, max_km=None, with_data=True):
+        return self._index(with_data).query(lat, lon, k, max_km)
+
+    def within(self, lat, lon, radius_km, with_data=False):
+        """Every station within radius_km of a point, closest first"""
+        return self._index(with_data).within(lat, lon, radius_km)
+
+    def idw_estimate(self, lat, lon, k=5, power=2.0, max_km=None):
+        """Inverse-distance-weighted PM2.5 at a point from the k nearest stations with data"""
+        neighbours = self.nearest(lat, lon, k=k, max_km=max_km, with_data=True)
+        if not neighbours:
+            return None, []
+        values = np.array([station['pm25'] for station, _ in neighbours], dtype=float)
+        distances = np.array([distance for _, distance in neighbours])
+        exact = distances < 1e-3
+        if exact.any():
+            return float(values[exact].mean()), neighbours
+        weights = 1.0 / np.power(distances, power)
+        return float(np.dot(weights, values) / weights.sum()), neighbours
+
+
+def station_from_openaq(location, city=None):
+    """Catalog entry from an OpenAQ v3 /locations result"""
+    coordinates = location.get('coordinates') or {}
+    return {
+        'id': location['id'],
+        'name': location.get('name'),
+        'lat': coordinates.get('latitude'),
+        'lon': coordinates.get('longitude'),
+        'city': city,
+        'sensors': {str(sensor['id']): sensor['name'] for sensor in location.get('sensors', [])},
+        'source': 'openaq'
+    }
@@ -0,0 +1,208 @@
+"""
+On-disk storage for hourly readings.
+
+Readings live in one SQLite table clustered on (city, ts) (a WITHOUT ROWID
+table is stored in primary-key order), so a city's time range is a single
+index range scan however much history accumulates. Collectors append in
+batches and the historical CSVs can be migrated once with:
+
+    python storage.py migrate --db data/airguard.db
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+
+from timeseries import INVALID_EPOCH, parse_timestamps_utc
+
+# Columns stored per reading, besides city, ts (UTC epoch) and timestamp (original text)
+STORE_COLUMNS = [
+    'temperature_2m', 'relativehumidity_2m', 'precipitation', 'pressure_msl',
+    'windspeed_10m', 'winddirection_10m', 'boundary_layer_height', 'shortwave_radiation_sum',
+    'hour_of_day', 'day_of_week', 'month_of_year', 'is_weekend',
+    'co', 'no', 'no2', 'nox', 'o3', 'pm10', 'pm25', 'so2',
+    'pm25_lag_3h', 'pm25_lag_6h', 'pm25_lag_12h', 'pm25_lag_24h'
+]
+
+# Historical datasets migrated on first use, by city key
+CSV_DATASETS = {
+    'cdmx': 'dataset_final_cdmx_limpio.csv',
+    'la': 'dataset_final_LA_limpio.csv'
+}
+
+BATCH_SIZE = 5000
+
+
+def _to_number(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return 1 if value.lower() == 'true' else 0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _column_list(names):
+    return ', '.join(f'"{name}"' for name in names)
+
+
+class SqliteStore:
+    """Readings table with predicate push-down for city and time range"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._ensure_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        columns = ', '.join(f'"{name}" REAL' for name in STORE_COLUMNS)
+        conn = self._connect()
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS readings ('
+            f'city TEXT NOT NULL, ts INTEGER NOT NULL, timestamp TEXT NOT NULL, {columns}, '
+            f'PRIMARY KEY (city, ts)) WITHOUT ROWID'
+        )
+        conn.commit()
+
+    def cities(self):
+        return [row[0] for row in self._connect().execute('SELECT DISTINCT city FROM readings')]
+
+    def count(self, city):
+        return self._connect().execute('SELECT COUNT(*) FROM readings WHERE city = ?', (city,)).fetchone()[0]
+
+    def bounds(self, city):
+        """(first_ts, last_ts) for a city, or (None, None) when empty"""
+        row = self._connect().execute(
+            'SELECT MIN(ts), MAX(ts) FROM readings WHERE city = ?', (city,)).fetchone()
+        return row[0], row[1]
+
+    def append(self, city, records):
+        """Insert or replace records in batches; returns the number written"""
+        if not records:
+            return 0
+        epochs = parse_timestamps_utc([record.get('timestamp', '') for record in records])
+        names = ['city', 'ts', 'timestamp'] + STORE_COLUMNS
+        sql = f'INSERT OR REPLACE INTO readings ({_column_list(names)}) VALUES ({", ".join("?" * len(names))})'
+
+        written = 0
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                for start in range(0, len(records), BATCH_SIZE):
+                    batch = [
+                        (city, int(ts), str(record.get('timestamp')))
+                        + tuple(_to_number(record.get(name)) for name in STORE_COLUMNS)
+                        for record, ts in zip(records[start:start + BATCH_SIZE], epochs[start:start + BATCH_SIZE])
+                        if ts != INVALID_EPOCH
+                    ]
+                    conn.executemany(sql, batch)
+                    written += len(batch)
+        return written
+
+    def query(self, city, start=None, end=None, columns=None, limit=None, descending=False):
+        """Records for a city with start <= ts <= end, oldest first unless descending"""
+        selected = ['timestamp'] + list(columns or STORE_COLUMNS)
+        sql = f'SELECT {_column_list(selected)} FROM readings WHERE city = ?'
+        params = [city]
+        if start is not None:
+            sql += ' AND ts >= ?'
+            params.append(int(start))
+        if end is not None:
+            sql += ' AND ts <= ?'
+            params.append(int(end))
+        sql += ' ORDER BY ts DESC' if descending else ' ORDER BY ts'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def iter_query(self, city, start=None, end=None, columns=None, chunk_size=1000):
+        """Yield lists of up to chunk_size records without materializing the range"""
+        selected = ['ts', 'timestamp'] + list(columns or STORE_COLUMNS)
+        sql = f'SELECT {_column_list(selected)} FROM readings WHERE city = ? AND ts >= ? AND ts <= ? ORDER BY ts'
+        # A separate connection keeps a long-running export from pinning the request thread's one
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(sql, (city, int(start if start is not None else -2 ** 62),
+                                        int(end if end is not None else 2 ** 62)))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def delete_before(self, city, ts):
+        """Drop a city's readings older than ts (already archived elsewhere); returns how many"""
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute('DELETE FROM readings WHERE city = ? AND ts < ?', (city, int(ts))).rowcount
+
+    def latest(self, city, n):
+        """The last n records of a city, oldest first"""
+        return self.query(city, limit=n, descending=True)[::-1]
+
+    def migrate_csv(self, city, path):
+        """One-time import of a historical CSV; returns the number of rows written"""
+        with open(path, 'r', encoding='utf-8') as file:
+            return self.append(city, list(csv.DictReader(file)))
+
+
+def save_collected_rows(city, rows, path=None):
+    """Append rows captured by a collector to the store at STORAGE_PATH; no-op when it is unset.
+
+    Collectors keep working if the store fails, so errors are reported, not raised.
+    """
+    path = path or os.environ.get('STORAGE_PATH')
+    if not path:
+        return 0
+    try:
+        records = [dict(row, timestamp=str(row['timestamp'])) for row in rows]
+        written = SqliteStore(path).append(city, records)
+        print(f"🗄️ {written} {city.upper()} records saved to {path}")
+        return written
+    except Exception as e:
+        print(f"⚠️ Could not save {city.upper()} records to the SQLite store: {e}")
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AirGuard reading store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help='Import dataset_final_*_limpio.csv into the store')
+    migrate.add_argument('--db', default=os.path.join('data', 'airguard.db'))
+    migrate.add_argument('--data-dir', default='data')
+    args = parser.parse_args()
+
+    store = SqliteStore(args.db)
+    for city, filename in CSV_DATASETS.items():
+        path = os.path.join(args.data_dir, filename)
+        if not os.path.exists(path):
+            print(f"Skipping {city.upper()}: {path} not found")
+            continue
+        written = store.migrate_csv(city, path)
+        print(f"{city.upper()}: {written} records migrated into {args.db}")
+
+
+if __name__ == '__main__':
+    main()
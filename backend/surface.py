@@ -0,0 +1,171 @@
+"""
+Interpolated PM2.5 / AQI surfaces over each metro area for the map view.
+
+The latest reading of every station around a city is spread over a regular
+lat/lon grid with inverse-distance weighting, computed for all cells and
+stations at once with NumPy broadcasting. Each zoom level doubles the grid
+resolution. A surface only depends on the readings of the stations around
+its city, so it is cached under a checksum of those readings and recomputed
+only after one of them changes, not after any change to the catalog.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+from stations import EARTH_RADIUS_KM, chord_to_km, to_unit_vectors
+
+# (south, west, north, east) of each metro area
+METRO_BOUNDS = {
+    'cdmx': (19.05, -99.40, 19.75, -98.90),
+    'la': (33.60, -118.70, 34.40, -117.70)
+}
+# Stations this far outside the box still influence its edges
+STATION_MARGIN_KM = 50
+MAX_ZOOM = 3
+BASE_CELLS = 32
+
+# PM2.5 bands exactly as in calculate_aqi: (upper bound, AQI at lower bound,
+# AQI points per band, PM2.5 span of the band) plus the map colour per band
+AQI_BANDS = [
+    (12.0, 0, 50, 12.0, (0, 228, 0)),
+    (35.4, 50, 50, 23.4, (255, 255, 0)),
+    (55.4, 100, 50, 20.0, (255, 126, 0)),
+    (150.4, 150, 100, 95.0, (255, 0, 0)),
+    (np.inf, 200, 100, 49.6, (143, 63, 151))
+]
+
+
+def grid_shape(zoom):
+    cells = BASE_CELLS * 2 ** zoom
+    return cells, cells
+
+
+def cell_centers(bounds, rows, cols):
+    """Latitudes (north to south) and longitudes (west to east) of the cell centers"""
+    south, west, north, east = bounds
+    lat_step = (north - south) / rows
+    lon_step = (east - west) / cols
+    lats = north - (np.arange(rows) + 0.5) * lat_step
+    lons = west + (np.arange(cols) + 0.5) * lon_step
+    return lats, lons
+
+
+def idw_grid(bounds, rows, cols, station_lats, station_lons, values, power=2.0):
+    """rows x cols IDW surface from station values; NaN where there are no stations"""
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return np.full((rows, cols), np.nan)
+    lats, lons = cell_centers(bounds, rows, cols)
+
+    # Haversine distance from every cell to every station: (rows, cols, stations)
+    lat1 = np.radians(lats)[:, None, None]
+    lon1 = np.radians(lons)[None, :, None]
+    lat2 = np.radians(np.asarray(station_lats, dtype=float))[None, None, :]
+    lon2 = np.radians(np.asarray(station_lons, dtype=float))[None, None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+    # A cell sitting on a station takes its value instead of dividing by zero
+    weights = 1.0 / np.power(np.maximum(distances, 1e-3), power)
+    return (weights @ values) / weights.sum(axis=2)
+
+
+def aqi_from_pm25(pm25):
+    """Vectorized counterpart of calculate_aqi"""
+    pm25 = np.asarray(pm25, dtype=float)
+    aqi = np.full(pm25.shape, np.nan)
+    lower = 0.0
+    for upper, aqi_low, points, span, _ in AQI_BANDS:
+        band = (pm25 <= upper) & np.isnan(aqi)
+        aqi[band] = aqi_low + points / span * (pm25[band] - lower)
+        lower = upper
+    return np.trunc(aqi)
+
+
+def colorize(pm25, alpha=170):
+    """RGBA image (rows, cols, 4) with the AQI band colour of each cell"""
+    pm25 = np.asarray(pm25, dtype=float)
+    image = np.zeros(pm25.shape + (4,), dtype=np.uint8)
+    band = np.searchsorted([entry[0] for entry in AQI_BANDS[:-1]], np.nan_to_num(pm25), side='left')
+    palette = np.array([entry[-1] for entry in AQI_BANDS], dtype=np.uint8)
+    image[..., :3] = palette[band]
+    image[..., 3] = np.where(np.isnan(pm25), 0, alpha)
+    return image
+
+
+def encode_png(image):
+    """Minimal RGBA PNG encoder (no filtering) so tiles need no imaging library"""
+    height, width = image.shape[:2]
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 4)
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6))
+            + chunk(b'IEND', b''))
+
+
+def encode_grid(pm25):
+    """Compact binary grid: little-endian float32 PM2.5, row-major from the north-west corner"""
+    return np.ascontiguousarray(pm25, dtype='<f4').tobytes()
+
+
+class Surface:
+    """One computed grid plus what it was computed from"""
+
+    __slots__ = ('city_key', 'zoom', 'bounds', 'pm25', 'stations', 'version')
+
+    def __init__(self, city_key, zoom, bounds, pm25, stations, version):
+        self.city_key = city_key
+        self.zoom = zoom
+        self.bounds = bounds
+        self.pm25 = pm25
+        self.stations = stations
+        self.version = version
+
+    def describe(self):
+        finite = self.pm25[np.isfinite(self.pm25)]
+        rows, cols = self.pm25.shape
+        return {
+            'city': self.city_key,
+            'zoom': self.zoom,
+            'rows': rows,
+            'cols': cols,
+            'bounds': dict(zip(('south', 'west', 'north', 'east'), self.bounds)),
+            'stations': self.stations,
+            'pm25_min': round(float(finite.min()), 2) if finite.size else None,
+            'pm25_max': round(float(finite.max()), 2) if finite.size else None,
+            'version': self.version
+        }
+
+
+def surface_inputs(catalog, city_key):
+    """(stations with data around a metro area, checksum of their positions and readings)"""
+    south, west, north, east = METRO_BOUNDS[city_key]
+    center_lat, center_lon = (south + north) / 2, (west + east) / 2
+    center, corner = to_unit_vectors([center_lat, north], [center_lon, east])
+    half_diagonal = float(chord_to_km(np.linalg.norm(corner - center)))
+    nearby = catalog.within(center_lat, center_lon, half_diagonal + STATION_MARGIN_KM, with_data=True)
+    readings = [(station['id'], station['lat'], station['lon'], station['pm25']) for station, _ in nearby]
+    return nearby, f"{zlib.crc32(repr(readings).encode('utf-8')):08x}"
+
+
+def compute_surface(catalog, city_key, zoom, power=2.0, inputs=None):
+    """Interpolate the latest station readings around a metro area at one zoom level"""
+    bounds = METRO_BOUNDS[city_key]
+    nearby, version = inputs if inputs is not None else surface_inputs(catalog, city_key)
+
+    rows, cols = grid_shape(zoom)
+    pm25 = idw_grid(bounds, rows, cols,
+                    [station['lat'] for station, _ in nearby],
+                    [station['lon'] for station, _ in nearby],
+                    [station['pm25'] for station, _ in nearby],
+                    power=power)
+    stations = [{'id': station['id'], 'lat': station['lat'], 'lon': station['lon'], 'pm25': station['pm25']}
+                for station, _ in nearby]
+    return Surface(city_key, zoom, bounds, pm25, stations, version)
@@ -0,0 +1,86 @@
+"""
+Joining served forecasts with later readings and the rolling error windows.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from accuracy import HOUR, AccuracyTracker, PredictionLog, RollingError
+
+BASE = 1759644000
+
+
+class PredictionLogTest(unittest.TestCase):
+
+    def test_join_resolves_only_matching_hours(self):
+        log = PredictionLog(8)
+        log.record(BASE, 24, 10.0)
+        log.record(BASE + HOUR, 24, 11.0)
+        log.record(BASE + 2 * HOUR, 24, 12.0)
+        resolved = log.join([BASE + 2 * HOUR, BASE + HOUR, BASE], [20.0, np.nan, 5.0])
+        self.assertEqual(sorted(log.target[resolved]), [BASE, BASE + 2 * HOUR])
+        self.assertEqual(log.pending_count(), 1)
+        # Re-issuing a resolved forecast changes nothing; a pending one is overwritten
+        self.assertFalse(log.record(BASE, 24, 99.0))
+        self.assertTrue(log.record(BASE + HOUR, 24, 13.0))
+        resolved = log.join([BASE + HOUR], [7.0])
+        self.assertEqual((log.predicted[resolved][0], log.actual[resolved][0]), (13.0, 7.0))
+
+    def test_oldest_slot_is_reused(self):
+        log = PredictionLog(2)
+        for hour in range(3):
+            log.record(BASE + hour * HOUR, 24, float(hour))
+        self.assertEqual(log.join([BASE], [1.0]).size, 0)
+        self.assertEqual(log.join([BASE + HOUR, BASE + 2 * HOUR], [1.0, 1.0]).size, 2)
+
+
+class RollingErrorTest(unittest.TestCase):
+
+    def test_matches_the_last_window_errors(self):
+        rng = np.random.default_rng(11)
+        rolling = RollingError(10)
+        seen = []
+        for size in (3, 4, 0, 6, 12, 1, 5):
+            batch = rng.normal(1.0, 3.0, size)
+            rolling.push(batch)
+            seen.extend(batch)
+            last = np.array(seen[-10:])
+            metrics = rolling.metrics()
+            self.assertEqual(metrics['samples'], last.size)
+            self.assertEqual(metrics['total_resolved'], len(seen))
+            self.assertAlmostEqual(metrics['mae'], round(float(np.abs(last).mean()), 3), places=3)
+            self.assertAlmostEqual(metrics['rmse'], round(float(np.sqrt(np.square(last).mean())), 3), places=3)
+            self.assertAlmostEqual(metrics['bias'], round(float(last.mean()), 3), places=3)
+
+    def test_empty_window(self):
+        self.assertEqual(RollingError(5).metrics(),
+                         {'samples': 0, 'mae': None, 'rmse': None, 'bias': None, 'total_resolved': 0})
+
+
+class AccuracyTrackerTest(unittest.TestCase):
+
+    def test_summary_per_city_and_horizon(self):
+        tracker = AccuracyTracker(capacity=16, window=4)
+        tracker.record('cdmx', BASE, 24, 30.0)
+        tracker.record('cdmx', BASE + HOUR, 24, 20.0)
+        tracker.record('cdmx', BASE, 1, 18.0)
+        tracker.record('cdmx', None, 24, 1.0)
+        self.assertEqual(tracker.observe('la', [BASE + 24 * HOUR], [1.0]), 0)
+        self.assertEqual(tracker.observe('cdmx', [BASE + HOUR, BASE + 24 * HOUR, BASE + 25 * HOUR],
+                                         [20.0, 25.0, 26.0]), 3)
+        summary = tracker.summary('cdmx')['cdmx']
+        self.assertEqual(summary['pending'], 0)
+        self.assertEqual(summary['horizons']['1h']['bias'], -2.0)
+        self.assertEqual(summary['horizons']['24h']['mae'], 5.5)
+        self.assertEqual(summary['horizons']['24h']['bias'], -0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Per-client token buckets and the concurrency gate of expensive routes.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from admission import AdmissionController, ConcurrencyGate, TokenBucketLimiter
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_then_refill(self):
+        limiter = TokenBucketLimiter(rate_per_second=2.0, burst=3)
+        self.assertEqual([limiter.allow('a', now=0.0)[0] for _ in range(3)], [True] * 3)
+        allowed, retry_after = limiter.allow('a', now=0.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 0.5)
+        # Other clients have their own bucket
+        self.assertTrue(limiter.allow('b', now=0.0)[0])
+        self.assertTrue(limiter.allow('a', now=0.5)[0])
+        self.assertFalse(limiter.allow('a', now=0.6)[0])
+        # Refill stops at the burst size
+        self.assertEqual([limiter.allow('a', now=100.0)[0] for _ in range(4)], [True, True, True, False])
+
+    def test_least_recent_clients_are_dropped(self):
+        limiter = TokenBucketLimiter(rate_per_second=1.0, burst=1, max_keys=2)
+        for key in ('a', 'b', 'c'):
+            limiter.allow(key, now=0.0)
+        self.assertEqual(limiter.tracked_keys(), 2)
+        # 'a' was evicted, so it comes back with a full bucket; 'c' is still empty
+        self.assertTrue(limiter.allow('a', now=0.0)[0])
+        self.assertFalse(limiter.allow('c', now=0.0)[0])
+
+
+class ConcurrencyGateTest(unittest.TestCase):
+
+    def test_queue_full_and_timeout(self):
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=1, queue_timeout=0.2)
+        self.assertIsNone(gate.acquire())
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(gate.acquire()))
+        waiter.start()
+        deadline = time.monotonic() + 5
+        while gate.waiting == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(gate.acquire(), 'queue_full')
+        waiter.join()
+        self.assertEqual(results, ['queue_timeout'])
+        self.assertEqual(gate.peak_waiting, 1)
+
+    def test_waiter_is_admitted_on_release(self):
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=1, queue_timeout=5)
+        gate.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(gate.acquire()))
+        waiter.start()
+        while gate.waiting == 0:
+            time.sleep(0.01)
+        gate.release()
+        waiter.join()
+        self.assertEqual(results, [None])
+        self.assertEqual(gate.active, 1)
+
+    def test_controller_counts_rejections(self):
+        controller = AdmissionController(rate_per_minute=60, burst=1, max_concurrent=1, max_queue=0)
+        self.assertTrue(controller.check_rate('client')[0])
+        self.assertFalse(controller.check_rate('client')[0])
+        self.assertIsNone(controller.enter())
+        self.assertEqual(controller.enter(), 'queue_full')
+        controller.leave()
+        metrics = controller.metrics()
+        self.assertEqual(metrics['admitted'], 1)
+        self.assertEqual(metrics['rejections'], {'rate_limited': 1, 'queue_full': 1, 'queue_timeout': 0})
+        self.assertEqual(metrics['in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
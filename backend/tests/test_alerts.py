@@ -0,0 +1,121 @@
+"""
+Threshold crossings of alert subscriptions and webhook address checks.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from alerts import AlertEngine, SubscriptionStore, ThresholdIndex, check_webhook
+
+
+class ListSink:
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, notification):
+        self.sent.append(notification)
+
+
+class ThresholdIndexTest(unittest.TestCase):
+
+    def test_crossed_range_bounds(self):
+        index = ThresholdIndex()
+        for threshold, subscription_id in ((50, 'a'), (100, 'b'), (100, 'c'), (150, 'd')):
+            index.add(threshold, subscription_id)
+        self.assertEqual(index.crossed(40, 100, inclusive_high=True), ['a', 'b', 'c'])
+        self.assertEqual(index.crossed(40, 100, inclusive_high=False), ['a'])
+        self.assertEqual(index.crossed(50, 149, inclusive_high=True), ['b', 'c'])
+        self.assertEqual(index.crossed(150, 500, inclusive_high=True), [])
+
+    def test_remove_only_the_given_subscription(self):
+        index = ThresholdIndex()
+        index.add(100, 'b')
+        index.add(100, 'c')
+        self.assertTrue(index.remove(100, 'c'))
+        self.assertFalse(index.remove(100, 'c'))
+        self.assertFalse(index.remove(90, 'b'))
+        self.assertEqual(index.crossed(0, 200, inclusive_high=True), ['b'])
+
+
+class AlertEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = AlertEngine(sink=ListSink())
+        self.above = self.engine.subscribe('cdmx', 'aqi', 100, 'above')
+        self.below = self.engine.subscribe('cdmx', 'aqi', 50, 'below')
+        self.engine.seed('cdmx', {'aqi': 40, 'pm25': None})
+
+    def crossed(self, value, city='cdmx'):
+        return [(n['subscription_id'], n['direction']) for n in self.engine.evaluate(city, {'aqi': value})]
+
+    def test_rising_and_falling_crossings(self):
+        self.assertEqual(self.crossed(99), [])
+        self.assertEqual(self.crossed(100), [(self.above.id, 'above')])
+        # Staying above, or dipping without passing 50, notifies nobody
+        self.assertEqual(self.crossed(160), [])
+        self.assertEqual(self.crossed(60), [])
+        self.assertEqual(self.crossed(49), [(self.below.id, 'below')])
+        # A rise through 50 does not notify the 'below' subscription at 50
+        self.assertEqual(self.crossed(180), [(self.above.id, 'above')])
+
+    def test_first_reading_of_a_city_only_seeds(self):
+        self.engine.subscribe('la', 'aqi', 10, 'above')
+        self.assertEqual(self.crossed(500, city='la'), [])
+        self.assertEqual(self.crossed(5, city='la'), [])
+        self.assertEqual(len(self.crossed(20, city='la')), 1)
+
+    def test_update_and_unsubscribe_move_the_threshold(self):
+        self.engine.update(self.above.id, threshold=45)
+        self.assertEqual(self.crossed(45), [(self.above.id, 'above')])
+        self.assertTrue(self.engine.unsubscribe(self.above.id))
+        self.crossed(0)
+        self.assertEqual(self.crossed(200), [])
+        with self.assertRaises(ValueError):
+            self.engine.subscribe('cdmx', 'aqi', 10, 'sideways')
+
+    def test_subscriptions_survive_a_restart(self):
+        with tempfile.TemporaryDirectory(prefix='airguard-alerts-') as workdir:
+            store = SubscriptionStore(os.path.join(workdir, 'alerts.db'))
+            engine = AlertEngine(store=store, sink=ListSink())
+            subscription = engine.subscribe('la', 'pm25', 35.5, 'above', webhook='https://hooks.example.com/x')
+            engine.update(subscription.id, threshold=55.5)
+            engine.subscribe('la', 'pm25', 12, 'below')
+            engine.unsubscribe(engine.list()[-1].id)
+
+            reloaded = AlertEngine(store=SubscriptionStore(store.path), sink=ListSink())
+            self.assertEqual(len(reloaded), 1)
+            restored = reloaded.get(subscription.id)
+            self.assertEqual((restored.threshold, restored.token, restored.webhook),
+                             (55.5, subscription.token, 'https://hooks.example.com/x'))
+            reloaded.seed('la', {'pm25': 50})
+            self.assertEqual(len(reloaded.evaluate('la', {'pm25': 60})), 1)
+            store._conn.close()
+            reloaded.store._conn.close()
+
+
+class CheckWebhookTest(unittest.TestCase):
+
+    def test_untrusted_hosts_must_be_allowlisted(self):
+        self.assertIsNotNone(check_webhook('https://8.8.8.8/hook'))
+        self.assertIsNone(check_webhook('https://8.8.8.8/hook', allowed_hosts=('8.8.8.8',)))
+        self.assertIsNone(check_webhook('https://8.8.8.8/hook', trusted=True))
+
+    def test_internal_addresses_are_rejected_even_for_admins(self):
+        for url in ('http://127.0.0.1:5000/', 'http://10.0.0.7/', 'http://192.168.1.1/', 'http://169.254.169.254/',
+                    'http://[::1]/', 'http://[fd00::1]/', 'http://0.0.0.0/', 'http://224.0.0.1/'):
+            self.assertEqual(check_webhook(url, trusted=True), "'webhook' must resolve to a public address.", url)
+
+    def test_only_http_urls(self):
+        for url in ('ftp://8.8.8.8/', 'file:///etc/passwd', 'https://', None, 42):
+            self.assertEqual(check_webhook(url, trusted=True), "'webhook' must be an http(s) URL.", url)
+
+
+if __name__ == '__main__':
+    unittest.main()
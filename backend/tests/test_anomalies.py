@@ -0,0 +1,89 @@
+"""
+Out-of-range, spike and stuck-sensor flags of the online anomaly detector.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import os
+import statistics
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from anomalies import AnomalyDetector, PollutantState
+
+HOUR = 3600
+
+
+def feed(detector, values, pollutant='pm25', city_key='cdmx'):
+    return [detector.check(city_key, pollutant, i * HOUR, value) for i, value in enumerate(values)]
+
+
+class RollingMedianTest(unittest.TestCase):
+
+    def test_matches_a_full_sort_over_the_window(self):
+        rng = np.random.default_rng(5)
+        state = PollutantState(24)
+        values = [float(v) for v in rng.integers(0, 40, 200)]
+        for i, value in enumerate(values):
+            state.push(value, 0.1)
+            window = values[max(0, i - 23):i + 1]
+            median = statistics.median(window)
+            self.assertEqual(state.median_mad(), (median, statistics.median(abs(v - median) for v in window)))
+
+
+class AnomalyDetectorTest(unittest.TestCase):
+
+    def test_out_of_range_is_kept_out_of_the_statistics(self):
+        detector = AnomalyDetector()
+        self.assertEqual(feed(detector, [20.0, -5.0, 1500.0]), [[], ['out_of_range'], ['out_of_range']])
+        self.assertEqual(detector.state('cdmx')['pm25']['window_readings'], 1)
+        self.assertEqual(detector.status(), {'cdmx': {'out_of_range': 2, 'spike': 0, 'stuck': 0}})
+
+    def test_spike_needs_history_z_and_a_minimum_jump(self):
+        baseline = [20.0 + (i % 5) for i in range(12)]
+        detector = AnomalyDetector()
+        self.assertEqual(feed(detector, baseline + [90.0])[-1], ['spike'])
+        event = detector.events('cdmx', kind='spike')[0]
+        self.assertEqual((event['value'], event['median']), (90.0, 21.5))
+        self.assertGreater(event['robust_z'], 6.0)
+
+        # Same jump with too little history
+        self.assertEqual(feed(AnomalyDetector(), baseline[:5] + [90.0])[-1], [])
+        # Far out in MAD units, but below the 15 µg/m³ jump of PM2.5
+        tight = [20.0 + (i % 2) * 0.1 for i in range(12)]
+        self.assertEqual(feed(AnomalyDetector(), tight + [30.0])[-1], [])
+
+    def test_flat_window_falls_back_to_the_ewma(self):
+        detector = AnomalyDetector()
+        flags = feed(detector, [20.0] * 4 + [22.0] + [20.0] * 7 + [80.0], pollutant='pm10')
+        self.assertEqual(flags[-1], ['spike'])
+        self.assertIsNone(detector.events('cdmx', kind='spike')[0]['robust_z'])
+
+    def test_stuck_run_is_one_growing_event(self):
+        detector = AnomalyDetector()
+        flags = feed(detector, [10.0, 12.0] + [12.0] * 7 + [13.0])
+        self.assertEqual(flags, [[]] * 6 + [['stuck']] * 3 + [[]])
+        events = detector.events('cdmx', kind='stuck')
+        self.assertEqual(len(events), 1)
+        self.assertEqual((events[0]['epoch'], events[0]['end_epoch'], events[0]['hours']), (HOUR, 8 * HOUR, 8))
+
+    def test_readings_at_the_detection_floor_never_stick(self):
+        detector = AnomalyDetector()
+        self.assertEqual(feed(detector, [2.0] * 30), [[]] * 30)
+        self.assertEqual(feed(detector, [0.0] * 30, pollutant='o3'), [[]] * 30)
+
+    def test_observe_skips_blank_and_invalid_fields(self):
+        detector = AnomalyDetector()
+        records = [{'pm25': '25', 'o3': '', 'co': 'n/a', 'no2': float('nan')}, {'pm25': 2000, 'so2': None}]
+        self.assertEqual(detector.observe('la', records, [0, HOUR]), 1)
+        self.assertEqual(detector.events('la'), [{'kind': 'out_of_range', 'pollutant': 'pm25', 'epoch': HOUR,
+                                                  'value': 2000.0, 'range': [0.0, 1000.0]}])
+        self.assertEqual(list(detector.state('la')), ['pm25'])
+
+
+if __name__ == '__main__':
+    unittest.main()
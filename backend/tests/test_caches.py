@@ -0,0 +1,134 @@
+"""
+Stale-while-revalidate prediction cache and the LTTB chart windows.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from downsampling import WindowCache, downsample_records, lttb_indices
+from prediction_cache import PredictionCache
+
+
+class PredictionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.version = 1
+        self.calls = 0
+        self.error = None
+        self.release = threading.Event()
+        self.release.set()
+
+    def compute(self, key):
+        self.release.wait(5)
+        self.calls += 1
+        return (None, self.error) if self.error else ((key, self.calls), None)
+
+    def wait_for_refresh(self, cache):
+        cache._queue.join()
+
+    def test_cold_miss_then_hits(self):
+        cache = PredictionCache(self.compute, lambda key: self.version, ttl_seconds=300)
+        value, error, entry = cache.get('cdmx')
+        self.assertEqual((value, error), (('cdmx', 1), None))
+        self.assertEqual(entry.data_version, 1)
+        self.assertEqual(cache.get('cdmx')[0], ('cdmx', 1))
+        self.assertEqual((cache.stats['misses'], cache.stats['hits'], self.calls), (1, 1, 1))
+
+    def test_new_data_serves_stale_value_while_refreshing(self):
+        cache = PredictionCache(self.compute, lambda key: self.version, ttl_seconds=300)
+        cache.get('cdmx')
+        self.version = 2
+        self.release.clear()
+        # The old value comes back at once; a second stale read does not queue another refresh
+        self.assertEqual(cache.get('cdmx')[0], ('cdmx', 1))
+        self.assertEqual(cache.get('cdmx')[0], ('cdmx', 1))
+        self.assertEqual(cache.snapshot()['pending_refresh'], ['cdmx'])
+        self.release.set()
+        self.wait_for_refresh(cache)
+        self.assertEqual(cache.stats['stale_hits'], 2)
+        self.assertEqual(cache.stats['refreshes'], 1)
+        self.assertFalse(cache.is_stale('cdmx'))
+        self.assertEqual(cache.get('cdmx')[0], ('cdmx', 2))
+
+    def test_expired_entry_is_stale(self):
+        cache = PredictionCache(self.compute, lambda key: self.version, ttl_seconds=-1)
+        cache.get('la')
+        self.assertTrue(cache.is_stale('la'))
+
+    def test_errors_are_not_cached(self):
+        cache = PredictionCache(self.compute, lambda key: self.version, ttl_seconds=300)
+        self.error = 'no data'
+        self.assertEqual(cache.get('cdmx'), (None, 'no data', None))
+        self.assertTrue(cache.is_stale('cdmx'))
+        self.error = None
+        self.assertEqual(cache.get('cdmx')[0], ('cdmx', 2))
+
+    def test_failed_refresh_keeps_the_old_value(self):
+        cache = PredictionCache(self.compute, lambda key: self.version, ttl_seconds=300)
+        cache.get('cdmx')
+        self.error = 'model unavailable'
+        cache.invalidate()
+        self.wait_for_refresh(cache)
+        self.assertEqual(cache.stats['refresh_errors'], 1)
+        self.assertEqual(cache.get('cdmx')[0], ('cdmx', 1))
+
+
+class LttbTest(unittest.TestCase):
+
+    def test_short_series_and_tiny_outputs_are_kept(self):
+        np.testing.assert_array_equal(lttb_indices(np.arange(5), np.arange(5), 10), np.arange(5))
+        np.testing.assert_array_equal(lttb_indices(np.arange(5), np.arange(5), 2), np.arange(5))
+
+    def test_keeps_endpoints_and_peaks(self):
+        n = 1000
+        x = np.arange(n)
+        y = np.sin(x / 50.0)
+        y[437] = 25.0
+        keep = lttb_indices(x, y, 100)
+        self.assertEqual(keep.size, 100)
+        self.assertEqual((keep[0], keep[-1]), (0, n - 1))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(437, keep)
+
+    def test_peak_of_any_series_survives_nans(self):
+        n = 500
+        ys = np.vstack([np.zeros(n), np.full(n, np.nan)])
+        ys[0, 120] = 1.0
+        ys[1, 300:] = 0.0
+        ys[1, 410] = 1000.0
+        keep = lttb_indices(np.arange(n), ys, 50)
+        self.assertIn(120, keep)
+        self.assertIn(410, keep)
+
+    def test_downsample_records(self):
+        records = [{'t': i, 'pm25': float(i % 7)} for i in range(300)]
+        self.assertIs(downsample_records(records, ['pm25'], None), records)
+        self.assertIs(downsample_records(records, ['pm25'], 300), records)
+        reduced = downsample_records(records, ['pm25'], 60, x_field='t')
+        self.assertEqual(len(reduced), 60)
+        self.assertEqual((reduced[0]['t'], reduced[-1]['t']), (0, 299))
+
+
+class WindowCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = WindowCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats(), {'entries': 2, 'max_entries': 2, 'hits': 3, 'misses': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
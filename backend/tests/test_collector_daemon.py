@@ -0,0 +1,117 @@
+"""
+End-to-end run of the collector daemon against the local upstream stub.
+
+The stub (scripts/stub_upstream.py) runs with --fail-every 3, so every third
+upstream request answers 503 and the daemon only fills its window if
+fetch_json retries. A second pass over the same hours must be answered from
+the response cache, which the stub's /stats counters show.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.request
+from datetime import datetime, timezone
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+FAIL_EVERY = 3
+BACKFILL_HOURS = 3
+REALTIME_FILES = ('datos_realtime_Centro_CDMX.csv', 'datos_realtime_Centro_LA.csv')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class CollectorDaemonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='airguard-daemon-')
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        port = free_port()
+        self.base = f'http://127.0.0.1:{port}'
+        self.stub = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, 'stub_upstream.py'),
+                                      '--port', str(port), '--fail-every', str(FAIL_EVERY)],
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.addCleanup(self.stub.wait)
+        self.addCleanup(self.stub.terminate)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                self.stats()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.fail('stub upstream did not start')
+                time.sleep(0.05)
+
+    def stats(self):
+        with urllib.request.urlopen(f'{self.base}/stats', timeout=5) as response:
+            return json.loads(response.read())
+
+    def run_daemon(self):
+        env = dict(os.environ,
+                   API_KEY_OPENAQ='dummy',
+                   OPENAQ_BASE_URL=f'{self.base}/openaq/v3',
+                   OPENMETEO_BASE_URL=f'{self.base}/openmeteo/v1',
+                   UPSTREAM_CACHE_DIR=os.path.join(self.workdir, 'upstream_cache'),
+                   WEATHER_CACHE_DIR=os.path.join(self.workdir, 'weather_cache'),
+                   STATIONS_CATALOG=os.path.join(self.workdir, 'no_catalog.json'),
+                   UPSTREAM_RETRY_BASE_DELAY='0.01',
+                   PYTHONIOENCODING='utf-8')
+        env.pop('STORAGE_PATH', None)
+        result = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'collector_daemon.py'), '--once',
+                                 '--backfill-hours', str(BACKFILL_HOURS), '--retries', '0',
+                                 '--data-dir', os.path.join(self.workdir, 'data')],
+                                env=env, capture_output=True, text=True, timeout=300)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout
+
+    def captured_rows(self):
+        rows = {}
+        for name in REALTIME_FILES:
+            with open(os.path.join(self.workdir, 'data', name), encoding='utf-8') as file:
+                rows[name] = sum(1 for _ in file) - 1
+        return rows
+
+    def test_retries_cache_and_stats(self):
+        hour = datetime.now(timezone.utc).hour
+        output = self.run_daemon()
+        first = self.stats()
+
+        # Every FAIL_EVERY-th request was a 503, yet the whole window was captured
+        failed = first['total'] // FAIL_EVERY
+        self.assertGreater(failed, 0)
+        self.assertEqual(output.count('returned HTTP 503; retry'), failed)
+        self.assertIn('📊 CDMX: 4 horas capturadas, 0 pendientes', output)
+        self.assertIn('📊 LA: 4 horas capturadas, 0 pendientes', output)
+        self.assertEqual(self.captured_rows(), dict.fromkeys(REALTIME_FILES, BACKFILL_HOURS + 1))
+        self.assertEqual(sum(first['by_path'].values()), first['total'])
+
+        # Same hours again: measurements and sensor lists come from the cache
+        for name in REALTIME_FILES:
+            os.remove(os.path.join(self.workdir, 'data', name))
+        output = self.run_daemon()
+        second = self.stats()
+        if datetime.now(timezone.utc).hour != hour:
+            self.skipTest('the UTC hour changed during the test, so the re-run had a new hour to fetch')
+
+        self.assertEqual(self.captured_rows(), dict.fromkeys(REALTIME_FILES, BACKFILL_HOURS + 1))
+        for path in ('openaq/v3/sensors/<id>/measurements', 'openaq/v3/locations/<id>/sensors'):
+            self.assertEqual(second['by_path'].get(path), first['by_path'].get(path), path)
+        # Only the uncached location search goes upstream again
+        self.assertLess(second['total'] - first['total'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+HTTP Range handling and timestamp parameters of the streaming export.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from export import parse_range_header, parse_time_param, serialize, slice_stream
+
+
+class ParseRangeHeaderTest(unittest.TestCase):
+
+    def test_closed_open_and_suffix_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range_header('bytes=500-', 1000), (500, 999))
+        self.assertEqual(parse_range_header('bytes=-200', 1000), (800, 999))
+        self.assertEqual(parse_range_header('  bytes=10-10 ', 1000), (10, 10))
+
+    def test_clamps_to_the_stream(self):
+        self.assertEqual(parse_range_header('bytes=900-5000', 1000), (900, 999))
+        # A suffix longer than the stream is the whole stream
+        self.assertEqual(parse_range_header('bytes=-5000', 1000), (0, 999))
+
+    def test_unusable_ranges(self):
+        for header in (None, '', 'bytes=-', 'bytes=-0', 'bytes=1000-', 'bytes=20-10', 'items=0-10',
+                       'bytes=0-10,20-30', 'bytes=a-b'):
+            self.assertIsNone(parse_range_header(header, 1000), header)
+        self.assertIsNone(parse_range_header('bytes=0-10', 0))
+
+
+class SliceStreamTest(unittest.TestCase):
+
+    def test_matches_slicing_the_joined_stream(self):
+        chunks = [b'abc', b'', b'defgh', b'i', b'jklmnop']
+        whole = b''.join(chunks)
+        for first in range(len(whole)):
+            for last in range(first, len(whole) + 2):
+                self.assertEqual(b''.join(slice_stream(iter(chunks), first, last)), whole[first:last + 1],
+                                 (first, last))
+
+    def test_stops_reading_after_the_range(self):
+        def chunks():
+            yield b'0123'
+            yield b'4567'
+            raise AssertionError('read past the range')
+
+        self.assertEqual(b''.join(slice_stream(chunks(), 2, 5)), b'2345')
+
+    def test_resume_is_byte_identical(self):
+        records = [{'timestamp': f'2025-01-01 {hour:02d}:00:00+00:00', 'pm25': hour * 1.5} for hour in range(24)]
+        chunked = [records[i:i + 5] for i in range(0, len(records), 5)]
+        whole = b''.join(serialize(iter(chunked), ['pm25'], 'csv'))
+        first, last = parse_range_header('bytes=100-', len(whole))
+        resumed = b''.join(slice_stream(serialize(iter(chunked), ['pm25'], 'csv'), first, last))
+        self.assertEqual(whole[:100] + resumed, whole)
+
+
+class ParseTimeParamTest(unittest.TestCase):
+
+    def test_epochs_and_iso_timestamps(self):
+        self.assertIsNone(parse_time_param(None))
+        self.assertIsNone(parse_time_param(''))
+        self.assertEqual(parse_time_param('1759644000'), 1759644000)
+        self.assertEqual(parse_time_param('-3600'), -3600)
+        self.assertEqual(parse_time_param('2025-10-05T06:00:00Z'), 1759644000)
+        self.assertEqual(parse_time_param('2025-10-05 00:00:00-06:00'), 1759644000)
+
+    def test_invalid_timestamp_raises(self):
+        with self.assertRaises(ValueError):
+            parse_time_param('yesterday')
+
+
+if __name__ == '__main__':
+    unittest.main()
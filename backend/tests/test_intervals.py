@@ -0,0 +1,119 @@
+"""
+Residual-quantile intervals and their held-out calibration.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from intervals import ResidualQuantiles
+from timeseries import HOUR, HourlySeries
+
+HOURS = 200
+START = 1759644000
+
+
+class ResidualQuantilesTest(unittest.TestCase):
+
+    def test_coverage_matches_the_nominal_share(self):
+        rng = np.random.default_rng(7)
+        predicted = rng.uniform(5, 80, 4000)
+        actual = predicted + rng.normal(0, 1, predicted.size) * predicted / 10
+        calibration = ResidualQuantiles(predicted, actual)
+        self.assertEqual(calibration.samples, 4000)
+        self.assertEqual(calibration.offsets.shape, (4, 3))
+        self.assertEqual(calibration.coverage['samples'], 2000)
+        self.assertAlmostEqual(calibration.coverage['inside'], calibration.coverage['nominal'], delta=0.05)
+        # Errors grow with the level, so the top bin is wider than the bottom one
+        widths = calibration.offsets[:, 2] - calibration.offsets[:, 0]
+        self.assertGreater(widths[-1], widths[0])
+
+    def test_ignores_non_finite_samples_and_clamps(self):
+        calibration = ResidualQuantiles([1.0, np.nan, 2.0, 3.0], [0.0, 5.0, np.inf, 1.0], min_per_bin=1,
+                                        check_coverage=False)
+        self.assertEqual(calibration.samples, 2)
+        self.assertIsNone(calibration.coverage)
+        bounds = calibration.apply([0.5], lower=0.0)
+        self.assertTrue(np.all(bounds >= 0.0))
+        with self.assertRaises(ValueError):
+            ResidualQuantiles([np.nan], [1.0])
+
+
+class FakeModel:
+    """Forecasts the current PM2.5 as the 24h value"""
+
+    feature_names = ['pm25']
+
+    def __init__(self, trained_until):
+        self.trained_until = trained_until
+
+    def predict_matrix(self, X):
+        return X[:, 0]
+
+
+class FakeManager:
+
+    def __init__(self, model=None):
+        self.model = model
+
+    @contextlib.contextmanager
+    def acquire(self, city_key):
+        yield self.model
+
+
+class CalibrateIntervalsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.TemporaryDirectory(prefix='airguard-intervals-')
+        with mock.patch.dict(os.environ, {'ALERTS_PATH': os.path.join(cls.workdir.name, 'alerts.db')}):
+            import app_fullstack
+        cls.app = app_fullstack
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.workdir.cleanup()
+
+    def calibrate(self, trained_until_hour):
+        app = self.app
+        rng = np.random.default_rng(0)
+        columns = {target: rng.uniform(5, 50, HOURS) for target in app.FORECAST_TARGETS}
+        series = HourlySeries(START, columns, np.ones(HOURS, dtype=bool))
+        trained_until = None if trained_until_hour is None else START + trained_until_hour * HOUR
+        intervals = {}
+        with mock.patch.object(app, 'HOURLY_SERIES', {'cdmx': series}), \
+                mock.patch.object(app, 'INTERVALS', intervals), \
+                mock.patch.object(app, 'UNCALIBRATED_ROWS', {}), \
+                mock.patch.object(app, 'MODEL_MANAGER', FakeManager(FakeModel(trained_until))), \
+                mock.patch.object(app, 'POLLUTANT_MODELS', {target: FakeManager() for target in app.FORECAST_POLLUTANTS}):
+            app.calibrate_intervals('cdmx')
+        return intervals
+
+    def test_only_labels_after_trained_until_count(self):
+        intervals = self.calibrate(100)
+        # Rows 0..175 have a label; only those labelled after hour 100 are held out
+        self.assertEqual(intervals[('cdmx', 'pm25')].samples, HOURS - 24 - 77)
+        # Targets without a model are persistence forecasts, so every labelled row counts
+        self.assertEqual(intervals[('cdmx', 'o3')].samples, HOURS - 24)
+
+    def test_too_few_held_out_hours_give_no_interval(self):
+        intervals = self.calibrate(HOURS - 30)
+        self.assertNotIn(('cdmx', 'pm25'), intervals)
+        self.assertIn(('cdmx', 'o3'), intervals)
+
+    def test_model_without_cutoff_has_no_held_out_hours(self):
+        intervals = self.calibrate(None)
+        self.assertNotIn(('cdmx', 'pm25'), intervals)
+
+
+if __name__ == '__main__':
+    unittest.main()
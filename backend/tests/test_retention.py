@@ -0,0 +1,91 @@
+"""
+Daily rollups and compaction of old history into cold monthly partitions.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retention import DAY, DailyRollups, TieredHistory, policy_from_env
+
+START = datetime(2025, 1, 30, tzinfo=timezone.utc)
+
+
+def hourly_records(hours, pm25=lambda hour: float(hour % 24)):
+    return [{'timestamp': (START + timedelta(hours=hour)).strftime('%Y-%m-%d %H:%M:%S+00:00'),
+             'pm25': pm25(hour), 'o3': ''} for hour in range(hours)]
+
+
+class DailyRollupsTest(unittest.TestCase):
+
+    def test_mean_min_max_per_utc_day(self):
+        epochs = [0, 3600, 7200, DAY + 60]
+        rollups = DailyRollups.from_readings(epochs, [{'pm25': 10.0}, {'pm25': None}, {'pm25': 30.0},
+                                                      {'pm25': 5.0}])
+        records = rollups.records()
+        self.assertEqual([(r['day'], r['hours']) for r in records], [('1970-01-01', 3), ('1970-01-02', 1)])
+        self.assertEqual((records[0]['pm25_mean'], records[0]['pm25_min'], records[0]['pm25_max']),
+                         (20.0, 10.0, 30.0))
+        self.assertIsNone(records[0]['o3_mean'])
+        self.assertEqual([r['day'] for r in rollups.records(start=DAY + 7200)], ['1970-01-02'])
+
+    def test_merge_replaces_the_same_days(self):
+        older = DailyRollups.from_readings([0, DAY], [{'pm25': 1.0}, {'pm25': 2.0}])
+        newer = DailyRollups.from_readings([DAY + 10, 2 * DAY], [{'pm25': 7.0}, {'pm25': 8.0}])
+        merged = older.merge(newer)
+        self.assertEqual(list(merged.epochs), [0, DAY, 2 * DAY])
+        self.assertEqual([r['pm25_mean'] for r in merged.records()], [1.0, 7.0, 8.0])
+
+
+class TieredHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='airguard-tiers-')
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_compaction_is_idempotent(self):
+        history = TieredHistory(self.root, {'cdmx': 2})
+        records = hourly_records(96)
+        latest = int((START + timedelta(hours=95)).timestamp())
+        cutoff = history.cutoff('cdmx', latest)
+        self.assertEqual(cutoff, int((START + timedelta(days=1)).timestamp()))
+
+        self.assertEqual(history.compact('cdmx', [records[:30], records[30:]], cutoff), 24)
+        # A second pass over overlapping rows rewrites the same hours and days
+        self.assertEqual(history.compact('cdmx', [records[10:40]], cutoff), 14)
+        self.assertEqual([month for month, _ in history.partitions('cdmx')], ['2025-01'])
+        archived = [reading for chunk in history.iter_range('cdmx') for reading in chunk]
+        self.assertEqual([reading.timestamp for reading in archived], [r['timestamp'] for r in records[:24]])
+        self.assertEqual(history.rollups('cdmx'), TieredHistory(self.root, {'cdmx': 2}).rollups('cdmx'))
+        self.assertEqual([(r['day'], r['hours'], r['pm25_mean']) for r in history.rollups('cdmx')],
+                         [('2025-01-30', 24, 11.5)])
+
+    def test_partitions_per_month_and_range_reads(self):
+        history = TieredHistory(self.root, {'la': 1})
+        records = hourly_records(72, pm25=float)
+        cutoff = int((START + timedelta(hours=60)).timestamp())
+        history.compact('la', [records], cutoff)
+        self.assertEqual([month for month, _ in history.partitions('la')], ['2025-01', '2025-02'])
+        start = int((START + timedelta(hours=47)).timestamp())
+        end = int((START + timedelta(hours=50)).timestamp())
+        chunks = list(history.iter_range('la', start, end))
+        self.assertEqual([len(chunk) for chunk in chunks], [1, 3])
+        self.assertEqual([reading.get('pm25') for chunk in chunks for reading in chunk], [47.0, 48.0, 49.0, 50.0])
+        self.assertEqual([(r['day'], r['hours']) for r in history.rollups('la')],
+                         [('2025-01-30', 24), ('2025-01-31', 24), ('2025-02-01', 12)])
+
+    def test_policy_from_env(self):
+        environ = {'RETENTION_HOT_DAYS': '30', 'RETENTION_HOT_DAYS_LA': '7'}
+        self.assertEqual(policy_from_env(['cdmx', 'la'], environ), {'cdmx': 30, 'la': 7})
+        self.assertEqual(policy_from_env(['cdmx'], {}), {'cdmx': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+UTC parsing and hourly resampling of the collectors' timestamps.
+
+    python -m unittest discover -s backend/tests
+"""
+
+import csv
+import io
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from ingest import RealtimeIngestor
+from readings import read_readings
+from timeseries import (HOUR, INVALID_EPOCH, correct_legacy_utc, detect_gaps, normalize_records,
+                        parse_timestamps_utc, resample_hourly)
+
+
+def utc(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+# Row as written by the old CDMX collector: wall-clock 00:00 labelled +00:00, real UTC hour in hour_of_day
+LEGACY_CDMX = ('timestamp,hour_of_day,pm25\n'
+               '2025-10-05 00:00:00+00:00,6,24.0\n')
+
+
+class LegacyTimestampTest(unittest.TestCase):
+
+    def test_legacy_row_moves_to_real_utc_hour(self):
+        records = list(csv.DictReader(io.StringIO(LEGACY_CDMX)))
+        epochs, legacy = correct_legacy_utc(records, parse_timestamps_utc([r['timestamp'] for r in records]))
+        self.assertEqual(list(legacy), [True])
+        self.assertEqual(int(epochs[0]), utc(2025, 10, 5, 6))
+        self.assertEqual(normalize_records(records, ['pm25']).start, utc(2025, 10, 5, 6))
+
+    def test_current_rows_are_left_alone(self):
+        records = [
+            # Current collectors: local offset and local hour_of_day
+            {'timestamp': '2025-10-05 00:00:00-06:00', 'hour_of_day': '0'},
+            # Genuinely UTC rows whose hour_of_day is the UTC hour
+            {'timestamp': '2025-10-05 06:00:00+00:00', 'hour_of_day': '6'},
+            {'timestamp': '2025-10-05 07:00:00+00:00', 'hour_of_day': ''},
+        ]
+        parsed = parse_timestamps_utc([r['timestamp'] for r in records])
+        epochs, legacy = correct_legacy_utc(records, parsed)
+        self.assertEqual(list(legacy), [False, False, False])
+        self.assertEqual(list(epochs), list(parsed))
+
+    def test_ingest_keeps_legacy_row_after_watermark(self):
+        ingestor = RealtimeIngestor({})
+        batches = []
+        ingestor.add_listener(lambda city_key, records, epochs: batches.append((records, epochs)))
+        # Last hour of the bundled CDMX dataset: 2025-10-04 23:00-06:00
+        ingestor.set_watermark('cdmx', utc(2025, 10, 5, 5))
+
+        self.assertEqual(ingestor.ingest('cdmx', read_readings(io.StringIO(LEGACY_CDMX))), 1)
+        records, epochs = batches[0]
+        self.assertEqual(epochs, [utc(2025, 10, 5, 6)])
+        self.assertEqual(records[0].timestamp, '2025-10-05 06:00:00+00:00')
+        self.assertEqual(records[0].get('pm25'), 24.0)
+
+
+class ParseTimestampsTest(unittest.TestCase):
+
+    def test_fast_and_slow_paths_agree(self):
+        values = ['2025-10-05 00:00:00-06:00', '2025-10-05T06:00:00+00:00', '2025-10-05 05:30:00-00:30',
+                  '2025-10-05T06:00:00Z', '2025-10-05 06:00:00.000+00:00', '2025-10-05 06:00:00']
+        self.assertEqual(list(parse_timestamps_utc(values)), [utc(2025, 10, 5, 6)] * len(values))
+
+    def test_naive_offset_and_invalid_values(self):
+        epochs = parse_timestamps_utc(['2025-10-05 00:00:00', 'not a date', '', '2025-13-01 00:00:00'],
+                                      assume_utc_offset=-6 * HOUR)
+        self.assertEqual(int(epochs[0]), utc(2025, 10, 5, 6))
+        self.assertEqual(list(epochs[1:]), [INVALID_EPOCH] * 3)
+
+
+class ResampleHourlyTest(unittest.TestCase):
+
+    def test_detect_gaps(self):
+        epochs = [utc(2025, 1, 1, h) for h in (0, 1, 1, 4, 3, 8)] + [INVALID_EPOCH]
+        report = detect_gaps(epochs)
+        self.assertEqual(report['records'], 7)
+        self.assertEqual(report['invalid_timestamps'], 1)
+        self.assertEqual(report['duplicates'], 1)
+        self.assertEqual(report['out_of_order'], 1)
+        self.assertEqual(report['gaps'], [(utc(2025, 1, 1, 2), 1), (utc(2025, 1, 1, 5), 3)])
+        self.assertEqual(report['missing_steps'], 4)
+
+    def test_last_reading_of_an_hour_wins_and_fill_limit(self):
+        epochs = [utc(2025, 1, 1, 0), utc(2025, 1, 1, 0, 30), utc(2025, 1, 1, 5)]
+        series = resample_hourly(epochs, {'pm25': [1.0, 2.0, 7.0]}, fill='ffill', fill_limit=2)
+        self.assertEqual(series.start, utc(2025, 1, 1))
+        self.assertEqual(len(series), 6)
+        np.testing.assert_array_equal(series.columns['pm25'], [2.0, 2.0, 2.0, np.nan, np.nan, 7.0])
+        self.assertEqual(list(series.observed), [True, False, False, False, False, True])
+
+        linear = resample_hourly(epochs, {'pm25': [1.0, 2.0, 7.0]}, fill='linear')
+        np.testing.assert_array_equal(linear.columns['pm25'], [2.0, 3.0, 4.0, 5.0, 6.0, 7.0])
+        with self.assertRaises(ValueError):
+            resample_hourly(epochs, {'pm25': [1.0, 2.0, 7.0]}, fill='mean')
+
+    def test_extend_matches_a_full_rebuild(self):
+        rng = np.random.default_rng(3)
+        hours = np.sort(rng.choice(400, 250, replace=False))
+        epochs = utc(2025, 1, 1) + hours * HOUR
+        values = rng.uniform(0, 50, hours.size)
+        values[rng.random(hours.size) < 0.1] = np.nan
+        for fill, limit in (('nan', None), ('ffill', 3), ('linear', 2), ('ffill', None)):
+            for split in (50, 200, 249):
+                series = resample_hourly(epochs[:split], {'pm25': values[:split]}, fill, limit)
+                extended = series.extend(epochs[split:], {'pm25': values[split:]})
+                rebuilt = resample_hourly(epochs, {'pm25': values}, fill, limit)
+                np.testing.assert_array_equal(extended.columns['pm25'], rebuilt.columns['pm25'])
+                np.testing.assert_array_equal(extended.observed, rebuilt.observed)
+                self.assertEqual(extended.report['missing_steps'], rebuilt.report['missing_steps'])
+                self.assertEqual(extended.report['records'], rebuilt.report['records'])
+
+    def test_extend_needs_a_rebuild_for_older_readings(self):
+        series = resample_hourly([utc(2025, 1, 1, 0), utc(2025, 1, 1, 2)], {'pm25': [1.0, 2.0]})
+        self.assertIsNone(series.extend([utc(2025, 1, 1, 2, 30)], {'pm25': [3.0]}))
+        self.assertIsNone(series.extend([utc(2025, 1, 1, 1)], {'pm25': [3.0]}))
+        self.assertIsNone(series.extend([utc(2025, 1, 1, 3)], {'o3': [3.0]}))
+        self.assertIs(series.extend([], {'pm25': []}), series)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,353 @@
+"""
+Ingest-time normalization of hourly series.
+
+The collectors write timestamps with mixed UTC offsets (-06:00/-08:00 in the
+final datasets, +00:00 in the realtime captures, where the old collectors
+wrote local time with that label) and skip hours silently.
+Everything here converts timestamps to UTC epoch seconds, reports gaps and
+duplicates, and resamples onto a regular hourly grid so that lags and range
+lookups become index arithmetic.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+HOUR = 3600
+# Marker for timestamps that could not be parsed
+INVALID_EPOCH = np.iinfo(np.int64).min
+
+# Fast-path layout: 'YYYY-MM-DD HH:MM:SS+HH:MM' (or 'T' as separator)
+_OFFSET_LEN = 25
+_NAIVE_LEN = 19
+
+
+def parse_timestamps_utc(values, assume_utc_offset=0):
+    """Convert ISO-8601 strings to int64 UTC epoch seconds.
+
+    Strings in the collectors' fixed layout are parsed as a character matrix
+    without a Python-level loop; anything else (microseconds, 'Z', other
+    layouts) falls back to datetime.fromisoformat. Naive timestamps are
+    interpreted with assume_utc_offset seconds east of UTC. Unparseable
+    values become the minimum int64 so callers can mask them out.
+    """
+    arr = np.asarray(values, dtype=str)
+    n = arr.shape[0]
+    epochs = np.full(n, INVALID_EPOCH, dtype=np.int64)
+    if n == 0:
+        return epochs
+
+    width = arr.dtype.itemsize // 4
+    chars = arr.view(np.uint32).reshape(n, width) if width else np.zeros((n, 0), np.uint32)
+    lengths = np.char.str_len(arr)
+
+    offset_mask = np.zeros(n, dtype=bool)
+    if width >= _OFFSET_LEN:
+        sign_char = chars[:, 19]
+        offset_mask = ((lengths == _OFFSET_LEN) & ((sign_char == ord('+')) | (sign_char == ord('-')))
+                       & (chars[:, 22] == ord(':')))
+    naive_mask = lengths == _NAIVE_LEN
+    fast = offset_mask | naive_mask
+
+    if fast.any():
+        naive = arr[fast].astype('U19')
+        try:
+            local = naive.astype('datetime64[s]').astype(np.int64)
+        except ValueError:
+            fast[:] = False
+        else:
+            offsets = np.full(local.shape[0], assume_utc_offset, dtype=np.int64)
+            sub = offset_mask[fast]
+            if sub.any():
+                digits = chars[fast][sub].astype(np.int64) - ord('0')
+                sign = np.where(chars[fast][sub][:, 19] == ord('-'), -1, 1)
+                hh = digits[:, 20] * 10 + digits[:, 21]
+                mm = digits[:, 23] * 10 + digits[:, 24]
+                offsets[sub] = sign * (hh * HOUR + mm * 60)
+            epochs[fast] = local - offsets
+
+    for i in np.flatnonzero(~fast):
+        try:
+            dt = datetime.fromisoformat(str(arr[i]).replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+            epochs[i] = int(dt.timestamp()) - assume_utc_offset
+        else:
+            epochs[i] = int(dt.timestamp())
+    return epochs
+
+
+def detect_gaps(epochs, step=HOUR):
+    """Report ordering problems, duplicate hours and missing hours.
+
+    Returns a dict with counts plus a list of (gap_start_epoch, missing_steps)
+    for every run of missing hours.
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    valid = epochs[epochs != INVALID_EPOCH]
+    slots = valid // step
+    out_of_order = int(np.count_nonzero(np.diff(slots) < 0))
+
+    slots = np.sort(slots)
+    unique_slots = np.unique(slots)
+    duplicates = int(slots.shape[0] - unique_slots.shape[0])
+
+    deltas = np.diff(unique_slots)
+    gap_idx = np.flatnonzero(deltas > 1)
+    gaps = [(int((unique_slots[i] + 1) * step), int(deltas[i] - 1)) for i in gap_idx]
+
+    return {
+        'records': int(epochs.shape[0]),
+        'invalid_timestamps': int(epochs.shape[0] - valid.shape[0]),
+        'out_of_order': out_of_order,
+        'duplicates': duplicates,
+        'gaps': gaps,
+        'missing_steps': int(deltas[gap_idx].sum() - gap_idx.shape[0]) if gap_idx.size else 0,
+        'start': int(unique_slots[0] * step) if unique_slots.size else None,
+        'end': int(unique_slots[-1] * step) if unique_slots.size else None,
+    }
+
+
+def _forward_fill(values, observed, limit=None):
+    idx = np.where(observed, np.arange(values.shape[0]), -1)
+    np.maximum.accumulate(idx, out=idx)
+    filled = np.where(idx >= 0, values[np.maximum(idx, 0)], np.nan)
+    if limit is not None:
+        too_far = (np.arange(values.shape[0]) - idx) > limit
+        filled[too_far & ~observed] = np.nan
+    return filled
+
+
+def _linear_fill(values, observed, limit=None):
+    positions = np.arange(values.shape[0])
+    known = observed & ~np.isnan(values)
+    if not known.any():
+        return values.copy()
+    filled = np.interp(positions, positions[known], values[known], left=np.nan, right=np.nan)
+    if limit is not None:
+        prev_known = np.where(known, positions, -1)
+        np.maximum.accumulate(prev_known, out=prev_known)
+        next_known = np.where(known, positions, positions.shape[0])
+        next_known = np.minimum.accumulate(next_known[::-1])[::-1]
+        run = next_known - prev_known - 1
+        filled[(run > limit) & ~known] = np.nan
+    return filled
+
+
+FILL_METHODS = ('nan', 'ffill', 'linear')
+
+
+def _fill(values, observed, fill, fill_limit):
+    if fill == 'ffill':
+        return _forward_fill(values, observed & ~np.isnan(values), fill_limit)
+    if fill == 'linear':
+        return _linear_fill(values, observed, fill_limit)
+    return values
+
+
+class HourlySeries:
+    """Columns on a regular hourly UTC grid.
+
+    Row i corresponds to start + i * step, so index_of(), lag() and window()
+    are plain arithmetic instead of timestamp searches. `observed` marks rows
+    that came from a real reading rather than a fill; `raw` keeps the values
+    before filling so that extend() can fill newer hours exactly as a full
+    rebuild would.
+    """
+
+    def __init__(self, start, columns, observed, step=HOUR, report=None, raw=None, fill='nan', fill_limit=None):
+        self.start = int(start)
+        self.step = step
+        self.columns = columns
+        self.observed = observed
+        self.report = report or {}
+        self.raw = raw
+        self.fill = fill
+        self.fill_limit = fill_limit
+
+    def __len__(self):
+        return self.observed.shape[0]
+
+    @property
+    def end(self):
+        return self.start + (len(self) - 1) * self.step
+
+    def epochs(self):
+        return self.start + np.arange(len(self), dtype=np.int64) * self.step
+
+    def index_of(self, epoch):
+        """Row index for the hour containing epoch, or None if outside the grid"""
+        i = (int(epoch) - self.start) // self.step
+        return i if 0 <= i < len(self) else None
+
+    def value_at(self, column, epoch):
+        i = self.index_of(epoch)
+        return None if i is None else float(self.columns[column][i])
+
+    def lag(self, column, hours):
+        """Column shifted by `hours` rows, NaN where the lag falls before the start"""
+        values = self.columns[column]
+        shifted = np.full_like(values, np.nan)
+        if hours < len(values):
+            shifted[hours:] = values[:len(values) - hours]
+        return shifted
+
+    def window(self, start_epoch=None, end_epoch=None):
+        """Row slice covering [start_epoch, end_epoch], clipped to the grid"""
+        lo = 0 if start_epoch is None else max(0, -(-(int(start_epoch) - self.start) // self.step))
+        hi = len(self) if end_epoch is None else min(len(self), (int(end_epoch) - self.start) // self.step + 1)
+        return slice(lo, max(lo, hi))
+
+    def tail(self, hours):
+        return slice(max(0, len(self) - hours), len(self))
+
+    def extend(self, epochs, columns):
+        """New series with readings after the last hour appended, or None if it needs a rebuild.
+
+        Only the last rows a fill can reach are refilled, so the cost depends
+        on the batch and fill_limit rather than on the length of the series.
+        Returns None when a reading falls at or before the last hour, or the
+        series has no raw values to refill from.
+        """
+        epochs = np.asarray(epochs, dtype=np.int64)
+        if self.raw is None or len(self) == 0 or set(columns) != set(self.columns):
+            return None
+        if epochs.size == 0:
+            return self
+        if (epochs == INVALID_EPOCH).any() or epochs.min() // self.step <= self.end // self.step:
+            return None
+
+        added = detect_gaps(np.concatenate(([self.end], epochs)), self.step)
+        positions = epochs // self.step - self.end // self.step - 1
+        size = len(self) + int(positions.max()) + 1
+        observed = np.zeros(size, dtype=bool)
+        observed[:len(self)] = self.observed
+        observed[len(self) + positions] = True
+
+        # Rows from `keep` on can change (linear fills the old trailing hours too); a
+        # fill reaches at most fill_limit + 1 rows back, so refill from `context` on
+        if self.fill == 'nan':
+            keep = context = len(self)
+        elif self.fill_limit is None:
+            keep = context = 0
+        else:
+            keep = max(0, len(self) - self.fill_limit - 1)
+            context = max(0, keep - self.fill_limit - 1)
+
+        raw, grid = {}, {}
+        for name, values in columns.items():
+            out = np.full(size, np.nan)
+            out[:len(self)] = self.raw[name]
+            # Same hour twice in a batch: the last reading wins, as in resample_hourly
+            out[len(self) + positions] = np.asarray(values, dtype=float)
+            raw[name] = out
+            filled = np.empty(size)
+            filled[:keep] = self.columns[name][:keep]
+            filled[keep:] = _fill(out[context:], observed[context:], self.fill, self.fill_limit)[keep - context:]
+            grid[name] = filled
+
+        report = dict(self.report)
+        for key in ('records', 'out_of_order', 'duplicates', 'missing_steps'):
+            report[key] = report.get(key, 0) + added[key]
+        report['records'] -= 1
+        report['gaps'] = list(report.get('gaps', [])) + added['gaps']
+        report['end'] = added['end']
+        return HourlySeries(self.start, grid, observed, self.step, report, raw, self.fill, self.fill_limit)
+
+
+def resample_hourly(epochs, columns, fill='nan', fill_limit=None, step=HOUR):
+    """Place readings on a regular hourly grid.
+
+    Readings are floored to the hour; when several land in the same hour the
+    last one wins. Missing hours are filled according to `fill` ('nan',
+    'ffill' or 'linear'), with at most fill_limit consecutive hours filled.
+    """
+    if fill not in FILL_METHODS:
+        raise ValueError(f"fill must be one of {FILL_METHODS}")
+
+    epochs = np.asarray(epochs, dtype=np.int64)
+    report = detect_gaps(epochs, step)
+    valid = epochs != INVALID_EPOCH
+    slots = epochs[valid] // step
+    if slots.size == 0:
+        return HourlySeries(0, {name: np.empty(0) for name in columns}, np.zeros(0, bool), step, report,
+                            {name: np.empty(0) for name in columns}, fill, fill_limit)
+
+    first = int(slots.min())
+    positions = slots - first
+    size = int(positions.max()) + 1
+
+    # Later readings overwrite earlier ones in the same hour: keep the last occurrence
+    order = np.argsort(positions, kind='stable')
+    pos_sorted = positions[order]
+    keep_last = np.append(pos_sorted[1:] != pos_sorted[:-1], True)
+    src = np.flatnonzero(valid)[order[keep_last]]
+    dst = pos_sorted[keep_last]
+
+    observed = np.zeros(size, dtype=bool)
+    observed[dst] = True
+
+    raw, grid = {}, {}
+    for name, values in columns.items():
+        values = np.asarray(values, dtype=float)
+        out = np.full(size, np.nan)
+        out[dst] = values[src]
+        raw[name] = out
+        grid[name] = _fill(out, observed, fill, fill_limit)
+
+    return HourlySeries(first * step, grid, observed, step, report, raw, fill, fill_limit)
+
+
+def _blank_to_nan(value):
+    return 'nan' if value is None or value == '' else value
+
+
+def to_float_column(records, field):
+    """Float array for one field of dict records, NaN where missing or invalid"""
+    try:
+        return np.array([_blank_to_nan(record.get(field)) for record in records], dtype=float)
+    except (TypeError, ValueError):
+        pass
+    out = np.full(len(records), np.nan)
+    for i, record in enumerate(records):
+        try:
+            out[i] = float(record.get(field))
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def correct_legacy_utc(records, epochs):
+    """Move rows of the old collectors to their real UTC hour; returns (epochs, legacy mask).
+
+    Those collectors wrote the city's wall-clock time labelled +00:00 and the
+    real UTC hour in hour_of_day, so their rows parse 6 (CDMX) or 8 (LA)
+    hours early. A row counts as legacy when it is labelled UTC and its
+    hour_of_day disagrees with the labelled hour; the current collectors and
+    the bundled datasets write the local offset and the local hour, which
+    always agree.
+    """
+    epochs = np.array(epochs, dtype=np.int64)
+    labels = np.asarray([str(record.get('timestamp', '')) for record in records], dtype=str)
+    if labels.shape[0] == 0:
+        return epochs, np.zeros(0, dtype=bool)
+    hours = to_float_column(records, 'hour_of_day')
+    valid = (epochs != INVALID_EPOCH) & ~np.isnan(hours)
+    shift = np.where(valid, (hours - (epochs // HOUR) % 24) % 24, 0).astype(np.int64)
+    legacy = (np.char.endswith(labels, '+00:00') | np.char.endswith(labels, 'Z')) & valid & (shift != 0)
+    epochs[legacy] += shift[legacy] * HOUR
+    return epochs, legacy
+
+
+def normalize_records(records, fields, fill='ffill', fill_limit=3):
+    """Build an HourlySeries from CSV dict records or a ColumnTable"""
+    if hasattr(records, 'column'):
+        epochs = records.epochs
+        columns = {field: records.column(field) for field in fields}
+    else:
+        epochs = parse_timestamps_utc([r.get('timestamp', '') for r in records])
+        epochs, _ = correct_legacy_utc(records, epochs)
+        columns = {field: to_float_column(records, field) for field in fields}
+    return resample_hourly(epochs, columns, fill=fill, fill_limit=fill_limit)
@@ -0,0 +1,154 @@
+"""
+HTTP access to the upstream APIs (OpenAQ, Open-Meteo) for the collectors.
+
+Every request goes through fetch_json, which retries transient failures
+(connection errors, timeouts, 429 and 5xx) with jittered exponential backoff
+and keeps successful responses in an on-disk cache keyed by URL and
+parameters. Responses about hours that are already over never change, so
+they are cached for a long time and re-runs or backfills of the same hours
+do not hit the network again.
+"""
+
+import hashlib
+import json
+import os
+import random
+import socket
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+CACHE_DIR = os.environ.get('UPSTREAM_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'upstream_cache')
+
+# Data for hours that are over is final; the current hour may still change
+TTL_FINAL = 30 * 24 * 3600
+TTL_RECENT = 10 * 60
+RECENT_WINDOW = timedelta(hours=2)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# First backoff step in seconds; tests against the local stub set it near zero
+RETRY_BASE_DELAY = float(os.environ.get('UPSTREAM_RETRY_BASE_DELAY', 1.0))
+
+
+class UpstreamError(Exception):
+    """Request failed for good (non-retryable status or retries exhausted)"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def cache_key(url, params=None):
+    """Stable key for a request: URL plus parameters in sorted order (headers are ignored)"""
+    items = sorted((str(k), str(v)) for k, values in (params or {}).items()
+                   for v in (values if isinstance(values, (list, tuple)) else [values]))
+    return hashlib.sha1((url + '?' + urllib.parse.urlencode(items)).encode('utf-8')).hexdigest()
+
+
+def ttl_for(until):
+    """Cache TTL for a response covering data up to `until` (datetime, aware)"""
+    if until is None:
+        return TTL_RECENT
+    return TTL_FINAL if datetime.now(timezone.utc) - until > RECENT_WINDOW else TTL_RECENT
+
+
+class ResponseCache:
+    """JSON response bodies stored one file per request, each with its own expiry"""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if entry.get('expires_at', 0) < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['body']
+
+    def put(self, key, url, body, ttl):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'url': url, 'fetched_at': time.time(), 'expires_at': time.time() + ttl, 'body': body}, file)
+        os.replace(tmp_path, path)
+
+    def purge_expired(self):
+        """Delete expired entries; returns how many were removed"""
+        removed = 0
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'r', encoding='utf-8') as file:
+                        expired = json.load(file).get('expires_at', 0) < now
+                except (OSError, ValueError):
+                    expired = True
+                if expired:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+DEFAULT_CACHE = ResponseCache()
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base * 2**attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def fetch_json(url, params=None, headers=None, ttl=TTL_RECENT, cache=DEFAULT_CACHE,
+               retries=4, base_delay=RETRY_BASE_DELAY, max_delay=60.0, timeout=30):
+    """GET a JSON document, from the cache when possible, retrying transient failures.
+
+    ttl=0 skips the cache. Raises UpstreamError when the request cannot succeed.
+    """
+    key = cache_key(url, params)
+    if cache is not None and ttl > 0:
+        body = cache.get(key)
+        if body is not None:
+            return body
+
+    full_url = f"{url}?{urllib.parse.urlencode(params, doseq=True)}" if params else url
+    last_error = None
+    for attempt in range(retries + 1):
+        retry_after = None
+        try:
+            request = urllib.request.Request(full_url, headers=headers or {})
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                body = json.loads(response.read().decode('utf-8'))
+            if cache is not None and ttl > 0:
+                cache.put(key, url, body, ttl)
+            return body
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUS:
+                raise UpstreamError(f"{url} returned HTTP {e.code}", e.code)
+            last_error = UpstreamError(f"{url} returned HTTP {e.code}", e.code)
+            header = e.headers.get('Retry-After') if e.headers else None
+            retry_after = float(header) if header and header.isdigit() else None
+        except (urllib.error.URLError, socket.timeout, ConnectionError, ValueError) as e:
+            last_error = UpstreamError(f"{url} failed: {e}")
+
+        if attempt < retries:
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, max_delay))
+            print(f"{last_error}; retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+    raise last_error
@@ -0,0 +1,216 @@
+"""
+Local cache of hourly Open-Meteo weather for every city.
+
+The collectors used to download a whole local day of hourly weather on each
+hourly run, keep one row and throw the rest away. The cache instead asks
+Open-Meteo for a multi-day window of all cities in a single request (the API
+accepts comma-separated coordinates) and keeps the result as arrays per city
+indexed by UTC hour, persisted under data/weather_cache/<city>.npz. Captures
+and backfills read their hour from the arrays and only go upstream when an
+hour is missing or its forecast value has become too old.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from upstream import fetch_json
+
+OPENMETEO_BASE_URL = os.environ.get('OPENMETEO_BASE_URL', 'https://api.open-meteo.com/v1')
+CACHE_DIR = os.environ.get('WEATHER_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'weather_cache')
+
+# city -> (lat, lon, timezone) as used by the collectors
+WEATHER_LOCATIONS = {
+    'cdmx': (19.4326, -99.1332, 'America/Mexico_City'),
+    'la': (34.05, -118.24, 'America/Los_Angeles')
+}
+HOURLY_FIELDS = ['temperature_2m', 'relativehumidity_2m', 'precipitation', 'pressure_msl',
+                 'windspeed_10m', 'winddirection_10m', 'boundary_layer_height']
+# Daily values are spread over the hours of their local day
+DAILY_FIELDS = ['shortwave_radiation_sum']
+WEATHER_FIELDS = HOURLY_FIELDS + DAILY_FIELDS
+
+PAST_DAYS = int(os.environ.get('WEATHER_PAST_DAYS', 2))
+FORECAST_DAYS = int(os.environ.get('WEATHER_FORECAST_DAYS', 2))
+# Hours still in the future (or just over) when fetched are forecasts; refetch them after this
+FORECAST_MAX_AGE = int(os.environ.get('WEATHER_FORECAST_MAX_AGE', 24 * 3600))
+FINAL_AFTER = 2 * 3600
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def _day(moment):
+    return datetime.fromtimestamp(moment, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class CitySeries:
+    """Hourly weather of one city: sorted UTC epochs, one value row and fetch time per hour"""
+
+    __slots__ = ('epochs', 'values', 'fetched_at')
+
+    def __init__(self, epochs=None, values=None, fetched_at=None):
+        self.epochs = np.zeros(0, dtype=np.int64) if epochs is None else np.asarray(epochs, dtype=np.int64)
+        self.values = np.zeros((0, len(WEATHER_FIELDS))) if values is None else np.asarray(values, dtype=float)
+        self.fetched_at = np.zeros(0) if fetched_at is None else np.asarray(fetched_at, dtype=float)
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def merge(self, epochs, values, fetched_at):
+        """Insert or overwrite hours with newer values"""
+        epochs = np.concatenate([self.epochs, epochs])
+        values = np.concatenate([self.values, values])
+        fetched = np.concatenate([self.fetched_at, np.full(len(values) - len(self.values), fetched_at)])
+        # Keep the last occurrence of each hour (the newly fetched one)
+        reverse_unique, reverse_positions = np.unique(epochs[::-1], return_index=True)
+        positions = len(epochs) - 1 - reverse_positions
+        self.epochs = reverse_unique
+        self.values = values[positions]
+        self.fetched_at = fetched[positions]
+
+    def lookup(self, epoch, now, max_age=FORECAST_MAX_AGE):
+        """Value row for an hour, or None when missing or a forecast that is too old"""
+        position = np.searchsorted(self.epochs, epoch)
+        if position >= len(self.epochs) or self.epochs[position] != epoch:
+            return None
+        fetched_at = self.fetched_at[position]
+        is_final = fetched_at - (epoch + HOUR) >= FINAL_AFTER
+        if not is_final and now - fetched_at > max_age:
+            return None
+        return self.values[position]
+
+
+def parse_location(payload):
+    """(epochs, values) arrays from one Open-Meteo location requested with timeformat=unixtime"""
+    hourly = payload.get('hourly') or {}
+    epochs = np.asarray(hourly.get('time', []), dtype=np.int64)
+    values = np.full((len(epochs), len(WEATHER_FIELDS)), np.nan)
+    for column, name in enumerate(HOURLY_FIELDS):
+        if hourly.get(name) is not None:
+            values[:, column] = [np.nan if v is None else v for v in hourly[name]]
+
+    daily = payload.get('daily') or {}
+    offset = int(payload.get('utc_offset_seconds', 0))
+    day_numbers = (np.asarray(daily.get('time', []), dtype=np.int64) + offset) // DAY
+    hour_days = (epochs + offset) // DAY
+    for name in DAILY_FIELDS:
+        column = WEATHER_FIELDS.index(name)
+        daily_values = np.asarray([np.nan if v is None else v for v in daily.get(name, [])], dtype=float)
+        if len(daily_values) == 0:
+            continue
+        positions = np.clip(np.searchsorted(day_numbers, hour_days), 0, len(day_numbers) - 1)
+        matched = day_numbers[positions] == hour_days
+        values[matched, column] = daily_values[positions[matched]]
+    return epochs, values
+
+
+class WeatherCache:
+    """Hourly weather arrays per city, filled by bulk multi-city requests"""
+
+    def __init__(self, directory=CACHE_DIR, locations=WEATHER_LOCATIONS, base_url=None,
+                 past_days=PAST_DAYS, forecast_days=FORECAST_DAYS, max_age=FORECAST_MAX_AGE):
+        self.directory = directory
+        self.locations = dict(locations)
+        self.base_url = base_url or OPENMETEO_BASE_URL
+        self.past_days = past_days
+        self.forecast_days = forecast_days
+        self.max_age = max_age
+        self.upstream_calls = 0
+        self.hits = 0
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _path(self, city_key):
+        return os.path.join(self.directory, f'{city_key}.npz')
+
+    def series(self, city_key):
+        """Cached series of a city, loaded from disk the first time"""
+        series = self._series.get(city_key)
+        if series is None:
+            try:
+                with np.load(self._path(city_key)) as stored:
+                    series = CitySeries(stored['epochs'], stored['values'], stored['fetched_at'])
+            except (OSError, KeyError, ValueError):
+                series = CitySeries()
+            self._series[city_key] = series
+        return series
+
+    def save(self, city_key):
+        series = self._series[city_key]
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(city_key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, epochs=series.epochs, values=series.values, fetched_at=series.fetched_at)
+        os.replace(tmp_path, path)
+
+    def fetch(self, start_day, end_day, cities=None):
+        """One Open-Meteo request for every city over [start_day, end_day] (YYYY-MM-DD); returns hours added per city"""
+        cities = list(cities or self.locations)
+        params = {
+            'latitude': ','.join(str(self.locations[city][0]) for city in cities),
+            'longitude': ','.join(str(self.locations[city][1]) for city in cities),
+            'timezone': ','.join(self.locations[city][2] for city in cities),
+            'start_date': start_day,
+            'end_date': end_day,
+            'timeformat': 'unixtime',
+            'hourly': ','.join(HOURLY_FIELDS),
+            'daily': ','.join(DAILY_FIELDS)
+        }
+        # This cache is the cache; the response cache would only duplicate it
+        payload = fetch_json(f'{self.base_url}/forecast', params=params, ttl=0)
+        self.upstream_calls += 1
+        payloads = payload if isinstance(payload, list) else [payload]
+        if len(payloads) != len(cities):
+            raise ValueError(f'Open-Meteo returned {len(payloads)} locations for {len(cities)} cities')
+
+        fetched_at = time.time()
+        added = {}
+        for city, location in zip(cities, payloads):
+            epochs, values = parse_location(location)
+            series = self.series(city)
+            before = len(series)
+            series.merge(epochs, values, fetched_at)
+            added[city] = len(series) - before
+            self.save(city)
+        return added
+
+    def hour(self, city_key, moment):
+        """{field: value} for the UTC hour containing moment (datetime or epoch), fetching on a miss"""
+        if isinstance(moment, datetime):
+            moment = moment.timestamp()
+        epoch = int(moment) // HOUR * HOUR
+        with self._lock:
+            row = self.series(city_key).lookup(epoch, time.time(), self.max_age)
+            if row is None:
+                # Fill a whole window around the hour for every city at once
+                now = time.time()
+                start = min(epoch, now) - self.past_days * DAY
+                end = max(epoch, now) + self.forecast_days * DAY
+                self.fetch(_day(start), _day(end))
+                row = self.series(city_key).lookup(epoch, time.time(), self.max_age)
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        return {name: (None if np.isnan(value) else float(value)) for name, value in zip(WEATHER_FIELDS, row)}
+
+    def stats(self):
+        return {
+            'upstream_calls': self.upstream_calls,
+            'hits': self.hits,
+            'hours': {city: len(self.series(city)) for city in self.locations}
+        }
+
+
+DEFAULT_WEATHER = WeatherCache()
+
+
+def weather_for(city_key, moment):
+    return DEFAULT_WEATHER.hour(city_key, moment)
+
@@ -11,10 +11,16 @@ npm install
 echo "Building React frontend..."
 npm run build
 
-# Install Python dependencies (minimal)
+# Install Python dependencies (NumPy and the model stack are needed at runtime)
 echo "Installing Python dependencies..."
 pip install --upgrade pip
-pip install Flask==2.3.3 Flask-CORS==4.0.0
+pip install -r backend/requirements.txt
+
+# Train the per-pollutant models with the pinned model stack, so the pickles
+# always match the runtime versions (pollutants that do not beat persistence
+# get no model and the backend repeats their current value)
+echo "Training pollutant models..."
+python backend/scripts/entrenar_contaminantes.py
 
 echo "Build completed successfully!"
 echo "Frontend built in: build/"
@@ -10,7 +10,7 @@ import PredictionCard from './components/PredictionCard';
 import AdvancedStatsPanel from './components/AdvancedStatsPanel';
 import ModelHealthIndicator from './components/ModelHealthIndicator';
 import { useCSVData } from './hooks/useCSVData';
-import { usePredictionAPI, useAPIHealth } from './hooks/usePredictionAPI';
+import { usePredictionAPI, useAPIHealth, useModelAccuracy } from './hooks/usePredictionAPI';
 
 function App() {
   const [selectedLocation, setSelectedLocation] = useState('Mexico City');
@@ -23,6 +23,7 @@ function App() {
   // Cargar predicciones de la API
   const { prediction, historicalData: apiHistoricalData, loading: predictionLoading, error: predictionError, refetch } = usePredictionAPI(selectedLocation);
   const { health } = useAPIHealth();
+  const { accuracy } = useModelAccuracy();
 
   const locations = ['Mexico City', 'Los Angeles'];
   const timeSlots = ['11:00', '12:00', '13:00'];
@@ -80,7 +81,7 @@ function App() {
             </div>
             
             {/* Model Health Indicator */}
-            <ModelHealthIndicator health={health} prediction={prediction} />
+            <ModelHealthIndicator health={health} prediction={prediction} accuracy={accuracy} />
           </div>
 
           {/* Tabs */}
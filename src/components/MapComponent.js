@@ -1,10 +1,14 @@
 import React from 'react';
+import { API_BASE_URL } from '../hooks/usePredictionAPI';
+
+// Grid resolution requested from /api/grid (0 = 32x32 cells ... 3 = 256x256)
+const SURFACE_ZOOM = 2;
 
 const MapComponent = ({ location, airQualityData }) => {
   // Información de las ciudades
   const cityInfo = {
-    'Mexico City': { name: 'Ciudad de México', coordinates: '19.4326°N, 99.1332°W' },
-    'Los Angeles': { name: 'Los Ángeles', coordinates: '34.0522°N, 118.2437°W' }
+    'Mexico City': { name: 'Ciudad de México', coordinates: '19.4326°N, 99.1332°W', apiKey: 'cdmx' },
+    'Los Angeles': { name: 'Los Ángeles', coordinates: '34.0522°N, 118.2437°W', apiKey: 'la' }
   };
 
   const currentCity = cityInfo[location] || cityInfo['Mexico City'];
@@ -58,6 +62,23 @@ const MapComponent = ({ location, airQualityData }) => {
             style={{ maxHeight: '400px', objectFit: 'contain' }}
           />
         </div>
+
+        {/* Superficie interpolada de PM2.5 (IDW entre estaciones) */}
+        <div className="bg-gray-900 rounded-lg p-4 mt-4">
+          <div className="text-gray-300 text-sm mb-2">Interpolated PM2.5 surface</div>
+          <img
+            src={`${API_BASE_URL}/grid/${currentCity.apiKey}?zoom=${SURFACE_ZOOM}&format=png`}
+            alt={`Interpolated PM2.5 surface for ${currentCity.name}`}
+            className="w-full h-auto rounded-lg"
+            style={{ maxHeight: '400px', objectFit: 'contain', imageRendering: 'pixelated' }}
+          />
+          <div className="flex justify-between text-xs text-gray-400 mt-2">
+            <span className="text-green-400">Bueno</span>
+            <span className="text-yellow-400">Moderado</span>
+            <span className="text-orange-400">Sensibles</span>
+            <span className="text-red-400">Insalubre</span>
+          </div>
+        </div>
       </div>
     </div>
   );
@@ -1,6 +1,8 @@
 import React from 'react';
 
-const ModelHealthIndicator = ({ health, prediction }) => {
+const formatError = (value) => (value === null || value === undefined ? '--' : `${value.toFixed(1)} µg/m³`);
+
+const ModelHealthIndicator = ({ health, prediction, accuracy }) => {
   if (!health) {
     return (
       <div className="bg-red-500/20 backdrop-blur-lg rounded-xl p-4 border border-red-500/30">
@@ -13,6 +15,13 @@ const ModelHealthIndicator = ({ health, prediction }) => {
     );
   }
 
+  const cityKey = prediction && prediction.city ? prediction.city.toLowerCase() : null;
+  const cityAccuracy = accuracy && accuracy.cities && cityKey ? accuracy.cities[cityKey] : null;
+  const metrics = cityAccuracy && cityAccuracy.horizons ? cityAccuracy.horizons['24h'] : null;
+  const modelVersion = health.models && health.models.active && cityKey && health.models.active[cityKey]
+    ? health.models.active[cityKey].version
+    : health.model_version;
+
   return (
     <div className="bg-green-500/20 backdrop-blur-lg rounded-xl p-4 border border-green-500/30">
       <div className="flex items-center justify-between mb-3">
@@ -51,8 +60,20 @@ const ModelHealthIndicator = ({ health, prediction }) => {
             </span>
           </div>
           <div className="flex items-center justify-between text-sm mt-1">
-            <span className="text-gray-300">Prediction Accuracy</span>
-            <span className="text-green-400 font-medium">92%</span>
+            <span className="text-gray-300">24h MAE</span>
+            <span className="text-green-400 font-medium">{formatError(metrics && metrics.mae)}</span>
+          </div>
+          <div className="flex items-center justify-between text-sm mt-1">
+            <span className="text-gray-300">24h RMSE / Bias</span>
+            <span className="text-white">
+              {formatError(metrics && metrics.rmse)} / {formatError(metrics && metrics.bias)}
+            </span>
+          </div>
+          <div className="flex items-center justify-between text-xs mt-1">
+            <span className="text-gray-400">Forecasts scored</span>
+            <span className="text-gray-400">
+              {metrics ? metrics.samples : 0} ({cityAccuracy ? cityAccuracy.pending : 0} pending)
+            </span>
           </div>
         </div>
       )}
@@ -64,7 +85,7 @@ const ModelHealthIndicator = ({ health, prediction }) => {
         </div>
         <div className="flex items-center justify-between mt-1">
           <span>Model Version</span>
-          <span className="text-blue-400">LightGBM v3.3.2</span>
+          <span className="text-blue-400">{modelVersion || 'Unknown'}</span>
         </div>
       </div>
     </div>
@@ -101,6 +101,11 @@ const PredictionCard = ({ prediction, loading, error }) => {
           <div className="text-xs text-gray-500 mt-1">
             PM2.5: {prediction.pm25_predicted_24h} μg/m³
           </div>
+          {prediction.pm25_interval_24h && (
+            <div className="text-xs text-gray-500">
+              Likely range: {prediction.pm25_interval_24h.p10}–{prediction.pm25_interval_24h.p90} μg/m³
+            </div>
+          )}
         </div>
       </div>
 
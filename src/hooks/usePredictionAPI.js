@@ -1,10 +1,13 @@
 import { useState, useEffect } from 'react';
 
 // Use relative URL for production, localhost for development
-const API_BASE_URL = process.env.NODE_ENV === 'production' 
+export const API_BASE_URL = process.env.NODE_ENV === 'production' 
   ? '/api' 
   : 'http://localhost:5000/api';
 
+// Charts never need more points than this; the backend downsamples longer ranges
+const CHART_MAX_POINTS = 500;
+
 // Map city names to API format
 const mapCityName = (cityName) => {
   const city = cityName.toLowerCase().trim();
@@ -50,7 +53,7 @@ export const usePredictionAPI = (city) => {
       // Convert city name to API format
       const apiCityName = mapCityName(cityName);
       console.log(`Fetching historical data for: ${cityName} -> ${apiCityName}`);
-      const response = await fetch(`${API_BASE_URL}/data/${apiCityName}`);
+      const response = await fetch(`${API_BASE_URL}/data/${apiCityName}?max_points=${CHART_MAX_POINTS}`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -108,3 +111,25 @@ export const useAPIHealth = () => {
 
   return { health, loading, checkHealth };
 };
+
+export const useModelAccuracy = () => {
+  const [accuracy, setAccuracy] = useState(null);
+
+  const fetchAccuracy = async () => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/model/accuracy`);
+      if (response.ok) {
+        const data = await response.json();
+        setAccuracy(data);
+      }
+    } catch (err) {
+      console.error('Model accuracy check failed:', err);
+    }
+  };
+
+  useEffect(() => {
+    fetchAccuracy();
+  }, []);
+
+  return { accuracy, fetchAccuracy };
+};